@@ -0,0 +1,348 @@
+"""
+ASGI app (started by python3 run.py, or: uvicorn asgi:app).
+
+Search, suggestions, details, metadata analysis and the progress stream are served by async
+handlers: yt-dlp work runs in a bounded thread pool, OpenAI calls are awaited
+with httpx, and every request has a timeout and is cancelled when the client
+goes away. All other routes (index.html, downloads, jobs, imports, library)
+are the Flask app from server.py, mounted as WSGI.
+"""
+import asyncio
+import contextlib
+import json
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+
+import config
+import server
+from downloader import SEARCH_MODES
+
+log = logging.getLogger("asgi")
+
+loader = server.loader
+
+# yt-dlp extraction blocks; it never gets more threads than this
+blocking_pool = ThreadPoolExecutor(max_workers=config.BLOCKING_WORKERS, thread_name_prefix="asgi-blocking")
+
+# How often a waiting handler checks whether its client is still connected
+DISCONNECT_POLL = 0.5
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    # Stop the ingress proxy from buffering the stream
+    "X-Accel-Buffering": "no",
+}
+
+_END = object()
+
+
+class RequestTimeout(Exception):
+    pass
+
+
+class ClientGone(Exception):
+    pass
+
+
+async def guarded(request, awaitable, timeout=None):
+    """
+    Awaits `awaitable`, cancelling it when the client disconnects or after
+    `timeout` seconds (config.REQUEST_TIMEOUT). Cancelling a pool job only
+    helps while it is still queued; a running yt-dlp call finishes in the
+    background and its result lands in the cache.
+    """
+    loop = asyncio.get_running_loop()
+    task = asyncio.ensure_future(awaitable)
+    deadline = loop.time() + (timeout or config.REQUEST_TIMEOUT)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                raise ClientGone()
+            if loop.time() > deadline:
+                raise RequestTimeout()
+    finally:
+        task.cancel()
+
+
+async def json_body(request):
+    """The request body as a JSON object, or None if it is not one."""
+    try:
+        data = await request.json()
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def run_blocking(func, *args):
+    return asyncio.wrap_future(blocking_pool.submit(func, *args))
+
+
+class AsyncAnalyzer:
+    """
+    Async counterpart of MusicDownloader.analyze_metadata(_batch): same prompts,
+    memo cache and regex fallback, but the OpenAI call is awaited with httpx
+    instead of holding a thread. Identical concurrent requests share one call,
+    which is cancelled once nobody waits for it anymore.
+    """
+    def __init__(self, loader):
+        self.loader = loader
+        self.client = None
+        self._inflight = {}
+
+    async def start(self):
+        self.client = httpx.AsyncClient(limits=httpx.Limits(max_connections=8, max_keepalive_connections=4))
+
+    async def close(self):
+        await self.client.aclose()
+
+    async def _post_ai(self, kind, items, api_key):
+        url, request = self.loader.ai_request(kind, items, api_key)
+        start = time.perf_counter()
+        try:
+            response = await self.client.post(url, **request)
+        except Exception as e:
+            return self.loader.ai_response(kind, items, None, time.perf_counter() - start, error=e)
+        return self.loader.ai_response(kind, items, response, time.perf_counter() - start)
+
+    async def _get_ai_metadata(self, title, channel):
+        api_key = getattr(config, 'OPENAI_API_KEY', '')
+        if not api_key:
+            return None
+
+        key = self.loader.ai_cache_key(title, channel)
+        cached = self.loader.cache.get('ai', key)
+        if cached:
+            log.debug(f"Using memoized AI metadata for '{title}'")
+            return tuple(cached)
+
+        entry = self._inflight.get(key)
+        if entry is None:
+            entry = self._inflight[key] = [asyncio.ensure_future(self._post_ai("single", [(title, channel)], api_key)), 0]
+            entry[0].add_done_callback(lambda task: self._finish(key, task))
+        else:
+            log.debug(f"Waiting for in-flight AI request for '{title}'")
+        entry[1] += 1
+        try:
+            return await asyncio.shield(entry[0])
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and not entry[0].done():
+                entry[0].cancel()
+
+    def _finish(self, key, task):
+        self._inflight.pop(key, None)
+        if not task.cancelled() and task.result():
+            self.loader.cache.set('ai', key, list(task.result()))
+
+    async def analyze_metadata(self, title, channel):
+        ai_proposal = await self._get_ai_metadata(title, channel)
+        return self.loader.build_proposal(ai_proposal, title, channel)
+
+    async def analyze_metadata_batch(self, items):
+        """Like MusicDownloader.analyze_metadata_batch, but all chunks are sent concurrently."""
+        api_key = getattr(config, 'OPENAI_API_KEY', '')
+        ai_results, chunks = self.loader.memoized_ai_batch(items, api_key)
+
+        async def ask(chunk):
+            log.info(f"Batch analyzing {len(chunk)} titles with AI")
+            return await self._post_ai("batch", [items[i] for i in chunk], api_key)
+
+        answers = await asyncio.gather(*(ask(chunk) for chunk in chunks))
+        for chunk, parsed in zip(chunks, answers):
+            self.loader.remember_ai_batch(items, chunk, parsed, ai_results)
+
+        return [
+            self.loader.build_proposal(ai_proposal, title, channel)
+            for ai_proposal, (title, channel) in zip(ai_results, items)
+        ]
+
+
+analyzer = AsyncAnalyzer(loader)
+
+
+async def search(request):
+    data = await json_body(request)
+    if data is None:
+        return JSONResponse({"success": False, "message": "Body must be a JSON object"}, status_code=400)
+    query = data.get('query')
+    mode = data.get('mode') or None
+    if not query:
+        return JSONResponse({"success": False, "message": "No query provided"}, status_code=400)
+    if mode and mode not in SEARCH_MODES:
+        return JSONResponse({"success": False, "message": f"Unknown mode (use one of {', '.join(SEARCH_MODES)})"}, status_code=400)
+
+    result = await guarded(request, run_blocking(loader.search_video, query, mode, True))
+    return JSONResponse(result)
+
+
+async def search_stream(request):
+    """Server-Sent Events: one 'message' per search result, then 'done' (or 'failed')."""
+    query = request.query_params.get('query')
+    if not query:
+        return JSONResponse({"success": False, "message": "No query provided"}, status_code=400)
+    mode = request.query_params.get('mode') or None
+    if mode and mode not in SEARCH_MODES:
+        return JSONResponse({"success": False, "message": f"Unknown mode (use one of {', '.join(SEARCH_MODES)})"}, status_code=400)
+
+    def sse(payload, event=None):
+        head = f"event: {event}\n" if event else ""
+        return f"{head}data: {json.dumps(payload)}\n\n"
+
+    async def generate():
+        results = loader.iter_search(query, mode, record=True)
+        pending = None
+        count = 0
+        try:
+            while True:
+                # One result per pool job, so a slow search never pins a thread between results
+                pending = blocking_pool.submit(next, results, _END)
+                result = await asyncio.wait_for(asyncio.wrap_future(pending), config.REQUEST_TIMEOUT)
+                if result is _END:
+                    break
+                count += 1
+                yield sse(result)
+            yield sse({"count": count}, event="done")
+        except asyncio.TimeoutError:
+            yield sse({"message": "Search timed out"}, event="failed")
+        except Exception as e:
+            log.exception(f"Search Stream Error: {e}")
+            yield sse({"message": str(e)}, event="failed")
+        finally:
+            # Also runs when the client disconnects (generator cancelled); the
+            # search generator can only be closed once its current step is done.
+            if pending is None or pending.done():
+                results.close()
+            else:
+                pending.add_done_callback(lambda _: results.close())
+
+    return StreamingResponse(generate(), media_type='text/event-stream', headers=SSE_HEADERS)
+
+
+async def suggest(request):
+    # In-memory lookup, cheap enough to run on the event loop
+    try:
+        limit = max(1, min(int(request.query_params.get('limit', 8)), 20))
+    except ValueError:
+        limit = 8
+    suggestions = loader.suggest.suggest(request.query_params.get('q', ''), limit)
+    return JSONResponse({"success": True, "suggestions": suggestions})
+
+
+async def details(request):
+    video_id = request.path_params['video_id']
+    info = loader._get_cached_info_by_id(video_id)
+    try:
+        if info:
+            result = loader._video_summary(info)
+        else:
+            # Hydration runs on the downloader's detail pool; nothing blocks here
+            result = await guarded(request, asyncio.wrap_future(loader.get_video_details_async(video_id)))
+    except (RequestTimeout, ClientGone):
+        raise
+    except Exception as e:
+        log.warning(f"Details Error for {video_id}: {e}")
+        return JSONResponse({"success": False, "message": str(e)}, status_code=502)
+    return JSONResponse({"success": True, "result": result})
+
+
+async def analyze(request):
+    data = await json_body(request)
+    if data is None:
+        return JSONResponse({"success": False, "message": "Body must be a JSON object"}, status_code=400)
+    title = data.get('title')
+    channel = data.get('channel')
+
+    if not title:
+        return JSONResponse({"success": False, "message": "No title provided"}, status_code=400)
+
+    proposal = await guarded(request, analyzer.analyze_metadata(title, channel))
+    return JSONResponse({"success": True, "result": proposal})
+
+
+async def analyze_batch(request):
+    data = await json_body(request)
+    if data is None:
+        return JSONResponse({"success": False, "message": "Body must be a JSON object"}, status_code=400)
+    items = data.get('items')
+
+    if not items or not isinstance(items, list):
+        return JSONResponse({"success": False, "message": "No items provided"}, status_code=400)
+    if any(not isinstance(item, dict) or not item.get('title') for item in items):
+        return JSONResponse({"success": False, "message": "Every item needs to be an object with a title"}, status_code=400)
+
+    proposals = await guarded(request, analyzer.analyze_metadata_batch(
+        [(item.get('title'), item.get('channel')) for item in items]))
+    return JSONResponse({"success": True, "results": proposals})
+
+
+async def progress_stream(request):
+    """Server-Sent Events: full progress snapshot whenever it changes (max ~2/s), without a thread per client."""
+    async def generate():
+        version = None
+        idle = 0.0
+        while True:
+            new_version, items = loader.progress.snapshot()
+            if new_version != version:
+                version, idle = new_version, 0.0
+                yield f"data: {json.dumps(items)}\n\n"
+            elif idle >= 15:
+                # Heartbeat keeps proxies from closing an idle stream
+                idle = 0.0
+                yield ": keep-alive\n\n"
+            await asyncio.sleep(0.5)
+            idle += 0.5
+
+    return StreamingResponse(generate(), media_type='text/event-stream', headers=SSE_HEADERS)
+
+
+async def on_timeout(request, exc):
+    return JSONResponse({"success": False, "message": "Request timed out"}, status_code=504)
+
+
+async def on_client_gone(request, exc):
+    # Nobody is listening anymore; 499 is what nginx logs for this
+    return Response(status_code=499)
+
+
+async def on_error(request, exc):
+    log.error(f"SERVER ERROR: {exc}", exc_info=exc)
+    return JSONResponse({"success": False, "message": str(exc), "error": "Internal Server Error"}, status_code=500)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    await analyzer.start()
+    yield
+    await analyzer.close()
+    blocking_pool.shutdown(wait=False)
+
+
+app = Starlette(
+    routes=[
+        Route('/search', search, methods=['POST']),
+        Route('/search/stream', search_stream, methods=['GET']),
+        Route('/suggest', suggest, methods=['GET']),
+        Route('/details/{video_id}', details, methods=['GET']),
+        Route('/analyze', analyze, methods=['POST']),
+        Route('/analyze/batch', analyze_batch, methods=['POST']),
+        Route('/progress/stream', progress_stream, methods=['GET']),
+        # Everything else: the Flask app (index.html, downloads, jobs, imports, library, cache)
+        Mount('/', app=WSGIMiddleware(server.app, workers=config.BLOCKING_WORKERS)),
+    ],
+    exception_handlers={
+        RequestTimeout: on_timeout,
+        ClientGone: on_client_gone,
+        Exception: on_error,
+    },
+    lifespan=lifespan,
+)
@@ -0,0 +1,144 @@
+import os
+import json
+import sqlite3
+import threading
+import time
+
+# Access times of hits are written in batches: after this many hits or seconds,
+# and before anything that depends on them (eviction, keys())
+TOUCH_BATCH = 64
+TOUCH_INTERVAL = 60
+
+
+class DiskCache:
+    """
+    Small persistent key/value cache on SQLite.
+    Entries live in namespaces ('search', 'info', ...), expire after `ttl`
+    seconds (or the namespace's value in `ttls`) and the least recently used
+    ones are evicted once a namespace holds more than `max_entries`.
+    A hit does not write to disk (SD card) every time: access times are
+    collected and flushed in batches.
+    """
+    def __init__(self, path, ttl=86400, max_entries=1000, ttls=None):
+        self.path = path
+        self.ttl = ttl
+        self.ttls = ttls or {}
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._touched = {}
+        self._flushed_at = time.time()
+
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache (
+                ns TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL,
+                PRIMARY KEY (ns, key)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_lru ON cache (ns, accessed)")
+        self._conn.commit()
+
+    def _count(self, ns, field):
+        counts = self._stats.setdefault(ns, {'hits': 0, 'misses': 0})
+        counts[field] += 1
+
+    def get(self, ns, key, max_age=None):
+        """Return the cached value or None. `max_age` can only tighten the TTL."""
+        ttl = self.ttls.get(ns, self.ttl)
+        max_age = ttl if max_age is None else min(max_age, ttl)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created FROM cache WHERE ns = ? AND key = ?", (ns, key)
+            ).fetchone()
+            if row is None or now - row[1] > max_age:
+                self._count(ns, 'misses')
+                return None
+            self._touched[(ns, key)] = now
+            if len(self._touched) >= TOUCH_BATCH or now - self._flushed_at >= TOUCH_INTERVAL:
+                self._flush_touched(now)
+                self._conn.commit()
+            self._count(ns, 'hits')
+        return json.loads(row[0])
+
+    def _flush_touched(self, now):
+        # Lock must be held; the caller commits
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE cache SET accessed = ? WHERE ns = ? AND key = ?",
+                [(accessed, ns, key) for (ns, key), accessed in self._touched.items()]
+            )
+            self._touched.clear()
+        self._flushed_at = now
+
+    def set(self, ns, key, value):
+        now = time.time()
+        payload = json.dumps(value)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (ns, key, value, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (ns, key, payload, now, now)
+            )
+            self._touched.pop((ns, key), None)
+            self._flush_touched(now)
+            self._evict(ns, now)
+            self._conn.commit()
+
+    def _evict(self, ns, now):
+        # Lock must be held
+        ttl = self.ttls.get(ns, self.ttl)
+        self._conn.execute("DELETE FROM cache WHERE ns = ? AND created < ?", (ns, now - ttl))
+        self._conn.execute("""
+            DELETE FROM cache WHERE ns = ? AND key IN (
+                SELECT key FROM cache WHERE ns = ? ORDER BY accessed DESC LIMIT -1 OFFSET ?
+            )
+        """, (ns, ns, self.max_entries))
+
+    def keys(self, ns, limit=None):
+        """Keys of a namespace, most recently used first."""
+        with self._lock:
+            self._flush_touched(time.time())
+            self._conn.commit()
+            rows = self._conn.execute(
+                "SELECT key FROM cache WHERE ns = ? ORDER BY accessed DESC LIMIT ?", (ns, limit or -1)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def items(self, ns, limit=None):
+        """(key, value) pairs of a namespace that have not expired, most recently used first."""
+        now = time.time()
+        ttl = self.ttls.get(ns, self.ttl)
+        with self._lock:
+            self._flush_touched(now)
+            self._conn.commit()
+            rows = self._conn.execute(
+                "SELECT key, value FROM cache WHERE ns = ? AND created >= ? ORDER BY accessed DESC LIMIT ?",
+                (ns, now - ttl, limit or -1)
+            ).fetchall()
+        return [(row[0], json.loads(row[1])) for row in rows]
+
+    def stats(self):
+        with self._lock:
+            sizes = dict(self._conn.execute("SELECT ns, COUNT(*) FROM cache GROUP BY ns").fetchall())
+            result = {}
+            for ns in set(sizes) | set(self._stats):
+                counts = self._stats.get(ns, {'hits': 0, 'misses': 0})
+                total = counts['hits'] + counts['misses']
+                result[ns] = {
+                    'entries': sizes.get(ns, 0),
+                    'hits': counts['hits'],
+                    'misses': counts['misses'],
+                    'hit_rate': round(counts['hits'] / total, 3) if total else None,
+                }
+        return result
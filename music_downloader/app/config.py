@@ -1,5 +1,9 @@
 import os
 import json
+import logging
+import logs
+
+log = logging.getLogger("config")
 
 # Add-on Options Path
 OPTIONS_PATH = "/data/options.json"
@@ -12,7 +16,7 @@ def get_ha_option(key, default):
                 options = json.load(f)
                 return options.get(key, default)
         except Exception as e:
-            print(f"Error reading options.json: {e}")
+            log.error(f"Error reading options.json: {e}")
     return default
 
 # Base directory of the project
@@ -33,6 +37,8 @@ if IS_HA:
     FFMPEG_BIN = "ffmpeg" 
     FFPROBE_BIN = "ffprobe"
     BIN_DIR = "" # Not needed in PATH mode
+    # Persistent add-on storage
+    DATA_DIR = "/data"
 else:
     # LOCAL WINDOWS MODE
     DOWNLOAD_DIR = os.path.join(BASE_DIR, "downloads")
@@ -40,11 +46,78 @@ else:
     BIN_DIR = os.path.join(BASE_DIR, "bin")
     FFMPEG_BIN = os.path.join(BIN_DIR, "ffmpeg.exe")
     FFPROBE_BIN = os.path.join(BIN_DIR, "ffprobe.exe")
+    DATA_DIR = os.path.join(BASE_DIR, "data")
+
+# PERFORMANCE SETTINGS
+# Number of downloads (network fetches) running at the same time
+MAX_CONCURRENT_DOWNLOADS = int(get_ha_option("max_concurrent_downloads", os.environ.get("MAX_CONCURRENT_DOWNLOADS", 2)))
+
+# Downloads are fetched into STAGING_DIR by MAX_CONCURRENT_DOWNLOADS threads, then converted
+# and tagged by CONVERT_WORKERS processes (0 = one per CPU core)
+STAGING_DIR = os.path.join(DOWNLOAD_DIR, ".staging")
+CONVERT_WORKERS = int(get_ha_option("convert_workers", os.environ.get("CONVERT_WORKERS", 0))) or os.cpu_count() or 2
+
+# Shared download bandwidth in bytes/s ("2M", "500K"; 0 = unlimited), lifted during the
+# full speed hours ("01:00-07:00", comma separated, local time)
+BANDWIDTH_LIMIT = str(get_ha_option("bandwidth_limit", os.environ.get("BANDWIDTH_LIMIT", "0")))
+FULL_SPEED_HOURS = get_ha_option("full_speed_hours", os.environ.get("FULL_SPEED_HOURS", "")) or ""
+# Parallel fragment downloads for a fetch that runs alone at full speed
+CONCURRENT_FRAGMENTS = int(get_ha_option("concurrent_fragments", os.environ.get("CONCURRENT_FRAGMENTS", 4)))
+# Failed downloads (throttling, network errors) are retried this often, first after retry_delay seconds, then doubling
+DOWNLOAD_RETRIES = int(get_ha_option("download_retries", os.environ.get("DOWNLOAD_RETRIES", 3)))
+RETRY_DELAY = float(get_ha_option("retry_delay", os.environ.get("RETRY_DELAY", 30)))
+
+# ASGI server (asgi.py): threads for blocking yt-dlp calls and the per-request time limit
+BLOCKING_WORKERS = int(get_ha_option("blocking_workers", os.environ.get("BLOCKING_WORKERS", 4)))
+REQUEST_TIMEOUT = float(get_ha_option("request_timeout", os.environ.get("REQUEST_TIMEOUT", 60)))
+
+# Search: 'fast' lists results immediately and loads details in the background, 'full' resolves everything up front
+SEARCH_MODE = get_ha_option("search_mode", os.environ.get("SEARCH_MODE", "fast"))
+SEARCH_DETAIL_WORKERS = int(get_ha_option("search_detail_workers", os.environ.get("SEARCH_DETAIL_WORKERS", 4)))
+
+# OpenAI compatible endpoint (can point to a local server / mock)
+OPENAI_API_BASE = get_ha_option("openai_api_base", os.environ.get("OPENAI_API_BASE", "https://api.openai.com/v1")).rstrip("/")
+OPENAI_MODEL = get_ha_option("openai_model", os.environ.get("OPENAI_MODEL", "gpt-3.5-turbo"))
+
+# Extra title cleaning rules for clean_metadata (one regex per line)
+TITLE_RULES_FILE = get_ha_option("title_rules_file", os.environ.get("TITLE_RULES_FILE", os.path.join(DATA_DIR, "title_rules.txt")))
+
+# Persistent cache for search results and video info
+CACHE_DB = os.path.join(DATA_DIR, "cache.db")
+CACHE_TTL_HOURS = float(get_ha_option("cache_ttl_hours", os.environ.get("CACHE_TTL_HOURS", 24)))
+CACHE_MAX_ENTRIES = int(get_ha_option("cache_max_entries", os.environ.get("CACHE_MAX_ENTRIES", 1000)))
+
+# Journal of queued/running downloads, resumed after a restart
+JOBS_DB = os.path.join(DATA_DIR, "jobs.db")
+
+# Library index of what already exists in DOWNLOAD_DIR
+LIBRARY_DB = os.path.join(DATA_DIR, "library.db")
+LIBRARY_RESCAN_MINUTES = float(get_ha_option("library_rescan_minutes", os.environ.get("LIBRARY_RESCAN_MINUTES", 30)))
+SKIP_EXISTING = get_ha_option("skip_existing", os.environ.get("SKIP_EXISTING", "true").lower() not in ("0", "false", "no"))
+
+# Wishlist sync: "Artist - Title" lines (text file, or CSV with artist,title[,album] columns) plus
+# the wishlist option list; new lines are searched and downloaded unattended. The file is checked
+# for changes every 30s and failed lines are retried every wishlist_sync_minutes (0 = off)
+WISHLIST_FILE = get_ha_option("wishlist_file", os.environ.get("WISHLIST_FILE", os.path.join(DATA_DIR, "wishlist.txt")))
+WISHLIST = get_ha_option("wishlist", [line for line in os.environ.get("WISHLIST", "").split("\n") if line.strip()]) or []
+WISHLIST_SYNC_MINUTES = float(get_ha_option("wishlist_sync_minutes", os.environ.get("WISHLIST_SYNC_MINUTES", 60)))
+# Wishlist lines searched and matched at the same time (downloads are bounded by max_concurrent_downloads)
+WISHLIST_WORKERS = int(get_ha_option("wishlist_workers", os.environ.get("WISHLIST_WORKERS", 2)))
+WISHLIST_DB = os.path.join(DATA_DIR, "wishlist.db")
+
+# Output audio: 'mp3' re-encodes, 'native' keeps the source codec (remux only, no encode),
+# 'm4a' / 'opus' / 'flac' convert unless the source already is that codec
+OUTPUT_FORMAT = get_ha_option("output_format", os.environ.get("OUTPUT_FORMAT", "mp3"))
+AUDIO_BITRATE = int(get_ha_option("audio_bitrate", os.environ.get("AUDIO_BITRATE", 320)))
+
+# Logging (logfmt lines on stdout): debug | info | warning | error
+LOG_LEVEL = get_ha_option("log_level", os.environ.get("LOG_LEVEL", "info"))
+logs.setup(LOG_LEVEL)
 
 # Ensure download directory exists
 if not os.path.exists(DOWNLOAD_DIR):
     try:
         os.makedirs(DOWNLOAD_DIR)
-        print(f"Created download directory: {DOWNLOAD_DIR}")
+        log.info(f"Created download directory: {DOWNLOAD_DIR}")
     except Exception as e:
-        print(f"Warning: Could not create download directory {DOWNLOAD_DIR}: {e}")
+        log.warning(f"Could not create download directory {DOWNLOAD_DIR}: {e}")
@@ -1,11 +1,154 @@
 import os
 import yt_dlp
-from mutagen.easyid3 import EasyID3
-from mutagen.id3 import ID3, ID3NoHeaderError
 import config
 import re
-import traceback
-import copy
+import logging
+import threading
+import time
+import json
+import hashlib
+import uuid
+import multiprocessing
+import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future
+from concurrent.futures.process import BrokenProcessPool
+from yt_dlp.extractor.youtube import YoutubeIE
+from yt_dlp.utils import parse_bytes
+from cache import DiskCache
+from library import LibraryIndex
+from suggest import SuggestIndex, RECENT_TTL
+from scheduler import DownloadScheduler, retry_sleep
+from ydl_pool import YoutubeDLPool
+import progress
+import postprocess
+import metrics
+import logs
+
+log = logging.getLogger("downloader")
+
+# Resolved info dicts contain signed stream URLs that expire after a few hours.
+# Metadata may come from older cache entries, but a download only reuses fresh ones.
+STREAM_URL_MAX_AGE = 1800
+
+# Bump whenever the AI prompt changes so memoized proposals are not reused
+AI_PROMPT_VERSION = "1"
+AI_CACHE_TTL = 90 * 86400
+
+AI_BATCH_SIZE = 20
+
+AI_METADATA_RULES = """
+            Task:
+            1. Identify the true Artist(s) and Song Title.
+            2. Identify the Release Year.
+            3. CLEAN the Title: Remove ALL junk like:
+               - "(Official Video)", "(Lyrics)", "(Live)", "(HD)", "(4K)", "Official Audio"
+               - "ft.", "feat.", "featuring" (Move these artists to the artist list instead)
+            
+            4. DETERMINE ALBUM:
+               - If it is CLEARLY from a specific album (e.g. "from the album 'Cloud Nine'"), use that album name.
+               - If it is a Single or the album is unknown, SET THE ALBUM NAME TO THE SONG TITLE.
+               - DO NOT use "- Single" suffix.
+               - Example: If Title is "Firestone", Album should be "Firestone".
+            """
+
+# Title junk removed by clean_metadata. All rules are joined into one
+# case-insensitive alternation and applied in a single pass; extra rules
+# (one regex per line, '#' comments) can be added in config.TITLE_RULES_FILE.
+TITLE_JUNK_PATTERNS = [
+    r"\(Official Video\)", r"\(Official Audio\)", r"\(Lyrics\)",
+    r"\[Official Video\]", r"\[Audio\]",
+    r"[\(\[]?\b(?:feat\.?|ft\.?|featuring)\s+[^\)\]]+[\)\]]?",
+    # Extra Cleaners
+    r"\[HD\]", r"\[HQ\]", r"\(HD\)", r"\(HQ\)",
+    r"\(Video\)", r"\[Video\]",
+    r"\(Official\)", r"\[Official\]",
+    r"\b4K\b", r"\bHD\b"
+]
+
+def load_title_rules(path):
+    """Reads extra junk patterns from a rules file, skipping invalid ones."""
+    rules = []
+    if not path or not os.path.exists(path):
+        return rules
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                try:
+                    # Checked the way compile_title_rules combines it: inline
+                    # global flags like (?i) are only allowed at the very start
+                    re.compile(f"(?:{line})")
+                    rules.append(line)
+                except re.error as e:
+                    log.warning(f"Ignoring invalid title rule '{line}': {e}")
+        log.info(f"Loaded {len(rules)} title rule(s) from {path}")
+    except Exception as e:
+        log.error(f"Error reading title rules {path}: {e}")
+    return rules
+
+def compile_title_rules(patterns):
+    return re.compile("|".join(f"(?:{p})" for p in patterns), re.IGNORECASE)
+
+def load_title_junk_re(path):
+    """Built-in junk patterns plus the rules file; a rules file that does not compile is ignored."""
+    try:
+        return compile_title_rules(TITLE_JUNK_PATTERNS + load_title_rules(path))
+    except re.error as e:
+        log.error(f"Ignoring title rules {path}: {e}")
+        return compile_title_rules(TITLE_JUNK_PATTERNS)
+
+TITLE_JUNK_RE = load_title_junk_re(config.TITLE_RULES_FILE)
+FEAT_RE = re.compile(r"\b(?:feat\.?|ft\.?|featuring)\s+(.+?)(?=\)|\]|$)", re.IGNORECASE)
+ARTIST_X_RE = re.compile(r"\s+x\s+", re.IGNORECASE)
+ARTIST_SPLIT_RE = re.compile(r",|&")
+
+# Large info dict fields we never use; dropped before caching. Keep _format_sort_fields:
+# the YouTube extractor uses it to rank down damaged formats during format selection.
+INFO_SKIP_KEYS = ('automatic_captions', 'subtitles', 'heatmap', 'chapters', 'description', 'storyboards')
+
+# Search modes (config.SEARCH_MODE or per request); also a metrics label and part of the cache key
+SEARCH_MODES = ('fast', 'full')
+
+# Output formats (config.OUTPUT_FORMAT or per job). 'native' keeps whatever codec
+# YouTube serves (Opus -> .opus, AAC -> .m4a) and only remuxes, no decode/encode.
+OUTPUT_FORMATS = ('mp3', 'native', 'm4a', 'opus', 'flac')
+# Per-job bitrate: kbps for encoded formats, or an ffmpeg VBR quality level (0 = best)
+BITRATE_RANGE = (96, 320)
+VBR_QUALITIES = range(10)
+# Prefer a source stream that already has the target codec so ffmpeg can stream-copy it
+FORMAT_SELECTORS = {
+    'native': 'bestaudio/best',
+    'm4a': 'bestaudio[acodec^=mp4a]/bestaudio/best',
+    'opus': 'bestaudio[acodec=opus]/bestaudio/best',
+}
+
+# Conversion workers are started by a clean forkserver (spawn where there is none), never
+# forked from this heavily threaded process: locks held by other threads would be inherited.
+# The forkserver imports postprocess (yt-dlp, mutagen) once; workers are forked from it.
+CONVERT_CONTEXT = multiprocessing.get_context(
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+)
+if CONVERT_CONTEXT.get_start_method() == 'forkserver':
+    CONVERT_CONTEXT.set_forkserver_preload(['postprocess'])
+
+# Cover art: players widely support JPEG/PNG in ID3/MP4/Vorbis pictures, not WebP
+COVER_MIME_TYPES = ('image/jpeg', 'image/png')
+COVER_ATTEMPTS = 3
+
+def parse_bitrate(value):
+    """A bitrate as passed on to ffmpeg (preferredquality); ValueError if it is not allowed."""
+    try:
+        number = int(str(value).strip().lower().removesuffix('k'))
+    except ValueError:
+        number = None
+    if number is None or not (number in VBR_QUALITIES or BITRATE_RANGE[0] <= number <= BITRATE_RANGE[1]):
+        raise ValueError(f"Invalid bitrate '{value}' (use {BITRATE_RANGE[0]}-{BITRATE_RANGE[1]} kbps, "
+                         f"or a VBR quality {VBR_QUALITIES[0]}-{VBR_QUALITIES[-1]})")
+    return str(number)
+
 
 class MusicDownloader:
     def __init__(self):
@@ -18,17 +161,20 @@ class MusicDownloader:
                     'preferredcodec': 'mp3',
                     'preferredquality': '320',
                 },
-                {
-                    'key': 'EmbedThumbnail', 
-                },
-                {
-                    'key': 'FFmpegMetadata', 
-                    'add_metadata': True,
-                }
+                # No EmbedThumbnail / FFmpegMetadata: each rewrote the whole file.
+                # Tags and cover are written by postprocess.tag_file in a single save.
             ],
             'quiet': True,
             'no_warnings': True,
+            # quiet does not cover the progress bar; progress goes through the hooks
+            'noprogress': True,
             'overwrites': True,
+            # Transient HTTP / fragment errors are retried inside yt-dlp with growing pauses;
+            # whole failed jobs are retried by the JobQueue (DownloadScheduler.retry_delay)
+            'retries': 5,
+            'fragment_retries': 10,
+            'extractor_retries': 3,
+            'retry_sleep_functions': {'http': retry_sleep, 'fragment': retry_sleep, 'extractor': retry_sleep},
             # Fix 403 Forbidden: Force IPv4 and use Android client
             'source_address': '0.0.0.0', 
             'extractor_args': {
@@ -41,39 +187,255 @@ class MusicDownloader:
         if hasattr(config, 'BIN_DIR') and config.BIN_DIR and os.path.exists(config.BIN_DIR):
              self.base_opts['ffmpeg_location'] = config.BIN_DIR
 
+        # Warm YoutubeDL instances, one profile per set of options used below
+        self.ydl_pool = YoutubeDLPool()
+        self.ydl_pool.register('info', self._network_opts())
+        self.ydl_pool.register('search_fast', dict(self._network_opts(), ignoreerrors=True, extract_flat='in_playlist'))
+        # Full mode ensures we get 'uploader' and other metadata; flat only lists the entries
+        self.ydl_pool.register('search_full', dict(self._network_opts(), ignoreerrors=True, extract_flat=False))
+        self.ydl_pool.register('playlist', dict(self._network_opts(), ignoreerrors=True, extract_flat='in_playlist'))
+        # Stage 1 of downloads: raw audio only, format / outtmpl / hooks are set per download.
+        # The staging name is the job id: after a restart the resumed job continues
+        # its own .part file, and an already complete raw file is not fetched again
+        self.ydl_pool.register('download', dict(self.base_opts, postprocessors=[], overwrites=False, continuedl=True))
+        self.ydl_pool.warm('search_' + config.SEARCH_MODE, 'info')
+
+        # Default for jobs without a bitrate; it goes to ffmpeg, so it gets the same whitelist
+        try:
+            self.default_bitrate = parse_bitrate(config.AUDIO_BITRATE)
+        except ValueError as e:
+            log.error(f"audio_bitrate: {e}; using 320")
+            self.default_bitrate = '320'
+
+        # Persistent cache for search results (by normalized query) and info dicts (by video id)
+        self.cache = DiskCache(config.CACHE_DB, ttl=config.CACHE_TTL_HOURS * 3600, max_entries=config.CACHE_MAX_ENTRIES,
+                               ttls={'ai': AI_CACHE_TTL, 'recent': RECENT_TTL})
+        self._info_lock = threading.Lock()
+
+        # Keep-alive connection pool for the OpenAI API; identical in-flight requests share one call
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=8))
+        self.session.mount("http://", HTTPAdapter(pool_connections=2, pool_maxsize=8))
+        self._ai_lock = threading.Lock()
+        self._ai_inflight = {}
+
+        # Live download progress per job (fed by yt-dlp hooks)
+        self.progress = progress.ProgressStore()
+
+        # What already exists under DOWNLOAD_DIR (skip-if-present, search flags)
+        self.library = LibraryIndex(config.LIBRARY_DB, config.DOWNLOAD_DIR)
+
+        # Search-as-you-type: library names plus the searches users submitted (kept in the cache)
+        self.suggest = SuggestIndex(self.library, store=self.cache)
+
+        # Background hydration of flat search results (video_id -> Future)
+        self._detail_pool = ThreadPoolExecutor(max_workers=config.SEARCH_DETAIL_WORKERS, thread_name_prefix="details")
+        self._detail_pending = {}
+
+        # Stage 1 of downloads: bandwidth budget, throttling backoff, retry policy
+        self.scheduler = DownloadScheduler(
+            workers=config.MAX_CONCURRENT_DOWNLOADS,
+            bandwidth_limit=parse_bytes(config.BANDWIDTH_LIMIT) or 0,
+            full_speed_windows=config.FULL_SPEED_HOURS,
+            fragments=config.CONCURRENT_FRAGMENTS,
+            retries=config.DOWNLOAD_RETRIES,
+            retry_base=config.RETRY_DELAY,
+        )
+        self.scheduler.start()
+
+        # Stage 2 of downloads: ffmpeg conversion and tagging, sized for the CPU
+        self._convert_lock = threading.Lock()
+        self._convert_pool = self._new_convert_pool()
+
+    @staticmethod
+    def _new_convert_pool():
+        return ProcessPoolExecutor(max_workers=config.CONVERT_WORKERS, mp_context=CONVERT_CONTEXT,
+                                   initializer=logs.setup, initargs=(config.LOG_LEVEL,))
+
+    def _restart_convert_pool(self, broken):
+        """
+        A worker died (e.g. OOM-killed): the pool refuses all further work,
+        so it is replaced. Only the first caller for a broken pool does that.
+        """
+        with self._convert_lock:
+            if self._convert_pool is not broken:
+                return
+            log.warning("A conversion worker died, restarting the process pool")
+            self._convert_pool = self._new_convert_pool()
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _submit_convert(self, *args):
+        """
+        postprocess.process_track(*args) on the process pool. A pool that is
+        found broken, at submit or when a worker dies during this task, is
+        replaced; the task itself is not retried after a worker died.
+        """
+        pool = self._convert_pool
+        try:
+            future = pool.submit(postprocess.process_track, *args)
+        except BrokenProcessPool:
+            self._restart_convert_pool(pool)
+            pool = self._convert_pool
+            future = pool.submit(postprocess.process_track, *args)
+
+        def check(done):
+            if not done.cancelled() and isinstance(done.exception(), BrokenProcessPool):
+                self._restart_convert_pool(pool)
+        future.add_done_callback(check)
+        return future
+
+    def _cache_info(self, info):
+        video_id = info.get('id') if info else None
+        if not video_id:
+            return
+        info = yt_dlp.YoutubeDL.sanitize_info(info)
+        for key in INFO_SKIP_KEYS:
+            info.pop(key, None)
+        # Only formats with audio can be selected (bestaudio / best); video-only
+        # formats and storyboards are most of a YouTube info dict
+        formats = [f for f in info.get('formats') or [] if f.get('acodec') != 'none']
+        if formats:
+            info['formats'] = formats
+        self.cache.set('info', video_id, info)
+
+    def _get_cached_info(self, url, max_age=None):
+        video_id = YoutubeIE.get_temp_id(url)
+        if not video_id:
+            return None
+        return self._get_cached_info_by_id(video_id, max_age)
+
+    def _get_cached_info_by_id(self, video_id, max_age=None):
+        return self.cache.get('info', video_id, max_age=max_age)
+
+    @staticmethod
+    def _search_key(query, mode):
+        return f"{mode}:{' '.join(query.lower().split())}"
+
+    @staticmethod
+    def ai_cache_key(title, channel):
+        raw_key = json.dumps([AI_PROMPT_VERSION, config.OPENAI_MODEL, title, channel])
+        return hashlib.sha1(raw_key.encode('utf-8')).hexdigest()
+
     def _get_ai_metadata(self, title, channel):
         """
         Uses OpenAI API (via requests) to intelligently parse metadata.
+        Proposals are memoized per (title, channel, prompt version) and concurrent
+        identical requests wait for the same API call.
         Returns: (artists_list, song_title, album, year)
         """
         api_key = getattr(config, 'OPENAI_API_KEY', '')
         # Also check os.environ as fallback if config injection behaves differently
         if not api_key:
-             print("DEBUG: No OpenAI API Key found.")
+             log.debug("No OpenAI API Key found.")
              return None
 
+        key = self.ai_cache_key(title, channel)
+        cached = self.cache.get('ai', key)
+        if cached:
+            log.debug(f"Using memoized AI metadata for '{title}'")
+            return tuple(cached)
+
+        with self._ai_lock:
+            future = self._ai_inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._ai_inflight[key] = future
+
+        if not owner:
+            log.debug(f"Waiting for in-flight AI request for '{title}'")
+            return future.result()
+
+        result = None
         try:
-            import requests
-            import json
-            
-            prompt = f"""
+            result = self._request_ai_metadata(title, channel, api_key)
+            if result:
+                self.cache.set('ai', key, list(result))
+        finally:
+            with self._ai_lock:
+                del self._ai_inflight[key]
+            future.set_result(result)
+        return result
+
+    def ai_request(self, kind, items, api_key):
+        """
+        URL and request kwargs (headers, json, timeout) of a 'single' or 'batch'
+        completion for items [(title, channel), ...]; works with requests and httpx.
+        """
+        if kind == "batch":
+            prompt, timeout = self._ai_batch_prompt(items), self._ai_batch_timeout(items)
+        else:
+            prompt, timeout = self._ai_prompt(*items[0]), 10
+        headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        }
+        data = {
+            "model": config.OPENAI_MODEL,
+            "messages": [
+                {"role": "system", "content": "You are a music metadata expert. extract JSON only."},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": 0.3
+        }
+        return f"{config.OPENAI_API_BASE}/chat/completions", {'headers': headers, 'json': data, 'timeout': timeout}
+
+    def ai_response(self, kind, items, response, seconds, error=None):
+        """
+        Proposals from the answer to ai_request(kind, items): one tuple for
+        'single', a list in input order for 'batch'; None if the call failed
+        (`error`) or the answer is unusable. Records the AI metrics.
+        """
+        metrics.AI_SECONDS.observe(seconds, kind=kind)
+        try:
+            if error is not None:
+                raise error
+            response.raise_for_status()
+            content = response.json()['choices'][0]['message']['content']
+            log.debug(f"OpenAI raw response: {content}")
+            if kind == "batch":
+                proposals = self._parse_ai_batch(content, items)
+            else:
+                proposals = self._parse_ai_meta(json.loads(content), items[0][0])
+            metrics.AI_REQUESTS.inc(kind=kind, outcome="ok")
+            return proposals
+        except Exception as e:
+            metrics.AI_REQUESTS.inc(kind=kind, outcome="error")
+            log.error(f"OpenAI {'Batch ' if kind == 'batch' else ''}Error: {e}")
+            return None
+
+    def _post_ai(self, kind, items, api_key):
+        url, request = self.ai_request(kind, items, api_key)
+        log.debug("Calling OpenAI API", extra={'kind': kind})
+        start = time.perf_counter()
+        try:
+            response = self.session.post(url, **request)
+        except Exception as e:
+            return self.ai_response(kind, items, None, time.perf_counter() - start, error=e)
+        return self.ai_response(kind, items, response, time.perf_counter() - start)
+
+    @staticmethod
+    def _parse_ai_meta(meta, title):
+        artists = meta.get('artist', [])
+        if isinstance(artists, str): artists = [artists]
+        
+        parsed_title = meta.get('title', title)
+        parsed_album = meta.get('album', '')
+        parsed_year = meta.get('year', '')
+        
+        # FORCE: If album is generic or empty, use the Song Title
+        if not parsed_album or parsed_album.lower() in ['single', 'unknown', 'none', 'unknown album']:
+            parsed_album = parsed_title
+        
+        return (artists, parsed_title, parsed_album, parsed_year)
+
+    @staticmethod
+    def _ai_prompt(title, channel):
+        return f"""
             Analyze the following YouTube video info and extract music metadata.
             Video Title: "{title}"
             Channel Name: "{channel}"
-            
-            Task:
-            1. Identify the true Artist(s) and Song Title.
-            2. Identify the Release Year.
-            3. CLEAN the Title: Remove ALL junk like:
-               - "(Official Video)", "(Lyrics)", "(Live)", "(HD)", "(4K)", "Official Audio"
-               - "ft.", "feat.", "featuring" (Move these artists to the artist list instead)
-            
-            4. DETERMINE ALBUM:
-               - If it is CLEARLY from a specific album (e.g. "from the album 'Cloud Nine'"), use that album name.
-               - If it is a Single or the album is unknown, SET THE ALBUM NAME TO THE SONG TITLE.
-               - DO NOT use "- Single" suffix.
-               - Example: If Title is "Firestone", Album should be "Firestone".
-            
+            {AI_METADATA_RULES}
             Return STRICTLY valid JSON with these keys:
             - "artist": List of strings (Main artist first, then featured guests)
             - "title": String (Cleaned song title)
@@ -88,102 +450,311 @@ class MusicDownloader:
               "year": "2019"
             }}
             """
+
+    @staticmethod
+    def _ai_batch_prompt(items):
+        videos = "\n".join(
+            f'            {i}. Video Title: {json.dumps(title)} | Channel Name: {json.dumps(channel)}'
+            for i, (title, channel) in enumerate(items)
+        )
+        return f"""
+            Analyze each of the following YouTube videos and extract music metadata.
+{videos}
+            {AI_METADATA_RULES}
+            Return STRICTLY a valid JSON array with exactly {len(items)} objects, in the same order,
+            each with these keys:
+            - "index": Number of the video in the list above
+            - "artist": List of strings (Main artist first, then featured guests)
+            - "title": String (Cleaned song title)
+            - "album": String (See Rule 4)
+            - "year": String
             
-            headers = {
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json"
-            }
-            data = {
-                "model": "gpt-3.5-turbo",
-                "messages": [
-                    {"role": "system", "content": "You are a music metadata expert. extract JSON only."},
-                    {"role": "user", "content": prompt}
-                ],
-                "temperature": 0.3
-            }
-            
-            print("DEBUG: Calling OpenAI API...")
-            response = requests.post("https://api.openai.com/v1/chat/completions", headers=headers, json=data, timeout=10)
-            response.raise_for_status()
-            
-            result = response.json()
-            content = result['choices'][0]['message']['content']
-            print(f"DEBUG: OpenAI raw response: {content}")
-            
-            # Parse JSON from content
-            meta = json.loads(content)
-            
-            artists = meta.get('artist', [])
-            if isinstance(artists, str): artists = [artists]
-            
-            parsed_title = meta.get('title', title)
-            parsed_album = meta.get('album', '')
-            parsed_year = meta.get('year', '')
-            
-            # FORCE: If album is generic or empty, use the Song Title
-            if not parsed_album or parsed_album.lower() in ['single', 'unknown', 'none', 'unknown album']:
-                parsed_album = parsed_title
-            
-            return (artists, parsed_title, parsed_album, parsed_year)
-            
-        except Exception as e:
-            print(f"OpenAI Error: {e}")
-            return None
+            Example JSON:
+            [
+              {{"index": 0, "artist": ["Martin Garrix", "Macklemore"], "title": "Summer Days", "album": "Summer Days", "year": "2019"}}
+            ]
+            """
 
-    def search_video(self, query):
-        search_opts = {
+    @staticmethod
+    def _ai_batch_timeout(items):
+        return min(10 + 2 * len(items), 60)
+
+    def _parse_ai_batch(self, content, items):
+        """Proposal tuples in input order from a batch completion (raises if unusable)."""
+        metas = json.loads(content)
+        if isinstance(metas, dict):
+            # Some models wrap the array, e.g. {"results": [...]}
+            metas = next((v for v in metas.values() if isinstance(v, list)), None)
+        if not isinstance(metas, list) or len(metas) != len(items):
+            raise ValueError(f"Expected {len(items)} results, got {len(metas) if isinstance(metas, list) else 'none'}")
+        
+        if not all(isinstance(meta, dict) for meta in metas):
+            raise ValueError("Expected a JSON object per result")
+        # The indexes are only trusted if they are exactly 0..n-1; models often
+        # count from 1, which would shift every proposal onto the next title
+        indexes = [meta.get('index') for meta in metas]
+        if sorted(i for i in indexes if isinstance(i, int) and not isinstance(i, bool)) == list(range(len(items))):
+            metas = sorted(metas, key=lambda meta: meta['index'])
+        return [self._parse_ai_meta(meta, title) for meta, (title, channel) in zip(metas, items)]
+
+    def _request_ai_metadata(self, title, channel, api_key):
+        return self._post_ai("single", [(title, channel)], api_key)
+
+    def _request_ai_metadata_batch(self, items, api_key):
+        """
+        One completion for several (title, channel) pairs.
+        Returns a list of proposal tuples in input order, or None if the
+        response could not be used as a whole.
+        """
+        return self._post_ai("batch", items, api_key)
+
+    def _network_opts(self):
+        return {
             'quiet': True,
-            'default_search': 'ytsearch15', 
+            'no_warnings': True,
             'skip_download': True,
-            'ignoreerrors': True,
-            'extract_flat': False, # Changed to False to ensure we get 'uploader' and other metadata
-            # Copy robust network options
-            'source_address': '0.0.0.0',
-            'extractor_args': {
-                'youtube': {
-                    'player_client': ['android', 'web'],
-                }
-            }
+            'source_address': self.base_opts['source_address'],
+            'extractor_args': self.base_opts['extractor_args'],
+        }
+
+    def _video_summary(self, info):
+        thumbnail = info.get('thumbnail')
+        if not thumbnail and info.get('thumbnails'):
+            thumbnail = info['thumbnails'][-1].get('url')
+        video_id = info.get('id')
+        return {
+            'id': video_id,
+            'title': info.get('title'),
+            'uploader': info.get('uploader') or info.get('channel'),
+            'url': info.get('webpage_url') or info.get('url') or f"https://www.youtube.com/watch?v={video_id}",
+            'duration': info.get('duration'),
+            'thumbnail': thumbnail,
         }
+
+    def _hydrate(self, video_id):
+        info = self._get_cached_info_by_id(video_id)
+        if not info:
+            with self.ydl_pool.acquire('info') as ydl:
+                info = ydl.extract_info(f"https://www.youtube.com/watch?v={video_id}", download=False, process=False)
+            self._cache_info(info)
+        return self._video_summary(info)
+
+    def _hydrate_async(self, video_id):
+        with self._info_lock:
+            future = self._detail_pending.get(video_id)
+            if future is None:
+                future = self._detail_pool.submit(self._hydrate, video_id)
+                self._detail_pending[video_id] = future
+                future.add_done_callback(lambda f: self._forget_pending(video_id))
+        return future
+
+    def _forget_pending(self, video_id):
+        with self._info_lock:
+            self._detail_pending.pop(video_id, None)
+
+    def _flag_library(self, summary):
+        # Not stored in the search cache: the library changes independently
+        in_library = bool(self.library.present_ids([summary.get('id')]))
+        return dict(summary, in_library=in_library)
+
+    def get_video_details_async(self, video_id):
+        """Future resolving to the same summary as get_video_details."""
+        return self._hydrate_async(video_id)
+
+    def get_video_details(self, video_id, timeout=30):
+        """
+        Full details (uploader, duration, thumbnail) for a single video.
+        Served from cache if the background hydration already finished.
+        """
+        info = self._get_cached_info_by_id(video_id)
+        if info:
+            return self._video_summary(info)
+        return self._hydrate_async(video_id).result(timeout=timeout)
+
+    def search_video(self, query, mode=None, record=False, hydrate=True):
+        """
+        mode 'full': resolve every result before returning (slow, complete).
+        mode 'fast': flat search returning ids/titles right away; details are
+        fetched in the background and served through get_video_details.
+        record: add the query to the recent searches (user searches only).
+        hydrate=False: fast mode without the background detail fetches, for
+        callers that only need the flat title / uploader / duration.
+        """
+        mode = mode or config.SEARCH_MODE
         try:
-            with yt_dlp.YoutubeDL(search_opts) as ydl:
-                print(f"Searching for: {query}")
-                result = ydl.extract_info(query, download=False)
-                
-                results_list = []
-                
-                if 'entries' in result:
-                    for entry in result['entries']:
-                        if not entry: continue
-                        # Filter out obviously bad results if needed (e.g., extremely long/short)
-                        results_list.append({
-                            'id': entry.get('id'),
-                            'title': entry.get('title'),
-                            'uploader': entry.get('uploader'),
-                            'url': entry.get('url') or entry.get('webpage_url'),
-                            'duration': entry.get('duration'),
-                            # 'thumbnail': entry.get('thumbnail') # flat extraction might not have good thumbnails
-                        })
-                
-                return {'found': True, 'results': results_list}
+            results_list = list(self.iter_search(query, mode, record, hydrate))
+            return {'found': True, 'mode': mode, 'results': results_list}
 
         except Exception as e:
-            print(f"Search Error: {e}")
-            traceback.print_exc()
+            log.exception(f"Search Error: {e}", extra={'query': query})
             return {'found': False, 'error': str(e)}
 
+    def iter_search(self, query, mode=None, record=False, hydrate=True):
+        """
+        Generator behind search_video: yields one result summary as soon as
+        yt-dlp produces the corresponding search entry.
+        """
+        mode = mode or config.SEARCH_MODE
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode '{mode}' (use one of {', '.join(SEARCH_MODES)})")
+        fast = mode == 'fast'
+        start = time.perf_counter()
+        if record:
+            self.suggest.record(query)
+        cache_key = self._search_key(query, mode)
+        cached = self.cache.get('search', cache_key)
+        if cached is not None:
+            log.info(f"Search cache hit: {query}", extra={'mode': mode})
+            for summary in cached:
+                if fast and hydrate and not summary.get('hydrated') and summary.get('id'):
+                    self._hydrate_async(summary['id'])
+                yield self._flag_library(summary)
+            metrics.SEARCHES.inc(mode=mode, source="cache")
+            metrics.SEARCH_SECONDS.observe(time.perf_counter() - start, mode=mode, source="cache")
+            return
+
+        with self.ydl_pool.acquire('search_fast' if fast else 'search_full') as ydl:
+            log.info(f"Searching for: {query}", extra={'mode': mode})
+            try:
+                # process=False keeps 'entries' a lazy generator instead of resolving all 15 first
+                result = ydl.extract_info(f"ytsearch15:{query}", download=False, process=False)
+            except Exception:
+                metrics.SEARCH_ERRORS.inc()
+                raise
+            
+            results_list = []
+            for entry in result.get('entries') or []:
+                if not entry: continue
+                if fast:
+                    summary = self._video_summary(entry)
+                    summary['hydrated'] = False
+                    if hydrate and entry.get('id'):
+                        # Start resolving details now, the UI asks for them per row
+                        self._hydrate_async(entry['id'])
+                else:
+                    entry = ydl.process_ie_result(entry, download=False)
+                    if not entry: continue
+                    # Keep the fully resolved entry so download_track does not extract it again
+                    self._cache_info(entry)
+                    summary = self._video_summary(entry)
+                    summary['hydrated'] = True
+                # Filter out obviously bad results if needed (e.g., extremely long/short)
+                results_list.append(summary)
+                yield self._flag_library(summary)
+
+            # Only complete result lists are cached (not streams the client abandoned)
+            self.cache.set('search', cache_key, results_list)
+            metrics.SEARCHES.inc(mode=mode, source="youtube")
+            metrics.SEARCH_SECONDS.observe(time.perf_counter() - start, mode=mode, source="youtube")
+
+    def list_playlist(self, url, limit=None):
+        """
+        Flat extraction of a playlist / album / channel URL.
+        A bare channel URL lists its tabs (Videos, Shorts, Live) instead of
+        videos: then the Videos tab is read, or every tab if there is none.
+        limit: positive int or None.
+        Returns: {'title', 'uploader', 'entries': [video summaries in playlist order],
+                  'channel': True if the tabs had to be followed}
+        """
+        result, entries, nested = self._list_flat(url, limit)
+        channel = not entries and bool(nested)
+        if channel:
+            videos_tabs = [tab for tab in nested if tab.rstrip('/').endswith('/videos')]
+            seen = set()
+            for tab in videos_tabs or nested:
+                _, tab_entries, _ = self._list_flat(tab, limit - len(entries) if limit else None)
+                for entry in tab_entries:
+                    if entry['id'] not in seen:
+                        seen.add(entry['id'])
+                        entries.append(entry)
+                if limit and len(entries) >= limit:
+                    break
+            entries = entries[:limit] if limit else entries
+        
+        return {
+            'title': result.get('title'),
+            'uploader': result.get('uploader') or result.get('channel'),
+            'entries': entries,
+            'channel': channel,
+        }
+
+    def _list_flat(self, url, limit=None):
+        """One flat listing: (result, [video summaries], [urls of nested tabs / playlists])."""
+        with self.ydl_pool.acquire('playlist', playlistend=limit or None) as ydl:
+            log.info(f"Listing playlist: {url}")
+            result = ydl.extract_info(url, download=False)
+        
+        if not result:
+            raise ValueError("Could not read playlist")
+        
+        entries, nested = [], []
+        for entry in result.get('entries') or []:
+            if not entry:
+                continue
+            if entry.get('id') and entry.get('ie_key') in (None, 'Youtube'):
+                entries.append(self._video_summary(entry))
+            elif entry.get('url') and entry.get('ie_key') in ('YoutubeTab', 'YoutubePlaylist'):
+                nested.append(entry['url'])
+        return result, entries, nested
+
     def analyze_metadata(self, title, channel):
         """
         Generates metadata proposal for the selected video.
         """
         # Try AI first
         ai_proposal = self._get_ai_metadata(title, channel)
+        return self.build_proposal(ai_proposal, title, channel)
+
+    def analyze_metadata_batch(self, items):
+        """
+        Metadata proposals for many videos at once.
+        items: list of (title, channel). Memoized entries are reused, the rest is
+        sent to the AI in chunks of AI_BATCH_SIZE; anything the AI does not
+        answer falls back to clean_metadata per item.
+        """
+        api_key = getattr(config, 'OPENAI_API_KEY', '')
+        ai_results, chunks = self.memoized_ai_batch(items, api_key)
+        
+        for chunk in chunks:
+            log.info(f"Batch analyzing {len(chunk)} titles with AI")
+            parsed = self._request_ai_metadata_batch([items[i] for i in chunk], api_key)
+            self.remember_ai_batch(items, chunk, parsed, ai_results)
         
+        return [
+            self.build_proposal(ai_proposal, title, channel)
+            for ai_proposal, (title, channel) in zip(ai_results, items)
+        ]
+
+    def memoized_ai_batch(self, items, api_key):
+        """
+        Memoized AI proposals for items (None where missing) and the indexes
+        still to ask for, split into chunks of AI_BATCH_SIZE.
+        """
+        ai_results = [None] * len(items)
+        missing = []
+        if api_key:
+            for i, (title, channel) in enumerate(items):
+                cached = self.cache.get('ai', self.ai_cache_key(title, channel))
+                if cached:
+                    ai_results[i] = tuple(cached)
+                else:
+                    missing.append(i)
+        chunks = [missing[start:start + AI_BATCH_SIZE] for start in range(0, len(missing), AI_BATCH_SIZE)]
+        return ai_results, chunks
+
+    def remember_ai_batch(self, items, chunk, parsed, ai_results):
+        """Stores the proposals of one answered chunk in ai_results and the memo cache."""
+        for i, proposal in zip(chunk, parsed or []):
+            if proposal:
+                ai_results[i] = proposal
+                self.cache.set('ai', self.ai_cache_key(*items[i]), list(proposal))
+
+    def build_proposal(self, ai_proposal, title, channel):
         if ai_proposal:
             artists, final_title, album, year = ai_proposal
-            print("Using AI Metadata Proposal.")
+            log.debug("Using AI Metadata Proposal.")
         else:
-            print("Using Regex Metadata Proposal.")
+            log.debug("Using Regex Metadata Proposal.")
             artists, final_title = self.clean_metadata(channel, title)
             album = ""
             year = ""
@@ -200,7 +771,7 @@ class MusicDownloader:
         Smart parsing to separate Artist and Title correctly.
         Returns: (artists_list, song_title)
         """
-        artist_str = channel
+        artist_str = channel or ""
         song_title = title
         
         # 1. Separator Check: "MainArtist - SongTitle"
@@ -211,62 +782,99 @@ class MusicDownloader:
         
         # 2. Extract featured artists from Title (e.g. "Song (feat. X)")
         featured_artists = []
-        # Look for feat. patterns
-        feat_pattern = r"(?i)(?:feat\.?|ft\.?|featuring)\s+(.+?)(?=\)|\]|$)"
-        matches = re.findall(feat_pattern, song_title)
-        for match in matches:
+        for match in FEAT_RE.findall(song_title):
             # Clean match (remove trailing brackets if regex got greedy)
             feat_name = match.strip()
             if feat_name.endswith(')'): feat_name = feat_name[:-1]
             if feat_name.endswith(']'): feat_name = feat_name[:-1]
             featured_artists.append(feat_name)
 
-        # 3. Clean junk from Title
-        junk_patterns = [
-            r"\(Official Video\)", r"\(Official Audio\)", r"\(Lyrics\)", 
-            r"\[Official Video\]", r"\[Audio\]", 
-            r"(?i)[\(\[]?(?:feat\.?|ft\.?|featuring)\s+.+?[\)\]]?",
-            # Extra Cleaners
-            r"(?i)\[HD\]", r"(?i)\[HQ\]", r"(?i)\(HD\)", r"(?i)\(HQ\)",
-            r"(?i)\(Video\)", r"(?i)\[Video\]",
-            r"(?i)\(Official\)", r"(?i)\[Official\]",
-            r"(?i)4K", r"(?i)HD"
-        ]
-        for pattern in junk_patterns:
-            song_title = re.sub(pattern, "", song_title, flags=re.IGNORECASE).strip()
+        # 3. Clean junk from Title (single pass over all rules); removed
+        # brackets leave runs of spaces behind ("Get Lucky  [Lyrics]")
+        song_title = " ".join(TITLE_JUNK_RE.sub("", song_title).split())
 
         # 4. Split Artists String (e.g. "Martin Garrix, Macklemore & Patrick Stump")
         # We split by comma (,) and Ampersand (&) and " x "
-        artist_str = re.sub(r"(?i)\s+x\s+", " & ", artist_str)
-        primary_artists = re.split(r",|&", artist_str)
+        artist_str = ARTIST_X_RE.sub(" & ", artist_str)
         
-        # Clean and collect final list
-        final_artists = []
-        for a in primary_artists:
-            a = a.strip()
-            if a and a not in final_artists:
-                final_artists.append(a)
+        # Clean and collect final list (dict keeps order, O(1) dedup)
+        final_artists = {}
+        for a in ARTIST_SPLIT_RE.split(artist_str):
+            a = " ".join(a.split())
+            if a:
+                final_artists[a] = None
                 
         # Parse featured artists string too
         for f in featured_artists:
-            subs = re.split(r",|&", f)
-            for s in subs:
-                s = s.strip()
-                if s and s not in final_artists:
-                    final_artists.append(s)
+            for a in ARTIST_SPLIT_RE.split(f):
+                a = " ".join(a.split())
+                if a:
+                    final_artists[a] = None
 
         if not final_artists:
-            final_artists = ["Unknown Artist"]
+            return ["Unknown Artist"], song_title
+
+        return list(final_artists), song_title
 
-        return final_artists, song_title
+    def clean_metadata_many(self, items):
+        """
+        clean_metadata for a whole list of (channel, title) pairs, e.g. when
+        re-tagging a library. Returns a list of (artists_list, song_title).
+        A plain loop: it saves the per-call lookups, not the per-title regex work.
+        """
+        clean = self.clean_metadata
+        return [clean(channel, title) for channel, title in items]
+
+    def _audio_opts(self, output_format=None, bitrate=None):
+        """
+        Format selector and FFmpegExtractAudio settings for an output format.
+        'native' maps to preferredcodec 'best': the audio stream is copied into
+        a matching container (or left alone if it already is .m4a etc.).
+        """
+        output_format = (output_format or config.OUTPUT_FORMAT or 'mp3').lower()
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format '{output_format}' (use one of {', '.join(OUTPUT_FORMATS)})")
+        extract = {
+            'key': 'FFmpegExtractAudio',
+            'preferredcodec': 'best' if output_format == 'native' else output_format,
+            # Only used when ffmpeg actually has to encode
+            'preferredquality': parse_bitrate(bitrate) if bitrate not in (None, '') else self.default_bitrate,
+        }
+        return FORMAT_SELECTORS.get(output_format, self.base_opts['format']), extract
 
-    def download_track(self, url, manual_artists=None, manual_title=None, manual_album=None, manual_year=None):
+    def download_track(self, url, manual_artists=None, manual_title=None, manual_album=None, manual_year=None, track_number=None, progress_key=None, force=False,
+                       output_format=None, bitrate=None):
+        """
+        Downloads, converts and tags one track.
+        progress_key: if given (usually the job id), stages and byte counts are
+        reported to self.progress while the download runs.
+        force: download even if the library index already has this track.
+        output_format / bitrate: override config.OUTPUT_FORMAT / config.AUDIO_BITRATE.
+        Returns (success, message), or a Future of it once the raw download is
+        done and conversion/tagging was handed to the process pool.
+        """
+        report = self.progress.update
         try:
+            report(progress_key, stage=progress.METADATA, url=url, title=manual_title)
             if not os.path.exists(config.DOWNLOAD_DIR):
                 os.makedirs(config.DOWNLOAD_DIR, exist_ok=True)
             
+            # Skip tracks we already own (same video, or same artist/title)
+            if config.SKIP_EXISTING and not force:
+                existing = self.library.find(
+                    video_id=YoutubeIE.get_temp_id(url),
+                    artist=manual_artists[0] if manual_artists else None,
+                    title=manual_title,
+                )
+                if existing:
+                    log.info(f"Already in library, skipping: {existing}", extra={'job': progress_key})
+                    metrics.DOWNLOADS.inc(outcome="skipped")
+                    report(progress_key, stage=progress.DONE, file=os.path.basename(existing))
+                    return True, f"Already in library: {os.path.relpath(existing, config.DOWNLOAD_DIR)}"
+            
             # Phase 1: Meta
-            ydl_opts_info = { 'quiet': True, 'skip_download': True, 'format': 'bestaudio/best' }
+            # Resolve the video once (same network options as the download) and hand
+            # the info dict to Phase 2 instead of letting yt-dlp extract the URL again.
             
             artists_list = manual_artists if manual_artists else ["Unknown"]
             title = manual_title if manual_title else "Unknown"
@@ -274,22 +882,28 @@ class MusicDownloader:
             year = manual_year if manual_year else ""
             genre = "Unknown"
             
-            with yt_dlp.YoutubeDL(ydl_opts_info) as ydl:
-                print(f"Fetching metadata for {url}...")
-                info = ydl.extract_info(url, download=False)
-                
-                if not manual_artists or not manual_title:
-                     # Fallback if somehow not passed (should not happen with new UI)
-                     raw_channel = info.get('uploader', 'Unknown Artist')
-                     raw_title = info.get('title', 'Unknown Title')
-                     auto_artists, auto_title = self.clean_metadata(raw_channel, raw_title)
-                     if not manual_artists: artists_list = auto_artists
-                     if not manual_title: title = auto_title
-
-                if info.get('categories') and isinstance(info['categories'], list) and len(info['categories']) > 0:
-                    genre = info['categories'][0]
-                
-                print(f"Final Plan -> Artists: {artists_list}, Title: '{title}', Album: '{album}'")
+            info = self._get_cached_info(url, max_age=STREAM_URL_MAX_AGE)
+            if info:
+                log.debug(f"Using cached metadata for {url}")
+            else:
+                with self.ydl_pool.acquire('info') as ydl, metrics.EXTRACT_SECONDS.time():
+                    log.info(f"Fetching metadata for {url}", extra={'job': progress_key})
+                    # process=False: extract only, format selection happens in Phase 2
+                    info = ydl.extract_info(url, download=False, process=False)
+                self._cache_info(info)
+            
+            if not manual_artists or not manual_title:
+                 # Fallback if somehow not passed (should not happen with new UI)
+                 raw_channel = info.get('uploader', 'Unknown Artist')
+                 raw_title = info.get('title', 'Unknown Title')
+                 auto_artists, auto_title = self.clean_metadata(raw_channel, raw_title)
+                 if not manual_artists: artists_list = auto_artists
+                 if not manual_title: title = auto_title
+
+            if info.get('categories') and isinstance(info['categories'], list) and len(info['categories']) > 0:
+                genre = info['categories'][0]
+            
+            log.info("Final plan", extra={'job': progress_key, 'artists': artists_list, 'title': title, 'album': album})
 
             # Phase 2: Download
             filename_artist_str = artists_list[0]
@@ -313,52 +927,141 @@ class MusicDownloader:
             
             # Construct final paths: DownloadDir / Artist / Album
             final_dir = os.path.join(config.DOWNLOAD_DIR, safe_artist, safe_album)
-            if not os.path.exists(final_dir):
-                os.makedirs(final_dir, exist_ok=True)
+            final_base = os.path.join(final_dir, f"{safe_artist} - {safe_title}")
 
-            final_filename = f"{safe_artist} - {safe_title}.mp3"
+            # Stage 1 (this thread, network bound): raw audio into the staging folder.
+            # Conversion runs in stage 2 so the next download can start meanwhile.
+            audio_format, extract = self._audio_opts(output_format, bitrate)
+            os.makedirs(config.STAGING_DIR, exist_ok=True)
+            staging_name = progress_key or uuid.uuid4().hex[:12]
+            hooks = self.progress.hooks(progress_key) if progress_key else None
             
-            dl_opts = copy.deepcopy(self.base_opts)
-            # We explicitly set the path including the artist/album folder
-            dl_opts['outtmpl'] = os.path.join(final_dir, f"{safe_artist} - {safe_title}.%(ext)s")
+            # Fetch the cover while the audio downloads
+            cover_future = self._detail_pool.submit(self._fetch_cover, info)
             
-            print(f"Starting Download -> {final_filename} in {final_dir}")
+            def waiting(reason):
+                log.info(f"Download waiting: {reason}", extra={'job': progress_key})
+                report(progress_key, stage=progress.WAITING, title=title, reason=reason)
+
+            outtmpl = os.path.join(config.STAGING_DIR, f"{staging_name}.%(ext)s")
+            with self.ydl_pool.acquire('download', progress_hooks=hooks, format=audio_format, outtmpl=outtmpl) as ydl_dl, \
+                    self.scheduler.slot(ydl_dl.params, on_wait=waiting):
+                log.info(f"Starting download -> {final_base}", extra={'job': progress_key, 'staging': staging_name,
+                                                                      'ratelimit': ydl_dl.params['ratelimit']})
+                report(progress_key, stage=progress.DOWNLOADING, title=title, file=os.path.basename(final_base))
+                fetch_start = time.perf_counter()
+                # Strip per-run fields (selected formats, filenames) so the cached
+                # info is processed like a fresh extraction, without the network hit.
+                result = ydl_dl.process_ie_result(ydl_dl.sanitize_info(info, remove_private_keys=True), download=True)
             
-            with yt_dlp.YoutubeDL(dl_opts) as ydl_dl:
-                ydl_dl.download([url])
-                
-            final_path = os.path.join(final_dir, final_filename)
+            downloads = (result or {}).get('requested_downloads') or [{}]
+            staged_path = downloads[0].get('filepath')
+            if not staged_path or not os.path.exists(staged_path):
+                raise RuntimeError("Download finished without an output file")
+            fetch_seconds = time.perf_counter() - fetch_start
+            fetched_bytes = os.path.getsize(staged_path)
+            metrics.DOWNLOAD_SECONDS.observe(fetch_seconds)
+            metrics.DOWNLOAD_BYTES.inc(fetched_bytes)
+            if fetch_seconds > 0:
+                metrics.DOWNLOAD_THROUGHPUT.observe(fetched_bytes / fetch_seconds)
+            log.info("Fetched raw audio", extra={'job': progress_key, 'bytes': fetched_bytes, 'seconds': round(fetch_seconds, 3)})
             
-            if os.path.exists(final_path):
-                self._tag_file(final_path, artists_list, title, album, year, genre)
-                self._tag_file(final_path, artists_list, title, album, year, genre)
-                return True, f"Saved: {safe_artist}/{safe_album}/{final_filename}"
-            else:
-                return True, f"Downloaded (Check folder): {safe_artist}/{safe_album}/{final_filename}"
+            # Stage 2 (process pool, CPU bound): convert, tag, move into the library
+            report(progress_key, stage=progress.CONVERTING)
+            tags = {
+                'artists_list': artists_list, 'title': title, 'album': album, 'year': year, 'genre': genre,
+                'track_number': track_number, 'source_url': info.get('webpage_url') or url,
+            }
+            converted = self._submit_convert(
+                staged_path, final_base, extract['preferredcodec'], extract['preferredquality'],
+                tags, cover_future.result(), self.base_opts.get('ffmpeg_location')
+            )
+            done = Future()
+            video_id = info.get('id')
+
+            def finish(future):
+                # The job stays running until `done` resolves: it must resolve whatever happens here
+                try:
+                    result = self._finish_track(future, staged_path, video_id, artists_list[0], title, progress_key)
+                except Exception as e:
+                    log.exception(f"Finishing the download failed: {e}", extra={'job': progress_key})
+                    self.progress.update(progress_key, stage=progress.FAILED, error=str(e))
+                    result = (False, str(e))
+                done.set_result(result)
+            converted.add_done_callback(finish)
+            return done
 
         except Exception as e:
-            print(f"Download Error: {e}")
-            import traceback
-            traceback.print_exc()
+            report(progress_key, stage=progress.FAILED, error=str(e))
+            metrics.DOWNLOADS.inc(outcome="failed")
+            log.exception(f"Download Error: {e}", extra={'job': progress_key})
             return False, str(e)
 
-    def _tag_file(self, filepath, artists_list, title, album, year, genre):
-        try:
+    def cleanup_temporaries(self, keep=()):
+        """
+        Startup cleanup after a crash or restart: staging files of jobs that are
+        not being resumed. Only STAGING_DIR is touched; every partial download
+        and conversion temp file lives there. The download folder itself may
+        be shared (/media) and is never swept.
+        keep: job ids whose staging files belong to a resumed job.
+        """
+        removed = []
+        if os.path.isdir(config.STAGING_DIR):
+            for entry in os.scandir(config.STAGING_DIR):
+                if entry.is_file() and entry.name.split('.', 1)[0] not in keep:
+                    removed.append(entry.path)
+        for path in removed:
             try:
-                tags = EasyID3(filepath)
-            except ID3NoHeaderError:
-                tags = EasyID3()
-            
-            tags['artist'] = artists_list
-            tags['title'] = title
-            tags['album'] = album
-            tags['genre'] = genre
-            if year:
-                tags['date'] = year
-                tags['originaldate'] = year
-            
-            tags.save(filepath)
-            print(f"Tags updated: Artists={artists_list}, Title='{title}', Album='{album}'")
-            
+                os.remove(path)
+            except OSError as e:
+                log.warning(f"Could not remove temporary file {path}: {e}")
+        if removed:
+            log.info(f"Removed {len(removed)} orphaned temporary file(s)")
+        return removed
+
+    def _finish_track(self, future, staged_path, video_id, artist, title, progress_key):
+        """Stage 2 completion: index the file and report. Returns (success, message)."""
+        try:
+            final_path, timings = future.result()
         except Exception as e:
-            print(f"Tagging Error: {e}")
+            message = getattr(e, 'msg', None) or str(e)
+            self.progress.update(progress_key, stage=progress.FAILED, error=message)
+            metrics.DOWNLOADS.inc(outcome="failed")
+            log.error(f"Conversion Error: {message}", exc_info=e, extra={'job': progress_key})
+            if os.path.exists(staged_path):
+                os.remove(staged_path)
+            return False, message
+        metrics.TRANSCODE_SECONDS.observe(timings['transcode_seconds'])
+        metrics.TAG_SECONDS.observe(timings['tag_seconds'])
+        metrics.DOWNLOADS.inc(outcome="done")
+        log.info(f"Saved {final_path}", extra=dict({'job': progress_key}, **{k: round(v, 3) for k, v in timings.items()}))
+        self.library.add(final_path, video_id=video_id, artist=artist, title=title)
+        self.progress.update(progress_key, stage=progress.DONE, file=os.path.basename(final_path))
+        # Measured in the worker: convert, then tag, ending about now
+        tagged = time.time() - timings['tag_seconds']
+        self.progress.record_stages(progress_key, {
+            progress.CONVERTING: (tagged - timings['transcode_seconds'], timings['transcode_seconds']),
+            progress.TAGGING: (tagged, timings['tag_seconds']),
+        })
+        return True, f"Saved: {os.path.relpath(final_path, config.DOWNLOAD_DIR)}"
+
+    def _fetch_cover(self, info):
+        """
+        Cover art for the tags: best JPEG/PNG thumbnail from the info dict.
+        Returns (mime, data) or None.
+        """
+        thumbnails = [t['url'] for t in info.get('thumbnails') or [] if t.get('url')]
+        if info.get('thumbnail'):
+            thumbnails.append(info['thumbnail'])
+        # yt-dlp lists thumbnails worst first; try the best JPEGs before anything else
+        thumbnails.reverse()
+        thumbnails.sort(key=lambda u: not u.split('?')[0].endswith(('.jpg', '.jpeg', '.png')))
+        for thumb_url in thumbnails[:COVER_ATTEMPTS]:
+            try:
+                response = self.session.get(thumb_url, timeout=10)
+                mime = response.headers.get('Content-Type', '').split(';')[0].strip()
+                if response.status_code == 200 and mime in COVER_MIME_TYPES:
+                    return mime, response.content
+            except requests.RequestException as e:
+                log.warning(f"Cover fetch failed ({thumb_url}): {e}")
+        return None
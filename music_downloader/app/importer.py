@@ -0,0 +1,168 @@
+import re
+import threading
+import time
+import uuid
+import logging
+
+log = logging.getLogger("importer")
+
+# Import / item stages
+LISTING = "listing"
+RESOLVING = "resolving"
+ANALYZING = "analyzing"
+QUEUED = "queued"
+FINISHED = "finished"
+FAILED = "failed"
+
+# YouTube Music album playlists are titled "Album - <name>"
+ALBUM_PREFIX_RE = re.compile(r"^Album\s*-\s*", re.IGNORECASE)
+
+
+class PlaylistImport:
+    def __init__(self, url, album=None, as_album=None, limit=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.url = url
+        self.album = album
+        self.as_album = as_album
+        self.limit = limit
+        self.status = LISTING
+        self.message = ""
+        self.title = None
+        self.items = []
+        self.created_at = time.time()
+        self.finished_at = None
+
+
+class PlaylistImporter:
+    """
+    Bulk import of a playlist / album / channel:
+    flat listing -> parallel info resolution (MusicDownloader detail pool)
+    -> one batched metadata analysis -> downloads on the shared JobQueue.
+    Album and track number tags come from the playlist order.
+    """
+    def __init__(self, loader, jobs, history=20):
+        self.loader = loader
+        self.jobs = jobs
+        self.history = history
+        self._imports = {}
+        self._order = []
+        self._lock = threading.Lock()
+
+    def start(self, url, album=None, as_album=None, limit=None):
+        """
+        as_album: tag the items as one album named after the playlist, with
+        track numbers. None = yes, unless the URL was a whole channel.
+        """
+        imp = PlaylistImport(url, album=album, as_album=as_album, limit=limit)
+        with self._lock:
+            self._imports[imp.id] = imp
+            self._order.append(imp.id)
+            while len(self._order) > self.history:
+                del self._imports[self._order.pop(0)]
+        thread = threading.Thread(target=self._run, args=(imp,), name=f"import-{imp.id}")
+        thread.daemon = True
+        thread.start()
+        return imp
+
+    def get(self, import_id):
+        with self._lock:
+            imp = self._imports.get(import_id)
+        return self._to_dict(imp) if imp else None
+
+    def list(self):
+        with self._lock:
+            imports = [self._imports[i] for i in self._order]
+        return [self._to_dict(imp, items=False) for imp in imports]
+
+    def _to_dict(self, imp, items=True):
+        result = {
+            'id': imp.id,
+            'url': imp.url,
+            'title': imp.title,
+            'album': imp.album,
+            'status': imp.status,
+            'message': imp.message,
+            'created_at': imp.created_at,
+            'finished_at': imp.finished_at,
+            'total': len(imp.items),
+        }
+        with self._lock:
+            raw_items = [dict(item) for item in imp.items]
+        counts = {}
+        item_list = []
+        for item in raw_items:
+            # Live download state comes from the job queue
+            if item.get('job_id'):
+                job = self.jobs.get(item['job_id'])
+                if job:
+                    item['stage'] = job['status']
+                    item['message'] = job['message']
+            counts[item['stage']] = counts.get(item['stage'], 0) + 1
+            item_list.append(item)
+        result['counts'] = counts
+        if imp.status == QUEUED and item_list and all(i['stage'] in ('done', FAILED) for i in item_list):
+            result['status'] = FINISHED
+        if items:
+            result['items'] = item_list
+        return result
+
+    def _set(self, imp, **fields):
+        with self._lock:
+            for key, value in fields.items():
+                setattr(imp, key, value)
+
+    def _run(self, imp):
+        try:
+            playlist = self.loader.list_playlist(imp.url, limit=imp.limit)
+            entries = playlist['entries']
+            album = imp.album
+            as_album = imp.as_album if imp.as_album is not None else not playlist.get('channel')
+            if not album and as_album:
+                album = ALBUM_PREFIX_RE.sub("", playlist['title'] or "").strip() or None
+            items = [
+                {'index': i + 1, 'id': e['id'], 'url': e['url'], 'title': e['title'],
+                 'uploader': e['uploader'], 'stage': RESOLVING, 'message': "", 'job_id': None}
+                for i, e in enumerate(entries)
+            ]
+            self._set(imp, title=playlist['title'], album=album, items=items, status=RESOLVING)
+            log.info(f"Import {imp.id}: {len(items)} item(s) from '{playlist['title']}'", extra={'import_id': imp.id, 'items': len(items)})
+
+            # Resolve uploader etc. in parallel (bounded by the detail pool)
+            futures = [(item, self.loader.get_video_details_async(item['id'])) for item in items]
+            for item, future in futures:
+                try:
+                    details = future.result(timeout=120)
+                    with self._lock:
+                        item['title'] = details.get('title') or item['title']
+                        item['uploader'] = details.get('uploader') or item['uploader']
+                        item['stage'] = ANALYZING
+                except Exception as e:
+                    with self._lock:
+                        item['stage'] = FAILED
+                        item['message'] = f"Could not resolve: {e}"
+
+            self._set(imp, status=ANALYZING)
+            todo = [item for item in items if item['stage'] != FAILED]
+            proposals = self.loader.analyze_metadata_batch([(item['title'], item['uploader']) for item in todo])
+
+            total = len(items)
+            for item, proposal in zip(todo, proposals):
+                track_album = album or proposal['proposal_album']
+                track_number = f"{item['index']}/{total}" if album else None
+                job = self.jobs.submit(
+                    self.loader.download_track, item['url'],
+                    proposal['proposal_artists'], proposal['proposal_title'], track_album, proposal['proposal_year'],
+                    track_number=track_number, label=f"{imp.title} #{item['index']}", id_kwarg='progress_key'
+                )
+                with self._lock:
+                    item['artists'] = proposal['proposal_artists']
+                    item['title'] = proposal['proposal_title']
+                    item['stage'] = QUEUED
+                    item['job_id'] = job.id
+
+            self._set(imp, status=QUEUED, message=f"{len(todo)} of {total} download(s) queued")
+        except Exception as e:
+            log.exception(f"Import {imp.id} failed: {e}", extra={'import_id': imp.id})
+            self._set(imp, status=FAILED, message=str(e))
+        finally:
+            self._set(imp, finished_at=time.time())
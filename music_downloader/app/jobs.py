@@ -0,0 +1,278 @@
+import threading
+import queue
+import time
+import uuid
+import json
+import os
+import sqlite3
+import logging
+from concurrent.futures import Future
+
+log = logging.getLogger("jobs")
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class Job:
+    def __init__(self, func, args=None, kwargs=None, label=None, job_id=None):
+        self.id = job_id or uuid.uuid4().hex[:12]
+        self.func = func
+        self.args = args or ()
+        self.kwargs = kwargs or {}
+        self.label = label
+        self.status = QUEUED
+        self.attempts = 0
+        self.message = ""
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def to_dict(self):
+        now = time.time()
+        wait_end = self.started_at or now
+        run_end = self.finished_at or now
+        return {
+            'id': self.id,
+            'label': self.label,
+            'status': self.status,
+            'message': self.message,
+            'attempts': self.attempts + 1,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'wait_seconds': round(wait_end - self.created_at, 3),
+            'run_seconds': round(run_end - self.started_at, 3) if self.started_at else None,
+        }
+
+
+class JobJournal:
+    """
+    Persistent record (SQLite) of queued and running jobs: callable name,
+    arguments and current stage. Lets JobQueue.resume() pick them up again
+    after a restart. Finished jobs are removed.
+    """
+    def __init__(self, path):
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                label TEXT,
+                args TEXT NOT NULL,
+                kwargs TEXT NOT NULL,
+                id_kwarg TEXT,
+                status TEXT NOT NULL,
+                stage TEXT,
+                created_at REAL
+            )
+        """)
+        self._conn.commit()
+
+    def add(self, job, id_kwarg=None):
+        try:
+            args, kwargs = json.dumps(job.args), json.dumps(job.kwargs)
+        except (TypeError, ValueError) as e:
+            log.warning(f"Job {job.id} not journaled: {e}", extra={'job': job.id})
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (id, name, label, args, kwargs, id_kwarg, status, stage, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, NULL, ?)",
+                (job.id, job.func.__name__, job.label, args, kwargs, id_kwarg, job.status, job.created_at)
+            )
+            self._conn.commit()
+
+    def set_status(self, job_id, status):
+        self._update("UPDATE jobs SET status = ? WHERE id = ?", (status, job_id))
+
+    def set_stage(self, job_id, stage):
+        self._update("UPDATE jobs SET stage = ? WHERE id = ?", (stage, job_id))
+
+    def remove(self, job_id):
+        self._update("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def unfinished(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, name, label, args, kwargs, id_kwarg, stage, created_at FROM jobs ORDER BY created_at"
+            ).fetchall()
+        return [
+            {'id': r[0], 'name': r[1], 'label': r[2], 'args': json.loads(r[3]), 'kwargs': json.loads(r[4]),
+             'id_kwarg': r[5], 'stage': r[6], 'created_at': r[7]}
+            for r in rows
+        ]
+
+    def _update(self, sql, params):
+        with self._lock:
+            self._conn.execute(sql, params)
+            self._conn.commit()
+
+
+class JobQueue:
+    """
+    Bounded worker pool for long running tasks (downloads).
+    Jobs are executed FIFO by a fixed number of worker threads.
+    The callable must return (success, message), or a Future of it when the
+    rest of the work continues elsewhere (MusicDownloader.download_track hands
+    conversion to a process pool): the job stays running until the Future
+    resolves, but the worker is free for the next job right away.
+    With a JobJournal, queued and running jobs survive a restart (see resume()).
+    retry(attempt, message) -> seconds or None decides whether a failed job is
+    queued again (attempt counts from 0) and after how long.
+    """
+    def __init__(self, workers=2, history=200, journal=None, retry=None):
+        self.workers = max(1, int(workers))
+        self.history = history
+        self.journal = journal
+        self.retry = retry
+        self._queue = queue.Queue()
+        self._jobs = {}
+        self._order = []
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        if self._threads:
+            return
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"job-worker-{i}")
+            t.daemon = True
+            t.start()
+            self._threads.append(t)
+        log.info(f"Job queue started with {self.workers} worker(s)", extra={'workers': self.workers})
+
+    def submit(self, func, *args, label=None, id_kwarg=None, **kwargs):
+        """
+        Queues func(*args, **kwargs). With id_kwarg the new job id is passed
+        to func under that keyword (e.g. progress_key for download_track).
+        """
+        job = Job(func, args, kwargs, label=label)
+        if id_kwarg:
+            job.kwargs[id_kwarg] = job.id
+        if self.journal:
+            self.journal.add(job, id_kwarg)
+        self._enqueue(job)
+        return job
+
+    def resume(self, functions):
+        """
+        Re-queues the journal's unfinished jobs under their old ids.
+        functions: callable name -> callable (e.g. {'download_track': loader.download_track}).
+        Returns the resumed job ids.
+        """
+        if not self.journal:
+            return []
+        resumed = []
+        for entry in self.journal.unfinished():
+            func = functions.get(entry['name'])
+            if not func:
+                log.warning(f"Job {entry['id']}: cannot resume unknown task '{entry['name']}'", extra={'job': entry['id']})
+                self.journal.remove(entry['id'])
+                continue
+            job = Job(func, entry['args'], entry['kwargs'], label=entry['label'], job_id=entry['id'])
+            job.created_at = entry['created_at']
+            if entry['id_kwarg']:
+                job.kwargs[entry['id_kwarg']] = job.id
+            self.journal.set_status(job.id, QUEUED)
+            self._enqueue(job)
+            resumed.append(job.id)
+            log.info(f"Job {job.id} resumed: {job.label}", extra={'job': job.id, 'stage': entry['stage'] or QUEUED})
+        return resumed
+
+    def _enqueue(self, job):
+        with self._lock:
+            self._jobs[job.id] = job
+            self._order.append(job.id)
+            self._prune()
+        self._queue.put(job)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.to_dict() if job else None
+
+    def list(self):
+        with self._lock:
+            return [self._jobs[j].to_dict() for j in self._order]
+
+    def stats(self):
+        with self._lock:
+            counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+        counts['workers'] = self.workers
+        return counts
+
+    def _prune(self):
+        # Drop the oldest finished jobs once history is exceeded (lock must be held)
+        excess = len(self._order) - self.history
+        if excess <= 0:
+            return
+        keep = []
+        for job_id in self._order:
+            job = self._jobs[job_id]
+            if excess > 0 and job.status in (DONE, FAILED):
+                del self._jobs[job_id]
+                excess -= 1
+            else:
+                keep.append(job_id)
+        self._order = keep
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                job.status = RUNNING
+                job.started_at = time.time()
+            if self.journal:
+                self.journal.set_status(job.id, RUNNING)
+            log.info(f"Job {job.id} started: {job.label}", extra={'job': job.id, 'wait_seconds': round(job.started_at - job.created_at, 3)})
+            try:
+                result = job.func(*job.args, **job.kwargs)
+            except Exception as e:
+                log.exception(f"Job {job.id} raised: {e}", extra={'job': job.id})
+                result = (False, str(e))
+            if isinstance(result, Future):
+                result.add_done_callback(lambda future, job=job: self._finish(job, future.result()))
+            else:
+                self._finish(job, result)
+            self._queue.task_done()
+
+    def _finish(self, job, result):
+        success, message = result if isinstance(result, tuple) else (bool(result), "")
+        delay = self.retry(job.attempts, message) if self.retry and not success else None
+        if delay is not None:
+            self._retry_later(job, delay, message)
+            return
+        status = DONE if success else FAILED
+        with self._lock:
+            job.status = status
+            job.message = message
+            job.finished_at = time.time()
+        if self.journal:
+            self.journal.remove(job.id)
+        log.info(f"Job {job.id} {status}: {message}", extra={'job': job.id, 'status': status, 'run_seconds': round(job.finished_at - job.started_at, 3)})
+
+    def _retry_later(self, job, delay, message):
+        with self._lock:
+            job.attempts += 1
+            job.status = QUEUED
+            job.message = f"Attempt {job.attempts} failed, retrying in {delay:.0f}s: {message}"
+            job.started_at = None
+        # Still journaled: a restart before the timer fires resumes it right away
+        if self.journal:
+            self.journal.set_status(job.id, QUEUED)
+        log.warning(f"Job {job.id} failed, retry {job.attempts} in {delay:.0f}s: {message}",
+                    extra={'job': job.id, 'attempt': job.attempts, 'delay': delay})
+        timer = threading.Timer(delay, self._queue.put, args=(job,))
+        timer.daemon = True
+        timer.start()
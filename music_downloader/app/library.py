@@ -0,0 +1,274 @@
+import os
+import re
+import hashlib
+import sqlite3
+import threading
+import time
+import logging
+import mutagen
+from mutagen.easyid3 import EasyID3
+from yt_dlp.extractor.youtube import YoutubeIE
+
+log = logging.getLogger("library")
+
+AUDIO_EXTENSIONS = ('.mp3', '.m4a', '.opus', '.ogg', '.flac', '.aac', '.wav')
+
+# Bytes sampled from the middle of the file for the content fingerprint
+FINGERPRINT_SAMPLE = 64 * 1024
+
+NORMALIZE_RE = re.compile(r"[^\w]+", re.UNICODE)
+
+
+def normalize(text):
+    """Lowercase, punctuation-free key used to match artist/title pairs."""
+    return NORMALIZE_RE.sub(" ", (text or "").lower()).strip()
+
+
+def fingerprint(path, size):
+    """
+    Cheap content fingerprint: file size plus a hash of a sample from the
+    middle of the file. Detects identical files without reading them fully.
+    """
+    h = hashlib.sha1(str(size).encode())
+    with open(path, 'rb') as f:
+        f.seek(max(0, size // 2 - FINGERPRINT_SAMPLE // 2))
+        h.update(f.read(FINGERPRINT_SAMPLE))
+    return h.hexdigest()
+
+
+class LibraryIndex:
+    """
+    Persistent index (SQLite) of the audio files under the download folder.
+    Maps YouTube video id and normalized artist/title to file path, size and
+    fingerprint. rescan() is incremental: files in folders whose mtime did not
+    change since the last scan are not stat'ed or re-read.
+    """
+    def __init__(self, path, root):
+        self.path = path
+        self.root = root
+        self._lock = threading.Lock()
+        self._scan_lock = threading.Lock()
+        self.last_scan = None
+        # Bumped on every change, lets in-memory views (suggestions) know when to rebuild
+        self.version = 0
+
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS tracks (
+                path TEXT PRIMARY KEY,
+                dir TEXT NOT NULL,
+                video_id TEXT,
+                artist TEXT,
+                title TEXT,
+                size INTEGER,
+                mtime REAL,
+                fingerprint TEXT
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tracks_video ON tracks (video_id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tracks_name ON tracks (artist, title)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tracks_dir ON tracks (dir)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS dirs (path TEXT PRIMARY KEY, mtime REAL)")
+        self._conn.commit()
+
+    # --- Lookups ---
+
+    def find(self, video_id=None, artist=None, title=None):
+        """Path of an indexed file for this video id or artist/title, or None."""
+        rows = []
+        with self._lock:
+            if video_id:
+                rows += self._conn.execute("SELECT path FROM tracks WHERE video_id = ?", (video_id,)).fetchall()
+            if artist and title:
+                rows += self._conn.execute(
+                    "SELECT path FROM tracks WHERE artist = ? AND title = ?", (normalize(artist), normalize(title))
+                ).fetchall()
+        for (path,) in rows:
+            if os.path.exists(path):
+                return path
+            self._remove(path)
+        return None
+
+    def present_ids(self, video_ids):
+        """Subset of video_ids that are in the index (no filesystem check)."""
+        video_ids = [v for v in video_ids if v]
+        if not video_ids:
+            return set()
+        marks = ",".join("?" * len(video_ids))
+        with self._lock:
+            rows = self._conn.execute(f"SELECT video_id FROM tracks WHERE video_id IN ({marks})", video_ids).fetchall()
+        return {row[0] for row in rows}
+
+    def duplicates(self):
+        """Groups of files with the same fingerprint or the same artist/title."""
+        with self._lock:
+            by_print = self._conn.execute("""
+                SELECT GROUP_CONCAT(path, '\n') FROM tracks WHERE fingerprint IS NOT NULL
+                GROUP BY fingerprint HAVING COUNT(*) > 1
+            """).fetchall()
+            by_name = self._conn.execute("""
+                SELECT GROUP_CONCAT(path, '\n') FROM tracks WHERE artist != '' AND title != ''
+                GROUP BY artist, title HAVING COUNT(*) > 1
+            """).fetchall()
+        return {
+            'identical': [row[0].split('\n') for row in by_print],
+            'same_title': [row[0].split('\n') for row in by_name],
+        }
+
+    def names(self):
+        """(path, artist, title) of every indexed track; artist/title are normalized."""
+        with self._lock:
+            return self._conn.execute("SELECT path, artist, title FROM tracks").fetchall()
+
+    def stats(self):
+        with self._lock:
+            count, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM tracks").fetchone()
+        return {'tracks': count, 'bytes': size, 'last_scan': self.last_scan}
+
+    # --- Updates ---
+
+    def add(self, path, video_id=None, artist=None, title=None):
+        """Index a file right after it was written (no rescan needed)."""
+        try:
+            st = os.stat(path)
+            print_ = fingerprint(path, st.st_size)
+        except OSError as e:
+            log.warning(f"Could not index {path}: {e}")
+            return
+        with self._lock:
+            self._upsert(path, video_id, artist, title, st.st_size, st.st_mtime, print_)
+            self._conn.commit()
+            self.version += 1
+
+    def start_periodic_scan(self, interval):
+        """Scan once now and then every `interval` seconds in a daemon thread."""
+        def loop():
+            while True:
+                try:
+                    self.rescan()
+                except Exception as e:
+                    log.exception(f"Library scan failed: {e}")
+                if not interval:
+                    return
+                time.sleep(interval)
+        thread = threading.Thread(target=loop, name="library-scan")
+        thread.daemon = True
+        thread.start()
+
+    def rescan(self):
+        """Incremental scan of the download folder. Returns counters."""
+        if not self._scan_lock.acquire(blocking=False):
+            return {'skipped': 'scan already running'}
+        try:
+            return self._rescan()
+        finally:
+            self._scan_lock.release()
+
+    def _rescan(self):
+        start = time.time()
+        counts = {'dirs_listed': 0, 'dirs_unchanged': 0, 'indexed': 0, 'removed': 0}
+        with self._lock:
+            known_dirs = dict(self._conn.execute("SELECT path, mtime FROM dirs").fetchall())
+        seen_dirs = set()
+        stack = [self.root] if os.path.isdir(self.root) else []
+
+        while stack:
+            folder = stack.pop()
+            seen_dirs.add(folder)
+            try:
+                mtime = os.stat(folder).st_mtime
+                entries = list(os.scandir(folder))
+            except OSError:
+                continue
+            # Hidden folders (e.g. the download staging area) are not part of the library
+            stack.extend(e.path for e in entries if e.is_dir(follow_symlinks=False) and not e.name.startswith('.'))
+
+            if known_dirs.get(folder) == mtime:
+                counts['dirs_unchanged'] += 1
+                continue
+            counts['dirs_listed'] += 1
+
+            with self._lock:
+                indexed = {
+                    row[0]: (row[1], row[2])
+                    for row in self._conn.execute("SELECT path, size, mtime FROM tracks WHERE dir = ?", (folder,))
+                }
+            present = set()
+            for entry in entries:
+                if not entry.is_file() or not entry.name.lower().endswith(AUDIO_EXTENSIONS):
+                    continue
+                present.add(entry.path)
+                st = entry.stat()
+                if indexed.get(entry.path) == (st.st_size, st.st_mtime):
+                    continue
+                self._index_file(entry.path, st)
+                counts['indexed'] += 1
+
+            with self._lock:
+                for path in set(indexed) - present:
+                    self._conn.execute("DELETE FROM tracks WHERE path = ?", (path,))
+                    counts['removed'] += 1
+                self._conn.execute("INSERT OR REPLACE INTO dirs (path, mtime) VALUES (?, ?)", (folder, mtime))
+                self._conn.commit()
+
+        # Folders that disappeared since the last scan
+        with self._lock:
+            for folder in set(known_dirs) - seen_dirs:
+                counts['removed'] += self._conn.execute("DELETE FROM tracks WHERE dir = ?", (folder,)).rowcount
+                self._conn.execute("DELETE FROM dirs WHERE path = ?", (folder,))
+            self._conn.commit()
+
+        if counts['indexed'] or counts['removed']:
+            self.version += 1
+        self.last_scan = time.time()
+        counts['seconds'] = round(self.last_scan - start, 3)
+        log.info("Library scan finished", extra=counts)
+        return counts
+
+    def _index_file(self, path, st):
+        video_id = artist = title = None
+        try:
+            if path.lower().endswith('.mp3'):
+                # Tag-only read, no need to parse the MPEG stream
+                tags = EasyID3(path)
+            else:
+                audio = mutagen.File(path, easy=True)
+                tags = audio.tags if audio is not None else None
+            if tags is not None:
+                artist = (tags.get('artist') or [None])[0]
+                title = (tags.get('title') or [None])[0]
+                website = (tags.get('website') or [None])[0]
+                if website:
+                    video_id = YoutubeIE.get_temp_id(website)
+        except Exception as e:
+            log.warning(f"Could not read tags of {path}: {e}")
+        if not artist or not title:
+            # Our own naming scheme: "Artist - Title.ext"
+            name = os.path.splitext(os.path.basename(path))[0]
+            if " - " in name:
+                artist, title = name.split(" - ", 1)
+        try:
+            print_ = fingerprint(path, st.st_size)
+        except OSError:
+            print_ = None
+        with self._lock:
+            self._upsert(path, video_id, artist, title, st.st_size, st.st_mtime, print_)
+
+    def _upsert(self, path, video_id, artist, title, size, mtime, print_):
+        # Lock must be held
+        self._conn.execute(
+            "INSERT OR REPLACE INTO tracks (path, dir, video_id, artist, title, size, mtime, fingerprint) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (path, os.path.dirname(path), video_id, normalize(artist), normalize(title), size, mtime, print_)
+        )
+
+    def _remove(self, path):
+        with self._lock:
+            self._conn.execute("DELETE FROM tracks WHERE path = ?", (path,))
+            self._conn.commit()
+            self.version += 1
@@ -0,0 +1,47 @@
+import logging
+import sys
+import time
+
+# Attributes every LogRecord has; anything else was passed via extra={...}
+_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+
+def _value(value):
+    text = str(value)
+    if not text or any(c in text for c in ' ="\n'):
+        text = '"' + text.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+    return text
+
+
+class KeyValueFormatter(logging.Formatter):
+    """
+    logfmt lines: time, level, logger, msg, then the fields passed with
+    extra={...}, e.g. log.info("Download finished", extra={'job': id, 'seconds': 3.2})
+    -> ts=2024-01-01T12:00:00 level=info logger=downloader msg="Download finished" job=... seconds=3.2
+    """
+    def format(self, record):
+        parts = [
+            f"ts={time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created))}",
+            f"level={record.levelname.lower()}",
+            f"logger={record.name}",
+            f"msg={_value(record.getMessage())}",
+        ]
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_FIELDS and not key.startswith('_'):
+                parts.append(f"{key}={_value(value)}")
+        line = " ".join(parts)
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+def setup(level="info"):
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(KeyValueFormatter())
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(getattr(logging, str(level).upper(), logging.INFO))
+    # Per-request lines from the web servers are noise at info level
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    logging.getLogger("urllib3").setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
@@ -0,0 +1,133 @@
+"""
+Minimal Prometheus metrics (text exposition format), served on /metrics.
+Counters and histograms are recorded in-process; gauges are read from a
+callback at scrape time (queue depth, cache hit rates, library size).
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+SECONDS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+THROUGHPUT_BUCKETS = (64e3, 256e3, 512e3, 1e6, 2e6, 5e6, 10e6, 25e6, 50e6)
+
+_registry = []
+_lock = threading.Lock()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+def _number(value):
+    if value == float('inf'):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._values = {}
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, "") for n in self.labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with _lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labels, key)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=SECONDS_BUCKETS):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(buckets) + (float('inf'),)
+        self._values = {}
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, "") for n in self.labels)
+        with _lock:
+            counts, total = self._values.get(key) or ([0] * len(self.buckets), 0.0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with _lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, counts):
+                    lines.append(f"{self.name}_bucket{_labels(self.labels + ('le',), key + (_number(bound),))} {count}")
+                lines.append(f"{self.name}_sum{_labels(self.labels, key)} {_number(total)}")
+                lines.append(f"{self.name}_count{_labels(self.labels, key)} {counts[-1]}")
+        return lines
+
+
+class Gauge:
+    """func() returns a number, or a list of (labels dict, value)."""
+    def __init__(self, name, help, func, labels=()):
+        self.name, self.help, self.func, self.labels = name, help, func, tuple(labels)
+        _registry.append(self)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        try:
+            values = self.func()
+        except Exception:
+            return lines
+        if not isinstance(values, list):
+            values = [({}, values)]
+        for labels, value in values:
+            key = tuple(labels.get(n, "") for n in self.labels)
+            lines.append(f"{self.name}{_labels(self.labels, key)} {_number(value)}")
+        return lines
+
+
+def render():
+    lines = []
+    for metric in list(_registry):
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- Metrics recorded by the download pipeline ---
+
+SEARCHES = Counter("musicdl_searches_total", "Searches by mode and source (cache/youtube)", ("mode", "source"))
+SEARCH_SECONDS = Histogram("musicdl_search_seconds", "Time to list all results of a search", ("mode", "source"))
+SEARCH_ERRORS = Counter("musicdl_search_errors_total", "Searches that raised an error")
+
+AI_REQUESTS = Counter("musicdl_ai_requests_total", "OpenAI completions by kind (single/batch) and outcome", ("kind", "outcome"))
+AI_SECONDS = Histogram("musicdl_ai_request_seconds", "OpenAI completion latency", ("kind",))
+
+EXTRACT_SECONDS = Histogram("musicdl_extract_seconds", "yt-dlp metadata extraction time in download_track")
+DOWNLOADS = Counter("musicdl_downloads_total", "Finished download jobs by outcome (done/failed/skipped)", ("outcome",))
+DOWNLOAD_BYTES = Counter("musicdl_download_bytes_total", "Raw audio bytes fetched")
+DOWNLOAD_SECONDS = Histogram("musicdl_download_seconds", "Raw audio fetch time")
+DOWNLOAD_THROUGHPUT = Histogram("musicdl_download_throughput_bytes_per_second", "Raw audio fetch throughput",
+                                buckets=THROUGHPUT_BUCKETS)
+THROTTLED = Counter("musicdl_throttled_total", "Fetches that ran into HTTP 403/429 throttling")
+RETRIES = Counter("musicdl_download_retries_total", "Failed downloads queued for another attempt")
+WISHLIST_ITEMS = Counter("musicdl_wishlist_items_total", "Wishlist lines processed by outcome (queued/in_library/no_match/error)", ("outcome",))
+TRANSCODE_SECONDS = Histogram("musicdl_transcode_seconds", "ffmpeg conversion / remux time per track")
+TAG_SECONDS = Histogram("musicdl_tag_seconds", "Tag and cover writing time per track")
@@ -0,0 +1,162 @@
+"""
+Stage two of a download: conversion and tagging of a file that stage one
+(MusicDownloader.download_track) left in the staging folder. Runs in a
+process pool, so everything here is module level and picklable.
+"""
+import os
+import shutil
+import time
+import base64
+import logging
+import functools
+import mutagen
+import yt_dlp
+from mutagen.easymp4 import EasyMP4Tags
+from mutagen.id3 import ID3, ID3NoHeaderError, APIC, TALB, TCON, TDOR, TDRC, TIT2, TPE1, TRCK, WOAR
+from mutagen.mp4 import MP4, MP4Cover
+from mutagen.flac import FLAC, Picture
+from yt_dlp.postprocessor import FFmpegExtractAudioPP
+
+log = logging.getLogger("postprocess")
+
+# MP4 has no standard "website" atom; store it as a freeform iTunes tag
+# so the library index can read the source URL back from .m4a files.
+EasyMP4Tags.RegisterFreeformKey('website', 'WEBSITE')
+
+
+@functools.lru_cache(maxsize=2)
+def _postprocess_ydl(ffmpeg_location):
+    """
+    The YoutubeDL the postprocessor runs under, built once per worker process
+    (~85ms each). Pool workers run one task at a time, so sharing it is safe.
+    """
+    opts = {'quiet': True, 'no_warnings': True}
+    if ffmpeg_location:
+        opts['ffmpeg_location'] = ffmpeg_location
+    return yt_dlp.YoutubeDL(opts)
+
+
+def process_track(src, dest_base, preferredcodec, preferredquality, tags, cover=None, ffmpeg_location=None):
+    """
+    Converts (or remuxes) src with yt-dlp's FFmpegExtractAudio, writes tags and
+    cover in one save and moves the result to dest_base + extension.
+    tags: keyword arguments for tag_file.
+    Returns (final_path, timings) with transcode_seconds / tag_seconds for the metrics.
+    """
+    info = {'filepath': src, 'ext': os.path.splitext(src)[1][1:]}
+    start = time.perf_counter()
+    extract = FFmpegExtractAudioPP(_postprocess_ydl(ffmpeg_location), preferredcodec=preferredcodec,
+                                   preferredquality=preferredquality)
+    leftovers, info = extract.run(info)
+    for path in leftovers:
+        if os.path.exists(path) and path != info['filepath']:
+            os.remove(path)
+
+    converted = info['filepath']
+    tagged = time.perf_counter()
+    tag_file(converted, **tags, cover=cover)
+    timings = {'transcode_seconds': tagged - start, 'tag_seconds': time.perf_counter() - tagged}
+
+    # Tagged in staging, then moved: the library folder never sees half-written files
+    final_path = f"{dest_base}.{info['ext']}"
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    shutil.move(converted, final_path)
+    return final_path, timings
+
+
+def tag_file(filepath, artists_list, title, album, year, genre, track_number=None, source_url=None, cover=None):
+    """
+    Writes all tags and the cover picture with a single save:
+    ID3 for MP3, MP4 atoms for M4A, Vorbis comments for Opus/Ogg/FLAC.
+    cover: (mime, data) as returned by MusicDownloader._fetch_cover, or None.
+    """
+    try:
+        ext = os.path.splitext(filepath)[1].lower()
+        if ext == '.mp3':
+            _tag_id3(filepath, artists_list, title, album, year, genre, track_number, source_url, cover)
+        elif ext in ('.m4a', '.mp4'):
+            _tag_mp4(filepath, artists_list, title, album, year, genre, track_number, source_url, cover)
+        else:
+            _tag_vorbis(filepath, artists_list, title, album, year, genre, track_number, source_url, cover)
+        log.info(f"Tags updated: {os.path.basename(filepath)}", extra={'artists': artists_list, 'title': title, 'album': album, 'cover': bool(cover)})
+
+    except Exception as e:
+        log.error(f"Tagging Error: {e}", extra={'file': filepath})
+
+
+def _tag_id3(filepath, artists_list, title, album, year, genre, track_number, source_url, cover):
+    try:
+        tags = ID3(filepath)
+    except ID3NoHeaderError:
+        tags = ID3()
+    tags.add(TPE1(encoding=3, text=artists_list))
+    tags.add(TIT2(encoding=3, text=title))
+    tags.add(TALB(encoding=3, text=album))
+    tags.add(TCON(encoding=3, text=genre))
+    if year:
+        tags.add(TDRC(encoding=3, text=str(year)))
+        tags.add(TDOR(encoding=3, text=str(year)))
+    if track_number:
+        tags.add(TRCK(encoding=3, text=str(track_number)))
+    if source_url:
+        # Lets the library index map the file back to its video id (EasyID3 'website')
+        tags.delall('WOAR')
+        tags.add(WOAR(url=source_url))
+    if cover:
+        tags.delall('APIC')
+        tags.add(APIC(encoding=3, mime=cover[0], type=3, desc='Cover', data=cover[1]))
+    tags.save(filepath)
+
+
+def _tag_mp4(filepath, artists_list, title, album, year, genre, track_number, source_url, cover):
+    audio = MP4(filepath)
+    if audio.tags is None:
+        audio.add_tags()
+    tags = audio.tags
+    tags['\xa9ART'] = artists_list
+    tags['\xa9nam'] = [title]
+    tags['\xa9alb'] = [album]
+    tags['\xa9gen'] = [genre]
+    if year:
+        tags['\xa9day'] = [str(year)]
+    if track_number:
+        number, _, total = str(track_number).partition('/')
+        tags['trkn'] = [(int(number), int(total or 0))]
+    if source_url:
+        # Same freeform atom as the EasyMP4 'website' key registered above
+        tags['----:com.apple.iTunes:WEBSITE'] = [source_url.encode('utf-8')]
+    if cover:
+        image_format = MP4Cover.FORMAT_PNG if cover[0] == 'image/png' else MP4Cover.FORMAT_JPEG
+        tags['covr'] = [MP4Cover(cover[1], imageformat=image_format)]
+    audio.save()
+
+
+def _tag_vorbis(filepath, artists_list, title, album, year, genre, track_number, source_url, cover):
+    audio = mutagen.File(filepath)
+    if audio is None:
+        raise ValueError(f"Unsupported audio file: {filepath}")
+    if audio.tags is None:
+        audio.add_tags()
+    tags = audio.tags
+    tags['artist'] = artists_list
+    tags['title'] = title
+    tags['album'] = album
+    tags['genre'] = genre
+    if year:
+        tags['date'] = str(year)
+        tags['originaldate'] = str(year)
+    if track_number:
+        tags['tracknumber'] = str(track_number)
+    if source_url:
+        tags['website'] = source_url
+    if cover:
+        picture = Picture()
+        picture.type = 3
+        picture.mime, picture.data = cover
+        if isinstance(audio, FLAC):
+            audio.clear_pictures()
+            audio.add_picture(picture)
+        else:
+            # Ogg (Opus/Vorbis) stores the FLAC picture block base64 encoded
+            tags['metadata_block_picture'] = [base64.b64encode(picture.write()).decode('ascii')]
+    audio.save()
@@ -0,0 +1,118 @@
+import threading
+import time
+
+# Stages reported by download_track. Conversion and tagging run in a worker
+# process without live updates; both are recorded when it returns (record_stages)
+METADATA = "metadata"
+WAITING = "waiting"
+DOWNLOADING = "download"
+CONVERTING = "convert"
+TAGGING = "tagging"
+DONE = "done"
+FAILED = "failed"
+
+# No update for this long while a stage is running -> flagged as stalled
+STALL_SECONDS = 30
+# Stages that make no progress updates: waiting for a slot / backoff, conversion in the process pool
+QUIET_STAGES = (WAITING, CONVERTING)
+
+
+class ProgressStore:
+    """
+    Live per-job progress (stage, bytes, speed, ETA) fed by yt-dlp hooks.
+    Readers can block in wait() until something changes (used for SSE).
+    """
+    def __init__(self, keep_finished=300, on_stage=None):
+        self.keep_finished = keep_finished
+        # Called as on_stage(key, stage) whenever an item enters a new stage
+        self.on_stage = on_stage
+        self._items = {}
+        self._version = 0
+        self._cond = threading.Condition()
+
+    def update(self, key, **fields):
+        if not key:
+            return
+        now = time.time()
+        with self._cond:
+            item = self._items.get(key)
+            if item is None:
+                item = {'key': key, 'started_at': now, 'stage': None, 'stages': {}}
+                self._items[key] = item
+            stage = fields.get('stage')
+            changed = stage and stage != item['stage']
+            if changed:
+                # Remember when each stage started to see where time goes
+                if item['stage'] in item['stages']:
+                    item['stages'][item['stage']]['seconds'] = round(now - item['stages'][item['stage']]['start'], 3)
+                item['stages'][stage] = {'start': now, 'seconds': None}
+            item.update(fields)
+            item['updated_at'] = now
+            self._version += 1
+            self._cond.notify_all()
+        if changed and self.on_stage:
+            self.on_stage(key, stage)
+
+    def record_stages(self, key, stages):
+        """
+        Stages that ran elsewhere, measured afterwards: {stage: (start, seconds)}.
+        They replace what update() tracked for these stages.
+        """
+        if not key:
+            return
+        with self._cond:
+            item = self._items.get(key)
+            if item is None:
+                return
+            for stage, (start, seconds) in stages.items():
+                item['stages'][stage] = {'start': start, 'seconds': round(seconds, 3)}
+            item['stages'] = dict(sorted(item['stages'].items(), key=lambda entry: entry[1]['start']))
+            self._version += 1
+            self._cond.notify_all()
+
+    def hooks(self, key):
+        """yt-dlp progress_hooks writing download progress into this store."""
+        def on_download(d):
+            status = d.get('status')
+            if status == 'downloading':
+                self.update(
+                    key, stage=DOWNLOADING,
+                    downloaded_bytes=d.get('downloaded_bytes'),
+                    total_bytes=d.get('total_bytes') or d.get('total_bytes_estimate'),
+                    speed=d.get('speed'), eta=d.get('eta'),
+                )
+            elif status == 'finished':
+                self.update(key, downloaded_bytes=d.get('downloaded_bytes') or d.get('total_bytes'), speed=None, eta=0)
+            elif status == 'error':
+                self.update(key, stage=FAILED)
+
+        return [on_download]
+
+    def snapshot(self):
+        now = time.time()
+        with self._cond:
+            self._prune(now)
+            items = []
+            for item in self._items.values():
+                item = dict(item, stages={k: dict(v) for k, v in item['stages'].items()})
+                running = item['stage'] not in (DONE, FAILED) + QUIET_STAGES
+                item['stalled'] = running and now - item['updated_at'] > STALL_SECONDS
+                items.append(item)
+            return self._version, items
+
+    def get(self, key):
+        with self._cond:
+            item = self._items.get(key)
+            return dict(item) if item else None
+
+    def wait(self, version, timeout=15):
+        """Blocks until the store changes after `version` (or timeout)."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._version != version, timeout=timeout)
+            return self._version
+
+    def _prune(self, now):
+        # Lock must be held
+        for key in [k for k, v in self._items.items()
+                    if v['stage'] in (DONE, FAILED) and now - v['updated_at'] > self.keep_finished]:
+            del self._items[key]
@@ -0,0 +1,14 @@
+"""
+Add-on entry point: serves asgi:app with uvicorn.
+
+Keep this free of side effects at import time. Conversion worker processes
+(forkserver / spawn) re-run the main script before they start, and must not
+build a second downloader, job queue or server.
+"""
+import uvicorn
+
+if __name__ == '__main__':
+    import logging
+    import config
+    logging.getLogger("asgi").info(f"Starting ASGI server on 0.0.0.0:8099. Download Dir: {config.DOWNLOAD_DIR}")
+    uvicorn.run("asgi:app", host='0.0.0.0', port=8099, log_level="warning")
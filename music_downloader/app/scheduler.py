@@ -0,0 +1,189 @@
+"""
+Network side of the downloads: a shared bandwidth budget with full-speed
+time windows, adaptive backoff when YouTube throttles (HTTP 403/429) and
+the retry policy for failed jobs. Conversion (stage 2) is not scheduled
+here, it never touches the network.
+"""
+import re
+import time
+import random
+import logging
+import threading
+from contextlib import contextmanager
+
+import metrics
+
+log = logging.getLogger("scheduler")
+
+# Download errors that mean "slow down", and ones worth simply trying again
+THROTTLE_RE = re.compile(r"HTTP Error (403|429)|Too Many Requests|confirm you.re not a bot|rate.?limit", re.I)
+TRANSIENT_RE = re.compile(
+    r"HTTP Error 5\d\d|timed? ?out|Connection (reset|refused|aborted)|Temporary failure|"
+    r"Network is unreachable|IncompleteRead|Remote end closed|Unable to download", re.I
+)
+
+BACKOFF_BASE = 30
+BACKOFF_MAX = 15 * 60
+# Clean fetches in a row before one step of concurrency / backoff is given back
+RECOVER_AFTER = 3
+# Window changes (e.g. night starts) reach running downloads within this many seconds
+REBALANCE_INTERVAL = 30
+
+
+def parse_windows(text):
+    """'01:00-07:00, 22:30-23:59' -> [(start_minute, end_minute)]; windows may wrap past midnight."""
+    windows = []
+    for part in (text or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        match = re.fullmatch(r"(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})", part)
+        if not match:
+            log.warning(f"Ignoring invalid time window '{part}' (use HH:MM-HH:MM)")
+            continue
+        h1, m1, h2, m2 = map(int, match.groups())
+        windows.append((h1 * 60 + m1, h2 * 60 + m2))
+    return windows
+
+
+def retry_sleep(attempt):
+    """yt-dlp retry_sleep_functions: exponential with jitter, capped at a minute."""
+    return min(60, 2 ** attempt) * random.uniform(0.5, 1.0)
+
+
+class DownloadScheduler:
+    """
+    Wraps the network fetch of every download (see slot()):
+    - bandwidth_limit (bytes/s, 0 = none) is shared by the running fetches and
+      lifted inside full_speed_windows; running downloads are rebalanced as
+      fetches start and finish, through their live yt-dlp params dict
+    - a fetch that runs alone at full speed uses `fragments` concurrent
+      fragment downloads (DASH/HLS formats)
+    - a throttling error pauses new fetches with exponential backoff and
+      lowers the allowed concurrency; clean fetches restore both step by step
+    retry_delay() is the JobQueue retry policy for failed downloads.
+    """
+    def __init__(self, workers, bandwidth_limit=0, full_speed_windows="", fragments=4, retries=3, retry_base=30):
+        self.workers = max(1, int(workers))
+        self.bandwidth_limit = int(bandwidth_limit or 0)
+        self.windows = parse_windows(full_speed_windows)
+        self.fragments = max(1, int(fragments))
+        self.retries = int(retries)
+        self.retry_base = retry_base
+        self._cond = threading.Condition()
+        self._active = []
+        self._allowed = self.workers
+        self._backoff = 0
+        self._paused_until = 0.0
+        self._clean = 0
+        self._clock = None
+
+    def start(self):
+        """Background rebalancing, needed only when time windows can lift or restore the limit."""
+        if self._clock or not (self.bandwidth_limit and self.windows):
+            return
+        def loop():
+            while True:
+                time.sleep(REBALANCE_INTERVAL)
+                with self._cond:
+                    self._rebalance()
+        self._clock = threading.Thread(target=loop, name="scheduler-clock", daemon=True)
+        self._clock.start()
+
+    def budget(self, now=None):
+        """Total bytes/s for all fetches right now; 0 = unlimited."""
+        if not self.bandwidth_limit:
+            return 0
+        local = time.localtime(now)
+        minute = local.tm_hour * 60 + local.tm_min
+        for start, end in self.windows:
+            inside = start <= minute < end if start <= end else (minute >= start or minute < end)
+            if inside:
+                return 0
+        return self.bandwidth_limit
+
+    @contextmanager
+    def slot(self, opts, on_wait=None):
+        """
+        Around one fetch. Waits while backing off or while the allowed
+        concurrency is used up (on_wait(reason) is called once if so), then
+        sets ratelimit / concurrent_fragment_downloads in opts, the dict that
+        is handed to YoutubeDL (it keeps and reads that same dict while
+        downloading). Errors raised inside are checked for throttling.
+        """
+        with self._cond:
+            notified = False
+            while True:
+                wait = self._paused_until - time.time()
+                if wait <= 0 and len(self._active) < self._allowed:
+                    break
+                if on_wait and not notified:
+                    notified = True
+                    on_wait(f"backing off for {int(wait)}s" if wait > 0 else "waiting for a download slot")
+                self._cond.wait(timeout=max(0.5, min(wait, 5)) if wait > 0 else 5)
+            alone = not self._active and not self._backoff
+            self._active.append(opts)
+            # Fragment threads share one ratelimit each, so they only pay off without a budget
+            opts['concurrent_fragment_downloads'] = self.fragments if alone and not self.budget() else 1
+            self._rebalance()
+        try:
+            yield
+        except Exception as e:
+            self._release(opts, throttled=bool(THROTTLE_RE.search(str(e))))
+            raise
+        else:
+            self._release(opts, throttled=False)
+
+    def _release(self, opts, throttled):
+        with self._cond:
+            # By identity: two downloads can have equal option dicts
+            self._active = [active for active in self._active if active is not opts]
+            if throttled:
+                self._backoff = min(BACKOFF_MAX, self._backoff * 2 or BACKOFF_BASE)
+                self._paused_until = max(self._paused_until, time.time() + self._backoff)
+                self._allowed = max(1, self._allowed - 1)
+                self._clean = 0
+                metrics.THROTTLED.inc()
+                log.warning(f"Throttled by the server, pausing downloads for {self._backoff}s",
+                            extra={'backoff': self._backoff, 'concurrency': self._allowed})
+            else:
+                self._clean += 1
+                if self._clean >= RECOVER_AFTER and (self._backoff or self._allowed < self.workers):
+                    self._clean = 0
+                    self._allowed = min(self.workers, self._allowed + 1)
+                    self._backoff //= 2
+                    if self._backoff < BACKOFF_BASE:
+                        self._backoff = 0
+            self._rebalance()
+            self._cond.notify_all()
+
+    def _rebalance(self):
+        # Lock must be held. Running downloads pick the new ratelimit up on their next block.
+        budget = self.budget()
+        share = budget // len(self._active) if budget and self._active else None
+        for opts in self._active:
+            opts['ratelimit'] = share
+
+    def retry_delay(self, attempt, message):
+        """
+        JobQueue retry policy: seconds until the next attempt of a failed
+        download, or None to give up. Only throttling and transient network
+        errors are retried, with exponential delay.
+        """
+        if attempt >= self.retries or not (THROTTLE_RE.search(message or "") or TRANSIENT_RE.search(message or "")):
+            return None
+        delay = self.retry_base * 2 ** attempt
+        with self._cond:
+            delay = max(delay, self._paused_until - time.time())
+        metrics.RETRIES.inc()
+        return round(delay * random.uniform(1.0, 1.2), 1)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'budget': self.budget(),
+                'active': len(self._active),
+                'allowed_concurrency': self._allowed,
+                'backoff_seconds': self._backoff,
+                'paused_for': max(0, round(self._paused_until - time.time(), 1)),
+            }
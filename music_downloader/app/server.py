@@ -1,29 +1,120 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context
 from werkzeug.exceptions import HTTPException
 import config
-from downloader import MusicDownloader
+from downloader import MusicDownloader, OUTPUT_FORMATS, SEARCH_MODES, parse_bitrate
+from jobs import JobQueue, JobJournal
+from importer import PlaylistImporter
+from wishlist import WishlistSync
 import os
+import json
+import time
+import logging
 import threading
-import traceback
+import metrics
+
+log = logging.getLogger("server")
 
 app = Flask(__name__)
 # Fix: Ensure config is loaded before we start
 loader = MusicDownloader()
+# Bounded worker pool for downloads (see max_concurrent_downloads option).
+# Queued/running jobs are journaled and picked up again after a restart;
+# failed ones are retried as the download scheduler decides.
+jobs = JobQueue(workers=config.MAX_CONCURRENT_DOWNLOADS, journal=JobJournal(config.JOBS_DB),
+                retry=loader.scheduler.retry_delay)
+loader.progress.on_stage = jobs.journal.set_stage
+resumed = jobs.resume({'download_track': loader.download_track})
+loader.cleanup_temporaries(keep=resumed)
+jobs.start()
+importer = PlaylistImporter(loader, jobs)
+# Initial library scan, then incremental rescans (0 = only at startup)
+loader.library.start_periodic_scan(config.LIBRARY_RESCAN_MINUTES * 60)
+# Unattended downloads of new wishlist lines (file under /share and/or the wishlist option)
+wishlist = WishlistSync(loader, jobs, config.WISHLIST_FILE, lines=config.WISHLIST, state_path=config.WISHLIST_DB,
+                        workers=config.WISHLIST_WORKERS)
+wishlist.start(config.WISHLIST_SYNC_MINUTES * 60)
+
+# Scrape-time gauges for /metrics
+metrics.Gauge("musicdl_jobs", "Download jobs by status (queued = queue depth)",
+              lambda: [({'status': k}, v) for k, v in jobs.stats().items() if k != 'workers'], ("status",))
+metrics.Gauge("musicdl_cache_hits", "Cache hits since start by namespace",
+              lambda: [({'namespace': ns}, s['hits']) for ns, s in loader.cache.stats().items()], ("namespace",))
+metrics.Gauge("musicdl_cache_misses", "Cache misses since start by namespace",
+              lambda: [({'namespace': ns}, s['misses']) for ns, s in loader.cache.stats().items()], ("namespace",))
+metrics.Gauge("musicdl_cache_hit_ratio", "Cache hit rate since start by namespace",
+              lambda: [({'namespace': ns}, s['hit_rate'] or 0) for ns, s in loader.cache.stats().items()], ("namespace",))
+metrics.Gauge("musicdl_bandwidth_budget_bytes", "Current download bandwidth budget in bytes/s (0 = unlimited)",
+              lambda: loader.scheduler.stats()['budget'])
+metrics.Gauge("musicdl_download_concurrency_allowed", "Parallel fetches allowed after throttling backoff",
+              lambda: loader.scheduler.stats()['allowed_concurrency'])
+metrics.Gauge("musicdl_library_tracks", "Tracks in the library index", lambda: loader.library.stats()['tracks'])
+metrics.Gauge("musicdl_ydl_instances", "YoutubeDL instances built / reused from the pool since start",
+              lambda: [({'event': k}, v) for k, v in loader.ydl_pool.stats().items() if k != 'idle'], ("event",))
 
 @app.route('/')
 def index():
-    return render_template('index.html')
+    return render_template('index.html', output_format=config.OUTPUT_FORMAT)
 
 @app.route('/search', methods=['POST'])
 def search():
     data = request.json
     query = data.get('query')
+    mode = data.get('mode') or None
     if not query:
         return jsonify({"success": False, "message": "No query provided"}), 400
+    if mode and mode not in SEARCH_MODES:
+        return jsonify({"success": False, "message": f"Unknown mode (use one of {', '.join(SEARCH_MODES)})"}), 400
     
-    result = loader.search_video(query)
+    result = loader.search_video(query, mode, record=True)
     return jsonify(result)
 
+@app.route('/search/stream', methods=['GET'])
+def search_stream():
+    """Server-Sent Events: one 'message' per search result, then 'done' (or 'failed')."""
+    query = request.args.get('query')
+    if not query:
+        return jsonify({"success": False, "message": "No query provided"}), 400
+    mode = request.args.get('mode') or None
+    if mode and mode not in SEARCH_MODES:
+        return jsonify({"success": False, "message": f"Unknown mode (use one of {', '.join(SEARCH_MODES)})"}), 400
+
+    def sse(payload, event=None):
+        head = f"event: {event}\n" if event else ""
+        return f"{head}data: {json.dumps(payload)}\n\n"
+
+    def generate():
+        count = 0
+        try:
+            for result in loader.iter_search(query, mode, record=True):
+                count += 1
+                yield sse(result)
+            yield sse({"count": count}, event="done")
+        except Exception as e:
+            log.exception(f"Search Stream Error: {e}")
+            yield sse({"message": str(e)}, event="failed")
+
+    headers = {
+        "Cache-Control": "no-cache",
+        # Stop the ingress proxy from buffering the stream
+        "X-Accel-Buffering": "no",
+    }
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers=headers)
+
+@app.route('/suggest', methods=['GET'])
+def suggest():
+    """Search-as-you-type: local suggestions only, the submitted query goes to /search."""
+    limit = max(1, min(request.args.get('limit', 8, type=int), 20))
+    return jsonify({"success": True, "suggestions": loader.suggest.suggest(request.args.get('q', ''), limit)})
+
+@app.route('/details/<video_id>', methods=['GET'])
+def details(video_id):
+    try:
+        result = loader.get_video_details(video_id)
+    except Exception as e:
+        log.warning(f"Details Error for {video_id}: {e}")
+        return jsonify({"success": False, "message": str(e)}), 502
+    return jsonify({"success": True, "result": result})
+
 @app.route('/analyze', methods=['POST'])
 def analyze():
     data = request.json
@@ -36,6 +127,19 @@ def analyze():
     proposal = loader.analyze_metadata(title, channel)
     return jsonify({"success": True, "result": proposal})
 
+@app.route('/analyze/batch', methods=['POST'])
+def analyze_batch():
+    data = request.json
+    items = data.get('items') if isinstance(data, dict) else None
+    
+    if not items or not isinstance(items, list):
+        return jsonify({"success": False, "message": "No items provided"}), 400
+    if any(not isinstance(item, dict) or not item.get('title') for item in items):
+        return jsonify({"success": False, "message": "Every item needs to be an object with a title"}), 400
+        
+    proposals = loader.analyze_metadata_batch([(item.get('title'), item.get('channel')) for item in items])
+    return jsonify({"success": True, "results": proposals})
+
 @app.route('/download', methods=['POST'])
 def download():
     data = request.json
@@ -44,41 +148,147 @@ def download():
     manual_title = data.get('title')
     manual_album = data.get('album')
     manual_year = data.get('year')
+    force = bool(data.get('force'))
+    output_format = data.get('format') or None
+    bitrate = data.get('bitrate')
     
     if not url:
         return jsonify({"success": False, "message": "No URL provided"}), 400
+    if output_format and output_format not in OUTPUT_FORMATS:
+        return jsonify({"success": False, "message": f"Unknown format (use one of {', '.join(OUTPUT_FORMATS)})"}), 400
+    if bitrate not in (None, ''):
+        try:
+            bitrate = parse_bitrate(bitrate)
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
         
-    print(f"Received download request for: {url}")
+    log.info(f"Received download request for: {url}")
+    
+    job = jobs.submit(loader.download_track, url, manual_artists, manual_title, manual_album, manual_year,
+                      force=force, output_format=output_format, bitrate=bitrate, label=url, id_kwarg='progress_key')
+    queued = jobs.stats()['queued']
     
-    # Define wrapper for background execution
-    def background_task():
-        print(f"Starting background download for {url}")
+    return jsonify({"success": True, "job_id": job.id, "message": f"Download queued (Job {job.id}, {queued} waiting). Progress is shown below."})
+
+@app.route('/jobs', methods=['GET'])
+def list_jobs():
+    return jsonify({"success": True, "stats": jobs.stats(), "scheduler": loader.scheduler.stats(), "jobs": jobs.list()})
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = jobs.get(job_id)
+    if not job:
+        return jsonify({"success": False, "message": "Unknown job"}), 404
+    job['progress'] = loader.progress.get(job_id)
+    return jsonify({"success": True, "job": job})
+
+@app.route('/progress', methods=['GET'])
+def get_progress():
+    version, items = loader.progress.snapshot()
+    return jsonify({"success": True, "version": version, "items": items})
+
+@app.route('/progress/stream', methods=['GET'])
+def progress_stream():
+    """Server-Sent Events: full progress snapshot whenever it changes (max ~2/s)."""
+    def generate():
+        version = None
+        while True:
+            new_version = loader.progress.wait(version, timeout=15)
+            if new_version == version:
+                # Heartbeat keeps proxies from closing an idle stream
+                yield ": keep-alive\n\n"
+                continue
+            version, items = loader.progress.snapshot()
+            yield f"data: {json.dumps(items)}\n\n"
+            time.sleep(0.5)
+
+    headers = {
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    }
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers=headers)
+
+@app.route('/import', methods=['POST'])
+def start_import():
+    data = request.json
+    url = data.get('url')
+    limit = data.get('limit')
+    if not url:
+        return jsonify({"success": False, "message": "No URL provided"}), 400
+    if limit is not None:
+        if isinstance(limit, bool) or not str(limit).strip().isdigit() or int(limit) < 1:
+            return jsonify({"success": False, "message": "limit must be a positive number"}), 400
+        limit = int(limit)
+    
+    log.info(f"Received playlist import for: {url}")
+    imp = importer.start(url, album=data.get('album'), as_album=data.get('as_album'), limit=limit)
+    return jsonify({"success": True, "import_id": imp.id, "message": f"Import started (Import {imp.id})."})
+
+@app.route('/imports', methods=['GET'])
+def list_imports():
+    return jsonify({"success": True, "imports": importer.list()})
+
+@app.route('/import/<import_id>', methods=['GET'])
+def get_import(import_id):
+    imp = importer.get(import_id)
+    if not imp:
+        return jsonify({"success": False, "message": "Unknown import"}), 404
+    return jsonify({"success": True, "import": imp})
+
+@app.route('/wishlist', methods=['GET'])
+def wishlist_status():
+    return jsonify({"success": True, "stats": wishlist.stats(), "reports": wishlist.reports()})
+
+@app.route('/wishlist/sync', methods=['POST'])
+def wishlist_sync():
+    """Runs a sync now, in the background; its report is listed first under /wishlist."""
+    def run():
         try:
-            loader.download_track(url, manual_artists, manual_title, manual_album, manual_year)
-            print(f"Background download finished for {url}")
+            wishlist.sync(trigger="manual")
         except Exception as e:
-            print(f"Background download failed: {e}")
+            log.exception(f"Wishlist sync failed: {e}")
+    threading.Thread(target=run, name="wishlist-manual", daemon=True).start()
+    return jsonify({"success": True, "message": "Wishlist sync started."})
 
-    # Start independent thread
-    thread = threading.Thread(target=background_task)
-    thread.daemon = True # ensure thread dies if main process dies
-    thread.start()
-    
-    return jsonify({"success": True, "message": "Download started in background. Check /media folder soon."})
+@app.route('/wishlist/reports/<report_id>', methods=['GET'])
+def wishlist_report(report_id):
+    report = wishlist.report(report_id)
+    if not report:
+        return jsonify({"success": False, "message": "Unknown report"}), 404
+    return jsonify({"success": True, "report": report})
+
+@app.route('/library', methods=['GET'])
+def library_stats():
+    return jsonify({"success": True, "stats": loader.library.stats()})
+
+@app.route('/library/rescan', methods=['POST'])
+def library_rescan():
+    return jsonify({"success": True, "result": loader.library.rescan()})
+
+@app.route('/library/duplicates', methods=['GET'])
+def library_duplicates():
+    return jsonify({"success": True, "duplicates": loader.library.duplicates()})
+
+@app.route('/cache', methods=['GET'])
+def cache_stats():
+    return jsonify({"success": True, "stats": loader.cache.stats()})
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 @app.errorhandler(Exception)
 def handle_exception(e):
     # Pass through HTTP errors like 404
     if isinstance(e, HTTPException):
-        print(f"HTTP ERROR: {e}")
+        log.info(f"HTTP ERROR: {e}")
         return e
         
     # Generic error handling for 500s
-    print(f"SERVER ERROR: {e}")
-    traceback.print_exc()
+    log.exception(f"SERVER ERROR: {e}")
     return jsonify({"success": False, "message": str(e), "error": "Internal Server Error"}), 500
 
 if __name__ == '__main__':
-    print(f"Starting server on 0.0.0.0:8099. Download Dir: {config.DOWNLOAD_DIR}")
+    log.info(f"Starting server on 0.0.0.0:8099. Download Dir: {config.DOWNLOAD_DIR}")
     # Fix: Set threaded=True for better responsiveness
     app.run(host='0.0.0.0', port=8099, debug=False, threaded=True)
@@ -0,0 +1,154 @@
+import os
+import bisect
+import threading
+import itertools
+from collections import OrderedDict
+
+from library import normalize
+
+# Recent searches kept for suggestions (and in the store's 'recent' namespace)
+RECENT_LIMIT = 200
+RECENT_TTL = 30 * 86400
+# Matches looked at per keystroke before ranking; keeps one-letter prefixes fast
+SCAN_LIMIT = 400
+
+# Ranking: recent searches first, then artists, then tracks
+RECENT, ARTIST, TRACK = 0, 1, 2
+KINDS = {RECENT: 'recent', ARTIST: 'artist', TRACK: 'track'}
+
+
+def _sorted_entries(items):
+    """
+    items: (display, rank, order) -> sorted (keys, entries). Every item is
+    indexed under each of its word suffixes, so "lights" finds "Blinding Lights".
+    """
+    rows = []
+    for display, rank, order in items:
+        words = normalize(display).split()
+        for position in range(len(words)):
+            rows.append((" ".join(words[position:]), position, rank, order, display))
+    rows.sort()
+    return [row[0] for row in rows], rows
+
+
+class SuggestIndex:
+    """
+    Search-as-you-type suggestions from the library (artists, "Artist - Title")
+    and recent searches. Sorted arrays of normalized keys with bisect prefix
+    lookups: no network and no SQLite on a keystroke. The library part is
+    rebuilt in a background thread when LibraryIndex.version changes; until
+    then keystrokes are answered from the previous index.
+    With a `store` (DiskCache) recorded searches survive a restart.
+    """
+    def __init__(self, library, store=None):
+        self.library = library
+        self.store = store
+        self._lock = threading.Lock()
+        self._counter = itertools.count()
+        self._recent = OrderedDict()
+        self._recent_index = ([], [])
+        self._library_index = ([], [])
+        self._library_version = None
+        self._rebuilding = False
+        recent = store.items('recent', RECENT_LIMIT) if store else []
+        for _, query in reversed(recent):
+            self._remember(query)
+        self._rebuild_recent()
+        self._refresh_library()
+
+    def record(self, query):
+        """A submitted search; it is suggested first from now on."""
+        with self._lock:
+            key = self._remember(query)
+            if not key:
+                return
+            display = self._recent[key][0]
+            self._rebuild_recent()
+        if self.store:
+            self.store.set('recent', key, display)
+
+    def _remember(self, query):
+        # Lock must be held (or called from __init__)
+        display = " ".join((query or "").split())
+        key = normalize(display)
+        if not key or display.startswith(('http://', 'https://')):
+            return None
+        self._recent.pop(key, None)
+        self._recent[key] = (display, next(self._counter))
+        while len(self._recent) > RECENT_LIMIT:
+            self._recent.popitem(last=False)
+        return key
+
+    def _rebuild_recent(self):
+        # Newest first: a higher counter sorts earlier
+        self._recent_index = _sorted_entries(
+            (display, RECENT, -count) for display, count in self._recent.values()
+        )
+
+    def _refresh_library(self):
+        version = self.library.version
+        with self._lock:
+            if version == self._library_version or self._rebuilding:
+                return
+            self._rebuilding = True
+        threading.Thread(target=self._rebuild_library, args=(version,), name="suggest-index", daemon=True).start()
+
+    def _rebuild_library(self, version):
+        try:
+            index = _sorted_entries(self._library_items())
+            with self._lock:
+                self._library_index = index
+                self._library_version = version
+        finally:
+            with self._lock:
+                self._rebuilding = False
+
+    def _library_items(self):
+        items = {}
+        for path, artist, title in self.library.names():
+            if not artist:
+                continue
+            # Files are named "Artist - Title.ext": that keeps the original spelling
+            stem = os.path.splitext(os.path.basename(path))[0]
+            if " - " in stem and normalize(stem) == normalize(f"{artist} {title}"):
+                artist_display, title_display = stem.split(" - ", 1)
+            else:
+                artist_display, title_display = artist, title
+            items.setdefault(normalize(artist_display), (artist_display, ARTIST, 0))
+            if title_display:
+                display = f"{artist_display} - {title_display}"
+                items.setdefault(normalize(display), (display, TRACK, 0))
+        return items.values()
+
+    def suggest(self, prefix, limit=8):
+        """Up to `limit` suggestions: [{'text': ..., 'kind': 'recent' | 'artist' | 'track'}]."""
+        key = normalize(prefix)
+        if not key:
+            return []
+        # A trailing space means the last word is complete ("daft " should not match "daftpunk")
+        if prefix.endswith(" "):
+            key += " "
+        self._refresh_library()
+        with self._lock:
+            indexes = (self._recent_index, self._library_index)
+
+        matches = []
+        for keys, rows in indexes:
+            start = bisect.bisect_left(keys, key)
+            for row in rows[start:start + SCAN_LIMIT]:
+                if not row[0].startswith(key):
+                    break
+                matches.append(row)
+
+        # Whole-text matches before word matches, then by kind and recency
+        matches.sort(key=lambda row: (row[1] > 0, row[2], row[3], len(row[4])))
+        results, seen = [], set()
+        for _, _, rank, _, display in matches:
+            folded = display.lower()
+            if folded in seen:
+                continue
+            seen.add(folded)
+            results.append({'text': display, 'kind': KINDS[rank]})
+            if len(results) >= limit:
+                break
+        return results
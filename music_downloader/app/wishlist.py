@@ -0,0 +1,375 @@
+"""
+Wishlist sync: "Artist - Title" lines from a text / CSV file (and the
+add-on's wishlist option) are turned into downloads without the UI.
+Every line is processed once; its outcome is kept in SQLite, so a sync only
+looks at lines that are new (or failed before and may be retried).
+"""
+import os
+import csv
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from difflib import SequenceMatcher
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from library import normalize
+
+log = logging.getLogger("wishlist")
+
+# Line states
+QUEUED = "queued"
+IN_LIBRARY = "in_library"
+NO_MATCH = "no_match"
+ERROR = "error"
+
+# Lines that failed (search error, download failed) are tried again on this many syncs
+MAX_ATTEMPTS = 3
+# How often the file is checked for changes while the watcher runs
+POLL_SECONDS = 30
+# Search results below this score are not downloaded
+MIN_SCORE = 0.6
+# Result title words that mean "another version" unless the line asks for it
+VARIANT_WORDS = ('live', 'cover', 'remix', 'karaoke', 'instrumental', 'acoustic', 'nightcore',
+                 'sped up', 'slowed', 'reaction', '8d', 'tutorial')
+# Plausible song length in seconds
+MIN_DURATION, MAX_DURATION = 60, 15 * 60
+
+
+def parse_line(line):
+    """'Artist - Title' -> (artist, title); anything else is a free search (None, line)."""
+    line = " ".join(line.split())
+    if " - " in line:
+        artist, title = line.split(" - ", 1)
+        if artist.strip() and title.strip():
+            return artist.strip(), title.strip()
+    return None, line
+
+
+def read_wishlist(path):
+    """
+    Wanted items of a wishlist file: [{'line', 'artist', 'title', 'album'}].
+    .csv: artist, title[, album] columns (a header row is skipped);
+    anything else: one 'Artist - Title' per line, lines starting with '#' are comments.
+    """
+    items = []
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        if path.lower().endswith('.csv'):
+            for row in csv.reader(f):
+                cells = [cell.strip() for cell in row]
+                if len(cells) < 2 or not cells[0] or not cells[1] or cells[0].startswith('#'):
+                    continue
+                if cells[0].lower() == 'artist' and cells[1].lower() == 'title':
+                    continue
+                album = cells[2] if len(cells) > 2 and cells[2] else None
+                items.append({'line': f"{cells[0]} - {cells[1]}", 'artist': cells[0], 'title': cells[1], 'album': album})
+        else:
+            for raw in f:
+                line = raw.strip()
+                if line and not line.startswith('#'):
+                    artist, title = parse_line(line)
+                    items.append({'line': line, 'artist': artist, 'title': title, 'album': None})
+    return items
+
+
+def score_match(item, result):
+    """
+    How well a search result summary fits a wishlist item, about 0..1:
+    title similarity, uploader = artist (or its '- Topic' / VEVO channel),
+    plausible duration and no unwanted variant (live, cover, remix, ...).
+    """
+    wanted = normalize(f"{item['artist'] or ''} {item['title']}")
+    found = normalize(result.get('title'))
+    uploader = normalize(result.get('uploader'))
+    if not wanted or not found:
+        return 0.0
+
+    wanted_words = set(wanted.split())
+    coverage = len(wanted_words & set(f"{found} {uploader}".split())) / len(wanted_words)
+    score = 0.6 * coverage + 0.4 * SequenceMatcher(None, normalize(item['title']), found).ratio()
+
+    artist = normalize(item['artist'])
+    if artist and uploader and (artist in uploader or uploader in artist):
+        score += 0.15
+    elif uploader.endswith(" topic") or "vevo" in uploader:
+        score += 0.1
+
+    duration = result.get('duration')
+    if duration and not MIN_DURATION <= duration <= MAX_DURATION:
+        score -= 0.3
+
+    penalty = 0.0
+    for word in VARIANT_WORDS:
+        if f" {word} " in f" {found} " and f" {word} " not in f" {wanted} ":
+            penalty += 0.25
+    return score - min(penalty, 0.5)
+
+
+def best_match(item, results):
+    """(result, score) of the best scoring search result, earlier results win ties."""
+    best, best_score = None, 0.0
+    for rank, result in enumerate(results):
+        score = score_match(item, result) - 0.01 * rank
+        if score > best_score:
+            best, best_score = result, score
+    return best, best_score
+
+
+class WishlistState:
+    """Outcome of every processed wishlist line (SQLite), keyed by its normalized text."""
+    def __init__(self, path):
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS wishlist (
+                key TEXT PRIMARY KEY,
+                line TEXT NOT NULL,
+                status TEXT NOT NULL,
+                video_id TEXT,
+                job_id TEXT,
+                message TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL
+            )
+        """)
+        self._conn.commit()
+
+    def all(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, line, status, video_id, job_id, message, attempts, updated_at FROM wishlist"
+            ).fetchall()
+        return {
+            r[0]: {'line': r[1], 'status': r[2], 'video_id': r[3], 'job_id': r[4], 'message': r[5],
+                   'attempts': r[6], 'updated_at': r[7]}
+            for r in rows
+        }
+
+    def set(self, key, line, status, video_id=None, job_id=None, message="", attempts=0):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO wishlist (key, line, status, video_id, job_id, message, attempts, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, line, status, video_id, job_id, message, attempts, time.time())
+            )
+            self._conn.commit()
+
+    def counts(self):
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM wishlist GROUP BY status").fetchall())
+
+
+class WishlistSync:
+    """
+    Unattended batch download of a wishlist:
+    new lines -> search -> best match by title / uploader / duration
+    -> batched metadata analysis -> downloads on the shared JobQueue.
+    Lines already in the library are skipped. Searches run on `workers`
+    threads; the downloads are bounded by the JobQueue as usual.
+    start() polls the file every POLL_SECONDS and syncs when it changed,
+    plus every `interval` seconds to retry failed lines. Each sync leaves a
+    report (see reports()).
+    """
+    def __init__(self, loader, jobs, path, lines=(), state_path=None, workers=2, history=20):
+        self.loader = loader
+        self.jobs = jobs
+        self.path = path
+        self.lines = [line for line in lines or () if line and line.strip()]
+        self.state = WishlistState(state_path)
+        self.workers = max(1, int(workers))
+        self.history = history
+        self._sync_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._reports = {}
+        self._order = []
+        self._thread = None
+
+    def start(self, interval):
+        """Watches the wishlist in a daemon thread (interval 0 = disabled)."""
+        if self._thread or not interval or not (self.path or self.lines):
+            return
+        def loop():
+            signature, last_sync = None, 0.0
+            while True:
+                current = self._signature()
+                changed = current != signature
+                if changed or time.time() - last_sync >= interval:
+                    signature, last_sync = current, time.time()
+                    try:
+                        self.sync(trigger="changed" if changed else "schedule")
+                    except Exception as e:
+                        log.exception(f"Wishlist sync failed: {e}")
+                time.sleep(POLL_SECONDS)
+        self._thread = threading.Thread(target=loop, name="wishlist-sync", daemon=True)
+        self._thread.start()
+        log.info(f"Watching wishlist {self.path}", extra={'interval': interval, 'option_lines': len(self.lines)})
+
+    def _signature(self):
+        try:
+            st = os.stat(self.path)
+            return st.st_mtime, st.st_size
+        except (OSError, TypeError):
+            return None
+
+    def wanted(self):
+        """Items of the file and the option list, first occurrence of each line wins."""
+        items = []
+        if self.path and os.path.exists(self.path):
+            items += read_wishlist(self.path)
+        for line in self.lines:
+            artist, title = parse_line(line)
+            items.append({'line': line.strip(), 'artist': artist, 'title': title, 'album': None})
+        unique = {}
+        for item in items:
+            key = normalize(item['line'])
+            if key:
+                unique.setdefault(key, dict(item, key=key))
+        return list(unique.values())
+
+    def pending(self, items):
+        """
+        The items a sync has to process: never seen, or failed with attempts
+        left. A failed download job counts as an attempt, and so does a job
+        the queue no longer knows (lost in a restart) unless the video made
+        it into the library.
+        """
+        known = self.state.all()
+        todo = []
+        for item in items:
+            entry = known.get(item['key'])
+            if entry is None:
+                todo.append(dict(item, attempts=0))
+                continue
+            status, attempts = entry['status'], entry['attempts']
+            if status == QUEUED and entry['job_id']:
+                job = self.jobs.get(entry['job_id'])
+                if job is None and entry['video_id'] and self.loader.library.find(video_id=entry['video_id']):
+                    self.state.set(item['key'], item['line'], IN_LIBRARY, video_id=entry['video_id'],
+                                   job_id=entry['job_id'], message="Downloaded", attempts=attempts)
+                    continue
+                if job is None or job['status'] == 'failed':
+                    status, attempts = ERROR, attempts + 1
+                    message = job['message'] if job else "Download job lost"
+                    self.state.set(item['key'], item['line'], ERROR, video_id=entry['video_id'],
+                                   job_id=entry['job_id'], message=message, attempts=attempts)
+            if status == ERROR and attempts < MAX_ATTEMPTS:
+                todo.append(dict(item, attempts=attempts))
+        return todo
+
+    def sync(self, trigger="manual"):
+        """One pass over the wishlist. Returns the report, or None if a sync is already running."""
+        if not self._sync_lock.acquire(blocking=False):
+            return None
+        try:
+            return self._sync(trigger)
+        finally:
+            self._sync_lock.release()
+
+    def _sync(self, trigger):
+        report = {'id': uuid.uuid4().hex[:12], 'trigger': trigger, 'started_at': time.time(), 'finished_at': None,
+                  'total': 0, 'new': 0, 'items': []}
+        self._remember(report)
+        items = self.wanted()
+        todo = self.pending(items)
+        report.update(total=len(items), new=len(todo))
+        if not todo:
+            report['finished_at'] = time.time()
+            log.debug("Wishlist unchanged", extra={'lines': len(items)})
+            return report
+        log.info(f"Wishlist sync: {len(todo)} of {len(items)} line(s) to process",
+                 extra={'report': report['id'], 'trigger': trigger})
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="wishlist") as pool:
+            resolved = list(pool.map(self._resolve, todo))
+
+        # One batched analysis for every match, as the playlist importer does
+        matched = [(item, result) for item, result in zip(todo, resolved) if item['outcome'] == QUEUED]
+        proposals = self.loader.analyze_metadata_batch([(r['title'], r['uploader']) for _, r in matched]) if matched else []
+        for (item, result), proposal in zip(matched, proposals):
+            artists = proposal['proposal_artists'] or ([item['artist']] if item['artist'] else None)
+            job = self.jobs.submit(
+                self.loader.download_track, result['url'],
+                artists, proposal['proposal_title'] or item['title'],
+                item['album'] or proposal['proposal_album'], proposal['proposal_year'],
+                label=f"Wishlist: {item['line']}", id_kwarg='progress_key'
+            )
+            item.update(job_id=job.id, message=f"{result['title']} ({result['uploader']})")
+
+        for item in todo:
+            attempts = item['attempts'] + 1 if item['outcome'] == ERROR else item['attempts']
+            self.state.set(item['key'], item['line'], item['outcome'], video_id=item.get('video_id'),
+                           job_id=item.get('job_id'), message=item.get('message', ""), attempts=attempts)
+            metrics.WISHLIST_ITEMS.inc(outcome=item['outcome'])
+        report['items'] = [
+            {key: item.get(key) for key in ('line', 'outcome', 'message', 'score', 'video_id', 'job_id')}
+            for item in todo
+        ]
+        report['finished_at'] = time.time()
+        counts = self._counts(report)
+        log.info(f"Wishlist sync done: {counts}", extra=dict(counts, report=report['id']))
+        return report
+
+    def _resolve(self, item):
+        """Search and pick the best result; sets item['outcome'] (and the match). Runs on the pool."""
+        try:
+            if self.loader.library.find(artist=item['artist'], title=item['title']):
+                item.update(outcome=IN_LIBRARY, message="Already in library")
+                return None
+            # Flat results are enough for matching; hydrating all 15 would cost 15 extractions
+            found = self.loader.search_video(f"{item['artist'] or ''} {item['title']}".strip(), 'fast', hydrate=False)
+            if not found.get('found'):
+                raise RuntimeError(found.get('error') or "Search failed")
+            result, score = best_match(item, found['results'])
+            if result is None or score < MIN_SCORE:
+                message = f"Best result '{result['title']}' scored {score:.2f}" if result else "No results"
+                item.update(outcome=NO_MATCH, message=message, score=round(score, 2))
+                return None
+            item.update(score=round(score, 2), video_id=result.get('id'))
+            if result.get('in_library'):
+                item.update(outcome=IN_LIBRARY, message="Already in library")
+                return None
+            item['outcome'] = QUEUED
+            return result
+        except Exception as e:
+            log.warning(f"Wishlist line failed: {item['line']}: {e}")
+            item.update(outcome=ERROR, message=str(e))
+            return None
+
+    @staticmethod
+    def _counts(report):
+        counts = {}
+        for item in report['items']:
+            counts[item['outcome']] = counts.get(item['outcome'], 0) + 1
+        return counts
+
+    def _remember(self, report):
+        with self._lock:
+            self._reports[report['id']] = report
+            self._order.append(report['id'])
+            while len(self._order) > self.history:
+                del self._reports[self._order.pop(0)]
+
+    def report(self, report_id):
+        with self._lock:
+            report = self._reports.get(report_id)
+            return dict(report, counts=self._counts(report)) if report else None
+
+    def reports(self):
+        """Recent syncs, newest first, without the per-line items."""
+        with self._lock:
+            reports = [self._reports[i] for i in reversed(self._order)]
+        return [dict({k: v for k, v in r.items() if k != 'items'}, counts=self._counts(r)) for r in reports]
+
+    def stats(self):
+        return {
+            'file': self.path,
+            'option_lines': len(self.lines),
+            'watching': bool(self._thread),
+            'lines': self.state.counts(),
+        }
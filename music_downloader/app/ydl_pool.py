@@ -0,0 +1,137 @@
+"""
+Reusable YoutubeDL instances. Building one costs ~85ms of CPU (it registers
+every extractor) and the first YouTube extraction on it another ~40ms; a
+fresh instance also opens new HTTPS connections and starts with empty
+cookies. A search in fast mode builds one per hydrated entry, so this was
+paid 15 times per search.
+
+YoutubeDL is not thread safe: an instance is checked out by one thread at a
+time (acquire()) and goes back to the idle list of its profile afterwards,
+with the params it was built with restored. yt-dlp reads most params live;
+the format selector is compiled once per instance, so acquire() rebuilds it
+when a use asks for another format.
+"""
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+import yt_dlp
+
+log = logging.getLogger("ydl_pool")
+
+# Idle instances kept per profile; busier moments build extra ones that are closed on release
+MAX_IDLE = 8
+# Instances are rebuilt after this many uses (warning dedup set, extractor caches keep growing)
+MAX_USES = 200
+# Extractors instantiated up front by warm()
+WARM_EXTRACTORS = ('Youtube', 'YoutubeSearch', 'YoutubeTab')
+
+
+class YoutubeDLPool:
+    """
+    Named option profiles (register()) with a list of idle instances each.
+    acquire(name, **params) yields an instance with params applied for that
+    use only; the result is the same as `with yt_dlp.YoutubeDL(opts)` minus
+    the setup. Instances keep their keep-alive connections and cookies.
+    """
+    def __init__(self, max_idle=MAX_IDLE):
+        self.max_idle = max_idle
+        self._lock = threading.Lock()
+        self._profiles = {}
+        self._idle = {}
+        self._created = 0
+        self._reused = 0
+
+    def register(self, name, opts):
+        with self._lock:
+            self._profiles[name] = opts
+            self._idle.setdefault(name, [])
+
+    def _create(self, name):
+        ydl = yt_dlp.YoutubeDL(dict(self._profiles[name]))
+        # Shallow copy: nested values (extractor_args, outtmpl) are never mutated per use
+        ydl._pool_baseline = dict(ydl.params)
+        ydl._pool_hooks = list(ydl._progress_hooks)
+        ydl._pool_selector = ydl.format_selector
+        ydl._pool_selectors = {}
+        ydl._pool_uses = 0
+        with self._lock:
+            self._created += 1
+        return ydl
+
+    def _checkout(self, name):
+        with self._lock:
+            idle = self._idle[name]
+            if idle:
+                self._reused += 1
+                return idle.pop()
+        return self._create(name)
+
+    def _checkin(self, name, ydl):
+        ydl._pool_uses += 1
+        ydl.params.clear()
+        ydl.params.update(ydl._pool_baseline)
+        ydl._progress_hooks = list(ydl._pool_hooks)
+        ydl.format_selector = ydl._pool_selector
+        ydl._download_retcode = 0
+        with self._lock:
+            idle = self._idle[name]
+            if ydl._pool_uses < MAX_USES and len(idle) < self.max_idle:
+                idle.append(ydl)
+                return
+        ydl.close()
+
+    @contextmanager
+    def acquire(self, name, progress_hooks=None, **params):
+        """
+        An instance of profile `name` for exclusive use. params override the
+        profile for this use (outtmpl, ratelimit, playlistend, ... are read
+        live by yt-dlp; format also recompiles the format selector);
+        progress_hooks replace the profile's hooks.
+        """
+        ydl = self._checkout(name)
+        try:
+            if 'outtmpl' in params and isinstance(params['outtmpl'], str):
+                # YoutubeDL keeps templates as a dict once built
+                params['outtmpl'] = dict(ydl.params['outtmpl'], default=params['outtmpl'])
+            if params.get('format') and params['format'] != ydl._pool_baseline.get('format'):
+                # Compiled in YoutubeDL.__init__ only; changing params['format'] alone has no effect
+                selector = ydl._pool_selectors.get(params['format'])
+                if selector is None:
+                    selector = ydl._pool_selectors[params['format']] = ydl.build_format_selector(params['format'])
+                ydl.format_selector = selector
+            ydl.params.update(params)
+            if progress_hooks is not None:
+                ydl._progress_hooks = list(progress_hooks)
+            yield ydl
+        finally:
+            self._checkin(name, ydl)
+
+    def warm(self, *names):
+        """Builds one instance of each profile with the YouTube extractors ready, in the background."""
+        def run():
+            for name in names:
+                start = time.perf_counter()
+                ydl = self._create(name)
+                for ie_key in WARM_EXTRACTORS:
+                    ydl.get_info_extractor(ie_key)
+                self._checkin(name, ydl)
+                log.debug(f"Warmed {name}", extra={'seconds': round(time.perf_counter() - start, 3)})
+        threading.Thread(target=run, name="ydl-warmup", daemon=True).start()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'created': self._created,
+                'reused': self._reused,
+                'idle': sum(len(idle) for idle in self._idle.values()),
+            }
+
+    def close(self):
+        with self._lock:
+            idle = [ydl for instances in self._idle.values() for ydl in instances]
+            for instances in self._idle.values():
+                instances.clear()
+        for ydl in idle:
+            ydl.close()
@@ -0,0 +1,136 @@
+"""
+Benchmark for MusicDownloader.analyze_metadata / analyze_metadata_batch
+against a local mock of the OpenAI chat completions API (--latency per
+request). Offline, no API key needed.
+
+Reports cold proposals (every title is a new API call), memoized proposals,
+concurrent identical requests (coalesced into one call) and batch analysis
+of the whole corpus, plus the number of API calls the mock received.
+
+    python benchmarks/bench_analyze.py --latency 0.2 --threads 8
+"""
+import re
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import benchlib
+from benchlib import LocalServer, QuietHandler, load_corpus, summarize, report
+
+import config  # noqa: E402
+from downloader import MusicDownloader  # noqa: E402
+
+
+BATCH_LINE_RE = re.compile(r'^\s*\d+\. Video Title: (".*") \| Channel Name: (".*")$', re.M)
+SINGLE_TITLE_RE = re.compile(r'Video Title: "(.*)"$', re.M)
+SINGLE_CHANNEL_RE = re.compile(r'Channel Name: "(.*)"$', re.M)
+
+
+class MockOpenAI(QuietHandler):
+    """Answers chat completions like the real API would, using clean_metadata for the content."""
+    latency = 0.0
+    calls = 0
+    lock = threading.Lock()
+    cleaner = None
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        prompt = body['messages'][-1]['content']
+        time.sleep(self.latency)
+        with MockOpenAI.lock:
+            MockOpenAI.calls += 1
+
+        if 'JSON array' in prompt:
+            # Batch prompt: one 'N. Video Title: "..." | Channel Name: "..."' line per video
+            pairs = [(json.loads(title), json.loads(channel))
+                     for title, channel in BATCH_LINE_RE.findall(prompt)]
+        else:
+            pairs = [(SINGLE_TITLE_RE.search(prompt).group(1), SINGLE_CHANNEL_RE.search(prompt).group(1))]
+        answers = []
+        for title, channel in pairs:
+            artists, song = self.cleaner(channel, title)
+            answers.append({"artist": artists, "title": song, "album": "", "year": ""})
+        if 'JSON array' not in prompt:
+            content = answers[0]
+        else:
+            content = [dict(answer, index=i) for i, answer in enumerate(answers)]
+
+        payload = {"choices": [{"message": {"role": "assistant", "content": json.dumps(content)}}]}
+        self.send_body(json.dumps(payload).encode('utf-8'), 'application/json')
+
+
+def bench_cold(loader, corpus, tag):
+    # A suffix per pass makes every title a memo cache miss
+    return [benchlib.timed(loader.analyze_metadata, f"{title} [{tag}]", channel)[0] for channel, title in corpus]
+
+
+def bench_concurrent(loader, corpus, threads):
+    """threads callers ask for the same title at once; returns (latencies, wall)."""
+    timings = []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for i, (channel, title) in enumerate(corpus):
+            key = f"{title} [concurrent {i}]"
+            futures = [pool.submit(benchlib.timed, loader.analyze_metadata, key, channel) for _ in range(threads)]
+            timings.extend(future.result()[0] for future in futures)
+    return timings, time.perf_counter() - start
+
+
+def run(latency=0.2, threads=8, passes=2):
+    benchlib.sandbox()
+    loader = MusicDownloader()
+    corpus = load_corpus()
+    MockOpenAI.latency = latency
+    MockOpenAI.cleaner = loader.clean_metadata
+
+    results = {}
+    with LocalServer(MockOpenAI) as server:
+        config.OPENAI_API_BASE = server.url
+        config.OPENAI_API_KEY = "bench"
+        print(f"analyze: {len(corpus)} titles, {latency * 1e3:.0f}ms mock API latency")
+
+        calls = MockOpenAI.calls
+        timings = []
+        for n in range(passes):
+            timings += bench_cold(loader, corpus, f"cold {n}")
+        results['analyze_cold'] = dict(summarize(timings), api_calls=MockOpenAI.calls - calls)
+
+        calls = MockOpenAI.calls
+        timings = []
+        for n in range(passes * 10):
+            # Same titles as the last cold pass, so every call is a memo hit
+            timings += [benchlib.timed(loader.analyze_metadata, f"{title} [cold {passes - 1}]", channel)[0]
+                        for channel, title in corpus]
+        results['analyze_memoized'] = dict(summarize(timings), api_calls=MockOpenAI.calls - calls)
+
+        calls = MockOpenAI.calls
+        timings, wall = bench_concurrent(loader, corpus[:16], threads)
+        results['analyze_concurrent'] = dict(summarize(timings, wall), api_calls=MockOpenAI.calls - calls)
+
+        calls = MockOpenAI.calls
+        timings = []
+        for n in range(passes):
+            items = [(f"{title} [batch {n}]", channel) for channel, title in corpus]
+            timings.append(benchlib.timed(loader.analyze_metadata_batch, items)[0])
+        stats = summarize(timings)
+        results['analyze_batch'] = dict(stats, titles_per_sec=stats['per_sec'] * len(corpus),
+                                        api_calls=MockOpenAI.calls - calls)
+
+    for name, stats in results.items():
+        report(name, stats, unit="batches" if name == 'analyze_batch' else "titles")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds the mock API takes per request")
+    parser.add_argument("--threads", type=int, default=8, help="concurrent callers for the coalescing test")
+    parser.add_argument("--passes", type=int, default=2, help="passes over the corpus for cold/batch runs")
+    args = parser.parse_args()
+    run(args.latency, args.threads, args.passes)
+
+
+if __name__ == "__main__":
+    main()
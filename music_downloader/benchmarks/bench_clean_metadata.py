@@ -0,0 +1,85 @@
+"""
+Micro-benchmark for MusicDownloader.clean_metadata / clean_metadata_many.
+
+Runs the fixture corpus (fixtures/titles.tsv) many times and reports
+throughput and per-call latency percentiles. Offline, no network needed.
+
+    python benchmarks/bench_clean_metadata.py --repeat 200
+"""
+import time
+import argparse
+
+import benchlib
+from benchlib import load_corpus, percentile
+
+from downloader import MusicDownloader  # noqa: E402
+
+
+def clean_many(loader, items):
+    # Older versions have no clean_metadata_many; keep the benchmark comparable
+    many = getattr(loader, 'clean_metadata_many', None)
+    if many:
+        return many(items)
+    return [loader.clean_metadata(channel, title) for channel, title in items]
+
+
+def bench_single(loader, corpus, repeat):
+    timings = []
+    for _ in range(repeat):
+        for channel, title in corpus:
+            start = time.perf_counter()
+            loader.clean_metadata(channel, title)
+            timings.append(time.perf_counter() - start)
+    timings.sort()
+    total = sum(timings)
+    return {
+        'calls': len(timings),
+        'per_sec': len(timings) / total if total else 0.0,
+        'p50_us': percentile(timings, 50) * 1e6,
+        'p95_us': percentile(timings, 95) * 1e6,
+        'p99_us': percentile(timings, 99) * 1e6,
+    }
+
+
+def bench_many(loader, corpus, repeat):
+    items = corpus * repeat
+    start = time.perf_counter()
+    clean_many(loader, items)
+    total = time.perf_counter() - start
+    return {
+        'calls': len(items),
+        'per_sec': len(items) / total if total else 0.0,
+    }
+
+
+def run(repeat=200, show=False):
+    benchlib.sandbox()
+    loader = MusicDownloader()
+    corpus = load_corpus()
+
+    if show:
+        for (channel, title), (artists, song) in zip(corpus, clean_many(loader, corpus)):
+            print(f"{title!r:90} -> {artists} / {song!r}")
+
+    # Warm up
+    clean_many(loader, corpus)
+
+    print(f"corpus: {len(corpus)} titles x {repeat}")
+    single = bench_single(loader, corpus, repeat)
+    many = bench_many(loader, corpus, repeat)
+    print(f"clean_metadata:      {single['per_sec']:>10.0f} titles/s  "
+          f"p50 {single['p50_us']:.1f}us  p95 {single['p95_us']:.1f}us  p99 {single['p99_us']:.1f}us")
+    print(f"clean_metadata_many: {many['per_sec']:>10.0f} titles/s")
+    return {'clean_metadata': single, 'clean_metadata_many': many}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200, help="passes over the corpus")
+    parser.add_argument("--show", action="store_true", help="print the parsed corpus once")
+    args = parser.parse_args()
+    run(args.repeat, args.show)
+
+
+if __name__ == "__main__":
+    main()
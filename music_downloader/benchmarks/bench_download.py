@@ -0,0 +1,154 @@
+"""
+Benchmark for MusicDownloader.download_track: yt-dlp's generic extractor
+fetches tracks from a local stand-in media server, then the process pool
+converts and tags them. Offline; --rate throttles the server to simulate a
+slower link.
+
+Reports per-track fetch latency (stage 1, until download_track returns),
+end-to-end latency (stage 2 done) and overall tracks/s and MB/s with
+--workers parallel downloads, as the job queue would run them.
+
+Without ffmpeg the media is random bytes and stage 2 fails; fetch numbers
+are still valid, end-to-end ones are not.
+
+    python benchmarks/bench_download.py --tracks 12 --workers 2 --format mp3
+"""
+import os
+import time
+import shutil
+import logging
+import argparse
+import subprocess
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import benchlib
+from benchlib import LocalServer, QuietHandler, summarize, report
+
+import config  # noqa: E402
+from downloader import MusicDownloader  # noqa: E402
+
+CHUNK = 64 * 1024
+
+
+class MediaServer(QuietHandler):
+    """Serves the same audio bytes for every /media/<id>.m4a, with Range support."""
+    media = b""
+    rate = 0
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_GET(self):
+        if not self.path.startswith('/media/'):
+            self.send_body(b"not found", 'text/plain', status=404)
+            return
+        data, status = self.media, 200
+        ranged = self.headers.get('Range', '')
+        if ranged.startswith('bytes='):
+            first, _, last = ranged[6:].partition('-')
+            first = int(first or 0)
+            last = int(last) if last else len(data) - 1
+            data, status = data[first:last + 1], 206
+        self.send_response(status)
+        self.send_header('Content-Type', 'audio/mp4')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Accept-Ranges', 'bytes')
+        if status == 206:
+            self.send_header('Content-Range', f"bytes {first}-{first + len(data) - 1}/{len(self.media)}")
+        self.end_headers()
+        if self.command == 'HEAD':
+            return
+        # The generic extractor hangs up after the headers; LocalServer ignores that
+        for offset in range(0, len(data), CHUNK):
+            self.wfile.write(data[offset:offset + CHUNK])
+            if self.rate:
+                time.sleep(CHUNK / self.rate)
+
+
+def find_ffmpeg():
+    bin_dir = getattr(config, 'BIN_DIR', '')
+    for name in ('ffmpeg', 'ffmpeg.exe'):
+        if bin_dir and os.path.exists(os.path.join(bin_dir, name)):
+            return os.path.join(bin_dir, name)
+    return shutil.which('ffmpeg')
+
+
+def make_media(seconds, size_mb, workdir):
+    """A real AAC track (seconds long) when ffmpeg is available, else size_mb of random bytes."""
+    ffmpeg = find_ffmpeg()
+    if not ffmpeg:
+        return os.urandom(int(size_mb * 1024 * 1024)), False
+    path = os.path.join(workdir, "bench.m4a")
+    subprocess.run([ffmpeg, '-v', 'error', '-y', '-f', 'lavfi', '-i', f"sine=frequency=440:duration={seconds}",
+                    '-c:a', 'aac', '-b:a', '128k', path], check=True)
+    with open(path, 'rb') as f:
+        return f.read(), True
+
+
+def run(tracks=12, workers=2, output_format="mp3", seconds=180, size_mb=3.0, rate=0):
+    root = benchlib.sandbox()
+    loader = MusicDownloader()
+    MediaServer.media, real_audio = make_media(seconds, size_mb, root)
+    MediaServer.rate = rate
+    print(f"download: {tracks} tracks of {len(MediaServer.media) / 1e6:.1f}MB, {workers} workers, "
+          f"format {output_format}, {'unthrottled' if not rate else f'{rate / 1e6:.1f}MB/s per stream'}")
+    if not real_audio:
+        print("ffmpeg not found: fetch numbers only, stage 2 fails for every track")
+        logging.getLogger("downloader").setLevel(logging.CRITICAL)
+
+    fetch_times, total_times, outcomes = [], [], {'ok': 0, 'failed': 0}
+
+    def finished(start, result):
+        total_times.append(time.perf_counter() - start)
+        outcomes['ok' if result[0] else 'failed'] += 1
+
+    def one(i, url):
+        """Stage 1 in this thread; like a job queue worker it moves on while stage 2 runs."""
+        start = time.perf_counter()
+        result = loader.download_track(url, [f"Bench Artist {i}"], f"Track {i}", "Bench Album", "2024",
+                                       force=True, output_format=output_format)
+        fetch_times.append(time.perf_counter() - start)
+        done = Future()
+        if isinstance(result, Future):
+            result.add_done_callback(lambda future: done.set_result(finished(start, future.result())))
+        else:
+            done.set_result(finished(start, result))
+        return done
+
+    with LocalServer(MediaServer) as server:
+        # One warm-up track so process pool start-up is not part of the numbers
+        one(-1, f"{server.url}/media/warmup.m4a").result()
+        fetch_times.clear()
+        total_times.clear()
+        outcomes.update(ok=0, failed=0)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = [pool.submit(one, i, f"{server.url}/media/track{i:03d}.m4a") for i in range(tracks)]
+            for future in pending:
+                future.result().result()
+        wall = time.perf_counter() - start
+
+    fetch = summarize(fetch_times, wall)
+    total = dict(summarize(total_times, wall), ok=outcomes['ok'], failed=outcomes['failed'],
+                 mb_per_sec=tracks * len(MediaServer.media) / 1e6 / wall)
+    results = {'download_fetch': fetch, 'download_end_to_end': total}
+    for name, stats in results.items():
+        report(name, stats, unit="tracks")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tracks", type=int, default=12, help="tracks to download")
+    parser.add_argument("--workers", type=int, default=2, help="parallel downloads (max_concurrent_downloads)")
+    parser.add_argument("--format", default="mp3", help="output format (mp3, native, m4a, opus, flac)")
+    parser.add_argument("--seconds", type=int, default=180, help="track length when ffmpeg generates the media")
+    parser.add_argument("--size-mb", type=float, default=3.0, help="media size without ffmpeg")
+    parser.add_argument("--rate", type=float, default=0, help="bytes/s per stream (0 = unthrottled)")
+    args = parser.parse_args()
+    run(args.tracks, args.workers, args.format, args.seconds, args.size_mb, args.rate)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Benchmark for MusicDownloader.search_video / iter_search, replayed from
+yt-dlp info-json fixtures (fixtures/search_results.json, video.info.json)
+instead of YouTube. Offline; --latency simulates the network round trip of
+each extract_info call.
+
+Reports cold searches (new query, every entry resolved / hydrated), time to
+the first streamed result and warm searches (served from the search cache).
+
+    python benchmarks/bench_search.py --iterations 20 --latency 0.1
+"""
+import copy
+import json
+import time
+import argparse
+import threading
+import contextlib
+
+import benchlib
+from benchlib import load_fixture, summarize, report
+
+import yt_dlp  # noqa: E402
+from downloader import MusicDownloader  # noqa: E402
+
+
+@contextlib.contextmanager
+def fixture_extractor(latency=0.0):
+    """
+    Replaces YoutubeDL.extract_info: 'ytsearchN:' queries return the search
+    fixture, watch URLs the video fixture filled in for that id. Yields a dict
+    counting the calls of each kind.
+    """
+    search = load_fixture("search_results.json")
+    video = load_fixture("video.info.json")
+    entries = {entry['id']: entry for entry in search['entries']}
+    calls = {'search': 0, 'video': 0}
+    lock = threading.Lock()
+    original = yt_dlp.YoutubeDL.extract_info
+
+    def fill(template, **values):
+        text = json.dumps(template)
+        for key, value in values.items():
+            text = text.replace(f"<{key}>", json.dumps(str(value))[1:-1])
+        return json.loads(text)
+
+    def extract_info(self, url, download=True, ie_key=None, extra_info=None, process=True, force_generic_extractor=False):
+        time.sleep(latency)
+        if url.startswith("ytsearch"):
+            kind = 'search'
+            query = url.split(":", 1)[1]
+            result = fill(dict(search, entries=[]), query=query)
+            result['entries'] = (copy.deepcopy(entry) for entry in search['entries'])
+        else:
+            kind = 'video'
+            video_id = url.rsplit("v=", 1)[-1]
+            entry = entries.get(video_id, {'title': video_id, 'channel': 'Unknown'})
+            result = fill(video, id=video_id, title=entry['title'], channel=entry['channel'])
+        with lock:
+            calls[kind] += 1
+        if process:
+            return self.process_ie_result(result, download=download)
+        return result
+
+    yt_dlp.YoutubeDL.extract_info = extract_info
+    try:
+        yield calls
+    finally:
+        yt_dlp.YoutubeDL.extract_info = original
+
+
+def bench_cold(loader, mode, iterations):
+    timings = []
+    for i in range(iterations):
+        elapsed, result = benchlib.timed(loader.search_video, f"bench {mode} query {i}", mode)
+        if not result.get('found'):
+            raise RuntimeError(f"search failed: {result.get('error')}")
+        timings.append(elapsed)
+    return summarize(timings)
+
+
+def bench_first_result(loader, mode, iterations):
+    timings = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        results = loader.iter_search(f"bench first {mode} {i}", mode)
+        next(results)
+        timings.append(time.perf_counter() - start)
+        # Drain it so the search is cached like a finished stream
+        for _ in results:
+            pass
+    return summarize(timings)
+
+
+def bench_warm(loader, mode, iterations):
+    query = f"bench warm {mode}"
+    loader.search_video(query, mode)
+    timings = [benchlib.timed(loader.search_video, query, mode)[0] for _ in range(iterations)]
+    return summarize(timings)
+
+
+def run(iterations=20, latency=0.1):
+    benchlib.sandbox()
+    loader = MusicDownloader()
+    results = {}
+    print(f"search: {iterations} iterations, {latency * 1e3:.0f}ms simulated extract latency")
+    with fixture_extractor(latency) as calls:
+        for mode in ('fast', 'full'):
+            # full mode resolves all 15 entries one after another; fewer rounds keep it short
+            rounds = iterations if mode == 'fast' else max(3, iterations // 4)
+            results[f'search_{mode}_cold'] = bench_cold(loader, mode, rounds)
+            results[f'search_{mode}_first_result'] = bench_first_result(loader, mode, rounds)
+            results[f'search_{mode}_warm'] = bench_warm(loader, mode, iterations * 10)
+        # Background hydration of fast results must not leak into the next benchmark
+        loader._detail_pool.shutdown(wait=True)
+    for name, stats in results.items():
+        report(name, stats, unit="searches")
+    print(f"extract_info calls: {calls['search']} searches, {calls['video']} video pages")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20, help="searches per measurement")
+    parser.add_argument("--latency", type=float, default=0.1, help="seconds slept per extract_info call")
+    args = parser.parse_args()
+    run(args.iterations, args.latency)
+
+
+if __name__ == "__main__":
+    main()
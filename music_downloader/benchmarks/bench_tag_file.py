@@ -0,0 +1,69 @@
+"""
+Benchmark for postprocess.tag_file (tags + cover in one save) on generated
+MP3 files: silent MPEG-1 Layer III frames, so no ffmpeg or network needed.
+
+Reports first-time tagging (no ID3 header yet, the whole file is rewritten
+to make room) and re-tagging (header already present and padded).
+
+    python benchmarks/bench_tag_file.py --files 50 --seconds 240
+"""
+import os
+import argparse
+
+import benchlib
+from benchlib import summarize, report
+
+import postprocess  # noqa: E402
+
+# MPEG-1 Layer III, 128 kbit/s, 44.1 kHz, no padding: 417 bytes per frame, 1152 samples
+FRAME_HEADER = bytes((0xFF, 0xFB, 0x90, 0x64))
+FRAME_SIZE = 417
+FRAMES_PER_SECOND = 44100 / 1152
+
+
+def make_mp3(path, seconds):
+    frame = FRAME_HEADER + bytes(FRAME_SIZE - len(FRAME_HEADER))
+    with open(path, 'wb') as f:
+        f.write(frame * int(seconds * FRAMES_PER_SECOND))
+
+
+def make_cover(size_kb):
+    # tag_file does not decode the picture; a JPEG header and the usual size are enough
+    return 'image/jpeg', b'\xff\xd8\xff\xe0\x00\x10JFIF\x00' + os.urandom(size_kb * 1024) + b'\xff\xd9'
+
+
+def tag_args(i, cover):
+    return {
+        'artists_list': [f"Bench Artist {i}", "Featured Guest"], 'title': f"Track {i}", 'album': "Bench Album",
+        'year': "2024", 'genre': "Music", 'track_number': f"{i + 1}/99",
+        'source_url': f"https://www.youtube.com/watch?v=bench{i:06d}", 'cover': cover,
+    }
+
+
+def run(files=50, seconds=240, cover_kb=120):
+    root = benchlib.sandbox()
+    cover = make_cover(cover_kb)
+    paths = [os.path.join(root, f"track{i:03d}.mp3") for i in range(files)]
+    for path in paths:
+        make_mp3(path, seconds)
+    print(f"tag_file: {files} MP3s of {os.path.getsize(paths[0]) / 1e6:.1f}MB, {cover_kb}KB cover")
+
+    first = [benchlib.timed(postprocess.tag_file, path, **tag_args(i, cover))[0] for i, path in enumerate(paths)]
+    again = [benchlib.timed(postprocess.tag_file, path, **tag_args(i, cover))[0] for i, path in enumerate(paths)]
+    results = {'tag_mp3_first': summarize(first), 'tag_mp3_retag': summarize(again)}
+    for name, stats in results.items():
+        report(name, stats, unit="files")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=50, help="MP3 files to generate and tag")
+    parser.add_argument("--seconds", type=int, default=240, help="length of each generated file")
+    parser.add_argument("--cover-kb", type=int, default=120, help="size of the embedded cover")
+    args = parser.parse_args()
+    run(args.files, args.seconds, args.cover_kb)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Shared helpers for the offline benchmarks: a sandboxed config (temporary
+download/data folders, so the real library and caches are never touched),
+local stand-in HTTP servers, timing summaries and result files that can be
+compared between versions (see run_all.py).
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(HERE, "..", "app")
+FIXTURES = os.path.join(HERE, "fixtures")
+sys.path.insert(0, APP_DIR)
+
+
+def load_corpus(path=os.path.join(FIXTURES, "titles.tsv")):
+    """(channel, title) pairs from the fixture corpus."""
+    items = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if not line or line.startswith('#'):
+                continue
+            channel, title = line.split("\t", 1)
+            items.append((channel, title))
+    return items
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES, name), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def sandbox(verbose=False):
+    """
+    Points config at a fresh temporary folder (downloads, staging, caches,
+    library index) and quiets logging. Call before creating a MusicDownloader.
+    Returns the folder; it is removed at exit.
+    """
+    import atexit
+    import config
+
+    root = tempfile.mkdtemp(prefix="musicdl-bench-")
+    atexit.register(shutil.rmtree, root, True)
+    config.DOWNLOAD_DIR = os.path.join(root, "downloads")
+    config.STAGING_DIR = os.path.join(config.DOWNLOAD_DIR, ".staging")
+    config.DATA_DIR = os.path.join(root, "data")
+    config.CACHE_DB = os.path.join(config.DATA_DIR, "cache.db")
+    config.LIBRARY_DB = os.path.join(config.DATA_DIR, "library.db")
+    config.JOBS_DB = os.path.join(config.DATA_DIR, "jobs.db")
+    os.makedirs(config.DOWNLOAD_DIR)
+    os.makedirs(config.DATA_DIR)
+    logging.getLogger().setLevel(logging.DEBUG if verbose else logging.WARNING)
+    return root
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(timings, wall=None):
+    """
+    Per-call latencies (seconds) -> calls, calls/s and p50/p95/p99 in ms.
+    wall: elapsed time of the whole run; pass it when calls overlapped
+    (threads), otherwise throughput is computed from the summed latencies.
+    """
+    timings = sorted(timings)
+    total = wall if wall is not None else sum(timings)
+    return {
+        'calls': len(timings),
+        'per_sec': len(timings) / total if total else 0.0,
+        'p50_ms': percentile(timings, 50) * 1e3,
+        'p95_ms': percentile(timings, 95) * 1e3,
+        'p99_ms': percentile(timings, 99) * 1e3,
+    }
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def report(name, stats, unit="calls"):
+    line = f"{name:<32} {stats['per_sec']:>10.1f} {unit}/s"
+    if 'p50_ms' in stats:
+        line += f"  p50 {stats['p50_ms']:.2f}ms  p95 {stats['p95_ms']:.2f}ms  p99 {stats['p99_ms']:.2f}ms"
+    extra = {k: v for k, v in stats.items() if k not in ('calls', 'per_sec', 'p50_ms', 'p95_ms', 'p99_ms')}
+    if extra:
+        line += "  " + " ".join(f"{k}={v:.3g}" if isinstance(v, float) else f"{k}={v}" for k, v in extra.items())
+    print(line)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients hanging up on a keep-alive connection is normal here
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+
+class LocalServer:
+    """ThreadingHTTPServer on a free localhost port, served from a daemon thread."""
+    def __init__(self, handler):
+        self.httpd = _Server(('127.0.0.1', 0), handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes; with Nagle on, keep-alive
+    # clients would see a delayed-ACK stall that is not the app's doing
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def send_body(self, body, content_type, status=200):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
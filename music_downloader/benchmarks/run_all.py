@@ -0,0 +1,94 @@
+"""
+Runs every offline benchmark and optionally saves / compares the results,
+so two versions can be measured the same way:
+
+    git checkout v1 && python benchmarks/run_all.py --save before.json
+    git checkout v2 && python benchmarks/run_all.py --compare before.json
+
+--quick shrinks every benchmark to a smoke run.
+"""
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+
+import benchlib
+
+import bench_clean_metadata
+import bench_analyze
+import bench_search
+import bench_download
+import bench_tag_file
+
+BENCHMARKS = {
+    'clean_metadata': lambda quick: bench_clean_metadata.run(repeat=20 if quick else 200),
+    'analyze': lambda quick: bench_analyze.run(latency=0.05 if quick else 0.2, passes=1 if quick else 2),
+    'search': lambda quick: bench_search.run(iterations=4 if quick else 20, latency=0.02 if quick else 0.1),
+    'download': lambda quick: bench_download.run(tracks=4 if quick else 12),
+    'tag_file': lambda quick: bench_tag_file.run(files=10 if quick else 50),
+}
+
+
+def environment():
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=benchlib.HERE,
+                                  capture_output=True, text=True).stdout.strip()
+    except OSError:
+        revision = ""
+    import yt_dlp.version
+    return {
+        'revision': revision,
+        'python': platform.python_version(),
+        'yt_dlp': yt_dlp.version.__version__,
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def compare(results, baseline):
+    """Throughput and p50 change per measurement; positive throughput / negative p50 is better."""
+    print(f"\ncompared to {baseline['environment'].get('revision') or 'baseline'}:")
+    for bench, measurements in results.items():
+        for name, stats in measurements.items():
+            before = baseline['results'].get(bench, {}).get(name)
+            if not before:
+                continue
+            line = f"{name:<32} throughput {change(before['per_sec'], stats['per_sec'])}"
+            if 'p50_ms' in stats and 'p50_ms' in before:
+                line += f"  p50 {change(before['p50_ms'], stats['p50_ms'])}"
+            print(line)
+
+
+def change(before, after):
+    if not before:
+        return "n/a"
+    return f"{(after - before) / before * 100:+7.1f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="small smoke run of every benchmark")
+    parser.add_argument("--only", action="append", choices=sorted(BENCHMARKS), help="run only these (repeatable)")
+    parser.add_argument("--save", metavar="FILE", help="write the results as JSON")
+    parser.add_argument("--compare", metavar="FILE", help="print the change against saved results")
+    args = parser.parse_args()
+
+    results = {}
+    for name, bench in BENCHMARKS.items():
+        if args.only and name not in args.only:
+            continue
+        print(f"\n== {name}")
+        sys.stdout.flush()
+        results[name] = bench(args.quick)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({'environment': environment(), 'quick': args.quick, 'results': results}, f, indent=2)
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
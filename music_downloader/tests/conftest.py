@@ -0,0 +1,46 @@
+"""
+Shared fixtures. The app modules import each other by name (they run from
+app/), so that folder goes on sys.path. `sandbox` points config at a
+temporary folder so the real library, caches and journals are never touched.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+
+class Clock:
+    """Stand-in for the time module: time() returns `now`, which tests move forward."""
+    def __init__(self, now=1000000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def sandbox(tmp_path, monkeypatch):
+    import config
+
+    download_dir = tmp_path / "downloads"
+    data_dir = tmp_path / "data"
+    download_dir.mkdir()
+    data_dir.mkdir()
+    monkeypatch.setattr(config, "DOWNLOAD_DIR", str(download_dir))
+    monkeypatch.setattr(config, "STAGING_DIR", str(download_dir / ".staging"))
+    monkeypatch.setattr(config, "DATA_DIR", str(data_dir))
+    monkeypatch.setattr(config, "CACHE_DB", str(data_dir / "cache.db"))
+    monkeypatch.setattr(config, "LIBRARY_DB", str(data_dir / "library.db"))
+    monkeypatch.setattr(config, "JOBS_DB", str(data_dir / "jobs.db"))
+    monkeypatch.setattr(config, "WISHLIST_DB", str(data_dir / "wishlist.db"))
+    return tmp_path
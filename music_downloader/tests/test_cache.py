@@ -0,0 +1,87 @@
+import cache
+from cache import DiskCache
+
+
+def make_cache(tmp_path, monkeypatch, clock, **kwargs):
+    monkeypatch.setattr(cache, "time", clock)
+    return DiskCache(str(tmp_path / "cache.db"), **kwargs)
+
+
+def test_get_returns_stored_value(tmp_path, monkeypatch, clock):
+    c = make_cache(tmp_path, monkeypatch, clock)
+    c.set("search", "q", [{"id": "abc"}])
+    assert c.get("search", "q") == [{"id": "abc"}]
+    assert c.get("search", "other") is None
+    assert c.stats()["search"] == {"entries": 1, "hits": 1, "misses": 1, "hit_rate": 0.5}
+
+
+def test_entries_expire_after_ttl(tmp_path, monkeypatch, clock):
+    c = make_cache(tmp_path, monkeypatch, clock, ttl=60, ttls={"ai": 3600})
+    c.set("search", "q", 1)
+    c.set("ai", "k", 2)
+    clock.advance(61)
+    assert c.get("search", "q") is None
+    assert c.get("ai", "k") == 2
+    # max_age can only tighten the namespace TTL
+    assert c.get("ai", "k", max_age=30) is None
+    assert c.get("ai", "k", max_age=86400) == 2
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path, monkeypatch, clock):
+    c = make_cache(tmp_path, monkeypatch, clock, max_entries=2)
+    c.set("info", "a", 1)
+    clock.advance(1)
+    c.set("info", "b", 2)
+    clock.advance(1)
+    # The hit is only recorded in memory, but must still count for the eviction
+    assert c.get("info", "a") == 1
+    clock.advance(1)
+    c.set("info", "c", 3)
+    assert c.get("info", "b") is None
+    assert c.keys("info") == ["c", "a"]
+
+
+def test_hits_are_written_in_batches(tmp_path, monkeypatch, clock):
+    monkeypatch.setattr(cache, "TOUCH_BATCH", 3)
+    c = make_cache(tmp_path, monkeypatch, clock)
+    for key in ("a", "b", "c"):
+        c.set("info", key, key)
+    clock.advance(1)
+
+    def accessed(key):
+        return c._conn.execute("SELECT accessed FROM cache WHERE ns = 'info' AND key = ?", (key,)).fetchone()[0]
+
+    written = accessed("a")
+    c.get("info", "a")
+    c.get("info", "b")
+    assert accessed("a") == written
+    c.get("info", "c")
+    assert accessed("a") == clock.now
+
+
+def test_pending_hits_are_flushed_after_the_interval(tmp_path, monkeypatch, clock):
+    c = make_cache(tmp_path, monkeypatch, clock)
+    c.set("info", "a", 1)
+    clock.advance(cache.TOUCH_INTERVAL)
+    c.get("info", "a")
+    assert not c._touched
+
+
+def test_keys_are_most_recently_used_first(tmp_path, monkeypatch, clock):
+    c = make_cache(tmp_path, monkeypatch, clock)
+    for key in ("a", "b", "c"):
+        c.set("search", key, key)
+        clock.advance(1)
+    c.get("search", "a")
+    assert c.keys("search") == ["a", "c", "b"]
+    assert c.keys("search", limit=1) == ["a"]
+
+
+def test_items_skip_expired_entries(tmp_path, monkeypatch, clock):
+    c = make_cache(tmp_path, monkeypatch, clock, ttl=60)
+    c.set("recent", "old", "Old")
+    clock.advance(50)
+    c.set("recent", "new", "New")
+    assert c.items("recent") == [("new", "New"), ("old", "Old")]
+    clock.advance(20)
+    assert c.items("recent") == [("new", "New")]
@@ -0,0 +1,192 @@
+import os
+
+import pytest
+
+import config
+from downloader import MusicDownloader, load_title_rules, load_title_junk_re, parse_bitrate
+from ydl_pool import YoutubeDLPool
+
+
+@pytest.fixture
+def loader(sandbox, monkeypatch):
+    # No background warm-up: it would outlive the test
+    monkeypatch.setattr(YoutubeDLPool, "warm", lambda self, *names: None)
+    loader = MusicDownloader()
+    yield loader
+    loader._convert_pool.shutdown(wait=False, cancel_futures=True)
+
+
+def touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write("x")
+    return path
+
+
+def test_cleanup_only_sweeps_the_staging_folder(loader):
+    orphan = touch(os.path.join(config.STAGING_DIR, "deadbeef0001.webm.part"))
+    resumed = touch(os.path.join(config.STAGING_DIR, "cafe00000002.webm"))
+    # The download folder may be shared: other programs' temp files stay
+    foreign = touch(os.path.join(config.DOWNLOAD_DIR, "Other App", "video.mp4.part"))
+    track = touch(os.path.join(config.DOWNLOAD_DIR, "Artist - Title.mp3"))
+
+    assert loader.cleanup_temporaries(keep={"cafe00000002"}) == [orphan]
+    assert not os.path.exists(orphan)
+    assert all(os.path.exists(path) for path in (resumed, foreign, track))
+
+
+@pytest.mark.parametrize("value, expected", [
+    (320, "320"), ("192", "192"), ("128k", "128"), (" 96 ", "96"), (0, "0"), ("9", "9"),
+])
+def test_parse_bitrate(value, expected):
+    assert parse_bitrate(value) == expected
+
+
+@pytest.mark.parametrize("value", [95, 321, 10, -1, "abc", "192; rm -rf /", True, 1.5])
+def test_parse_bitrate_rejects(value):
+    with pytest.raises(ValueError):
+        parse_bitrate(value)
+
+
+def test_audio_opts_validate_the_bitrate(loader):
+    assert loader._audio_opts('mp3', None)[1]['preferredquality'] == str(config.AUDIO_BITRATE)
+    assert loader._audio_opts('mp3', '0')[1]['preferredquality'] == "0"
+    with pytest.raises(ValueError):
+        loader._audio_opts('mp3', '9999')
+
+
+def test_invalid_configured_bitrate_falls_back_to_320(sandbox, monkeypatch):
+    monkeypatch.setattr(YoutubeDLPool, "warm", lambda self, *names: None)
+    monkeypatch.setattr(config, "AUDIO_BITRATE", 32)
+    loader = MusicDownloader()
+    try:
+        assert loader._audio_opts('mp3', None)[1]['preferredquality'] == "320"
+    finally:
+        loader._convert_pool.shutdown(wait=False, cancel_futures=True)
+
+
+class Response:
+    def __init__(self, content, status_error=None):
+        self.content = content
+        self.status_error = status_error
+
+    def raise_for_status(self):
+        if self.status_error:
+            raise self.status_error
+
+    def json(self):
+        return {'choices': [{'message': {'content': self.content}}]}
+
+
+def test_ai_request_is_sized_for_the_batch(loader):
+    url, request = loader.ai_request("batch", [("a", "b")] * 5, "key")
+    assert url.endswith("/chat/completions")
+    assert request['headers']['Authorization'] == "Bearer key"
+    assert request['timeout'] == 20
+    assert loader.ai_request("single", [("a", "b")], "key")[1]['timeout'] == 10
+
+
+def test_ai_response_parses_single_and_batch(loader):
+    single = loader.ai_response("single", [("t", "c")], Response('{"artist": "A", "title": "T", "album": "single"}'), 0.1)
+    assert single == (["A"], "T", "T", "")
+    # Some models wrap the array
+    batch = loader.ai_response("batch", [("t0", "c"), ("t1", "c")],
+                               Response('{"results": [{"index": 0, "artist": ["A"], "title": "T", "year": "2001"}, {"index": 1, "artist": ["B"], "title": "U"}]}'), 0.1)
+    assert batch == [(["A"], "T", "T", "2001"), (["B"], "U", "U", "")]
+
+
+def test_ai_response_failures_return_none(loader):
+    items = [("t0", "c"), ("t1", "c")]
+    assert loader.ai_response("batch", items, Response('[{"index": 0}]'), 0.1) is None
+    assert loader.ai_response("batch", items, Response("not json"), 0.1) is None
+    assert loader.ai_response("batch", items, Response("[]", RuntimeError("HTTP 500")), 0.1) is None
+    assert loader.ai_response("single", items[:1], None, 0.1, error=TimeoutError("timed out")) is None
+
+
+@pytest.mark.parametrize("channel, title, expected", [
+    ("x", "Daft Punk - Get Lucky (Official Video)", (["Daft Punk"], "Get Lucky")),
+    ("x", "Daft Punk - Get Lucky (Official Video) [Radio Edit]", (["Daft Punk"], "Get Lucky [Radio Edit]")),
+    ("Dua  Lipa", "Levitating (feat. DaBaby)", (["Dua Lipa", "DaBaby"], "Levitating")),
+    ("x", "Martin Garrix x Macklemore - Summer Days", (["Martin Garrix", "Macklemore"], "Summer Days")),
+    ("", "Untitled", (["Unknown Artist"], "Untitled")),
+])
+def test_clean_metadata(loader, channel, title, expected):
+    assert loader.clean_metadata(channel, title) == expected
+
+
+def test_title_rules_file(tmp_path):
+    path = tmp_path / "title_rules.txt"
+    path.write_text("# extra junk\n\\(Remastered \\d{4}\\)\n(?i)remaster\n(unclosed\n", encoding="utf-8")
+    # Inline flags only work at the start of the combined pattern, so such rules are skipped
+    assert load_title_rules(str(path)) == [r"\(Remastered \d{4}\)"]
+    assert load_title_junk_re(str(path)).sub("", "Song (Remastered 2011)").strip() == "Song"
+    assert load_title_rules(str(tmp_path / "missing.txt")) == []
+
+
+def test_title_rules_that_do_not_combine_fall_back_to_the_builtins(monkeypatch, tmp_path):
+    import downloader
+    monkeypatch.setattr(downloader, "load_title_rules", lambda path: ["(?i)remaster"])
+    pattern = load_title_junk_re(str(tmp_path / "title_rules.txt"))
+    assert pattern.sub("", "Song (Official Video)").strip() == "Song"
+    assert pattern.sub("", "Song remaster") == "Song remaster"
+
+
+BATCH_ITEMS = [("ta", "c"), ("tb", "c")]
+
+
+@pytest.mark.parametrize("answer", [
+    # 0-based, out of order: the indexes are used
+    '[{"index": 1, "artist": ["B"], "title": "TB"}, {"index": 0, "artist": ["A"], "title": "TA"}]',
+    # 1-based, missing and duplicate indexes: array order
+    '[{"index": 1, "artist": ["A"], "title": "TA"}, {"index": 2, "artist": ["B"], "title": "TB"}]',
+    '[{"artist": ["A"], "title": "TA"}, {"artist": ["B"], "title": "TB"}]',
+    '[{"index": 0, "artist": ["A"], "title": "TA"}, {"index": 0, "artist": ["B"], "title": "TB"}]',
+])
+def test_batch_answers_map_to_their_titles(loader, answer):
+    assert loader._parse_ai_batch(answer, BATCH_ITEMS) == [(["A"], "TA", "TA", ""), (["B"], "TB", "TB", "")]
+
+
+def test_batch_answer_needs_one_object_per_title(loader):
+    with pytest.raises(ValueError):
+        loader._parse_ai_batch('[{"index": 0, "title": "TA"}]', BATCH_ITEMS)
+    with pytest.raises(ValueError):
+        loader._parse_ai_batch('[{"index": 0, "title": "TA"}, "TB"]', BATCH_ITEMS)
+
+
+def test_search_without_hydration(loader, monkeypatch):
+    hydrated = []
+    monkeypatch.setattr(loader, "_hydrate_async", hydrated.append)
+    loader.cache.set('search', loader._search_key("get lucky", 'fast'),
+                     [{'id': "abc", 'title': "Get Lucky", 'hydrated': False}])
+    assert [r['id'] for r in loader.search_video("get lucky", 'fast', hydrate=False)['results']] == ["abc"]
+    assert hydrated == []
+    loader.search_video("get lucky", 'fast')
+    assert hydrated == ["abc"]
+
+
+def test_bare_channel_lists_its_videos_tab(loader, monkeypatch):
+    def video(n):
+        return {'id': f"v{n}", 'title': f"Song {n}", 'uploader': "A", 'url': f"https://youtu.be/v{n}"}
+    listings = {
+        "https://www.youtube.com/@a": ({'title': "A"}, [], ["https://www.youtube.com/@a/videos", "https://www.youtube.com/@a/shorts"]),
+        "https://www.youtube.com/@a/videos": ({'title': "A - Videos"}, [video(1), video(2), video(3)], []),
+    }
+    calls = []
+    def list_flat(url, limit=None):
+        calls.append((url, limit))
+        return listings[url]
+    monkeypatch.setattr(loader, "_list_flat", list_flat)
+
+    result = loader.list_playlist("https://www.youtube.com/@a", limit=2)
+    assert result['channel'] is True
+    assert [e['id'] for e in result['entries']] == ["v1", "v2"]
+    assert calls == [("https://www.youtube.com/@a", 2), ("https://www.youtube.com/@a/videos", 2)]
+    assert loader.list_playlist("https://www.youtube.com/@a/videos")['channel'] is False
+
+
+def test_unknown_search_mode_is_rejected(loader):
+    # The mode is a metrics label and part of the cache key, so it must stay one of SEARCH_MODES
+    with pytest.raises(ValueError):
+        next(loader.iter_search("get lucky", 'evil'))
+    assert loader.search_video("get lucky", 'evil')['found'] is False
+    assert loader.cache.keys('search') == []
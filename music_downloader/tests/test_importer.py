@@ -0,0 +1,69 @@
+from concurrent.futures import Future
+
+from importer import PlaylistImporter, PlaylistImport, QUEUED
+
+
+class FakeLoader:
+    def __init__(self, playlist):
+        self.playlist = playlist
+
+    def list_playlist(self, url, limit=None):
+        return dict(self.playlist, entries=self.playlist['entries'][:limit])
+
+    def get_video_details_async(self, video_id):
+        future = Future()
+        future.set_result({})
+        return future
+
+    def analyze_metadata_batch(self, items):
+        return [{'proposal_artists': ["A"], 'proposal_title': title, 'proposal_album': title, 'proposal_year': ""}
+                for title, channel in items]
+
+    def download_track(self, *args, **kwargs):
+        pass
+
+
+class FakeJobs:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, func, url, artists, title, album, year, track_number=None, **kwargs):
+        self.submitted.append((url, album, track_number))
+        return type("Job", (), {'id': f"job{len(self.submitted)}"})
+
+    def get(self, job_id):
+        return None
+
+
+def run(playlist, **kwargs):
+    jobs = FakeJobs()
+    importer = PlaylistImporter(FakeLoader(playlist), jobs)
+    imp = PlaylistImport("https://www.youtube.com/x", **kwargs)
+    importer._run(imp)
+    assert imp.status == QUEUED, imp.message
+    return imp, jobs.submitted
+
+
+def playlist(title, channel=False, count=2):
+    entries = [{'id': f"v{i}", 'url': f"https://youtu.be/v{i}", 'title': f"Song {i}", 'uploader': "A"} for i in range(count)]
+    return {'title': title, 'uploader': "A", 'entries': entries, 'channel': channel}
+
+
+def test_playlist_is_imported_as_an_album():
+    imp, submitted = run(playlist("Album - Discovery"))
+    assert imp.album == "Discovery"
+    assert submitted == [("https://youtu.be/v0", "Discovery", "1/2"), ("https://youtu.be/v1", "Discovery", "2/2")]
+
+
+def test_channel_is_not_one_album_unless_asked():
+    imp, submitted = run(playlist("Daft Punk - Videos", channel=True))
+    assert imp.album is None
+    assert submitted == [("https://youtu.be/v0", "Song 0", None), ("https://youtu.be/v1", "Song 1", None)]
+
+    imp, submitted = run(playlist("Daft Punk - Videos", channel=True), as_album=True)
+    assert [track for _, _, track in submitted] == ["1/2", "2/2"]
+
+
+def test_limit_is_passed_on():
+    imp, submitted = run(playlist("Album - Discovery", count=5), limit=3)
+    assert len(submitted) == 3
@@ -0,0 +1,80 @@
+import time
+from concurrent.futures import Future
+
+from jobs import JobQueue, JobJournal, DONE, FAILED, QUEUED
+
+
+def download_track(url, progress_key=None, force=False):
+    return True, f"{url} {progress_key}"
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.time() + timeout
+    while not predicate():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_job_returning_a_future_finishes_when_it_resolves():
+    done = Future()
+    jobs = JobQueue(workers=1)
+    job = jobs.submit(lambda: done)
+    other = jobs.submit(download_track, "u")
+    jobs.start()
+    # The worker moved on while the first job waits for its Future
+    wait_for(lambda: jobs.get(other.id)['status'] == DONE)
+    assert jobs.get(job.id)['status'] == "running"
+
+    done.set_result((False, "conversion failed"))
+    assert jobs.get(job.id)['status'] == FAILED
+
+
+def test_journal_keeps_unfinished_jobs(tmp_path):
+    journal = JobJournal(str(tmp_path / "jobs.db"))
+    jobs = JobQueue(journal=journal)
+    job = jobs.submit(download_track, "https://youtu.be/a", force=True, label="a", id_kwarg='progress_key')
+    journal.set_stage(job.id, "converting")
+
+    [entry] = JobJournal(str(tmp_path / "jobs.db")).unfinished()
+    assert entry['id'] == job.id
+    assert entry['name'] == "download_track"
+    assert entry['args'] == ["https://youtu.be/a"]
+    assert entry['kwargs'] == {'force': True, 'progress_key': job.id}
+    assert entry['stage'] == "converting"
+
+
+def test_resume_requeues_jobs_under_their_ids(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    first = JobQueue(journal=JobJournal(path))
+    old = [first.submit(download_track, f"https://youtu.be/{n}", label=n, id_kwarg='progress_key') for n in "ab"]
+
+    def unknown():
+        pass
+    first.submit(unknown)
+
+    # After a restart: same journal file, new queue
+    jobs = JobQueue(journal=JobJournal(path))
+    resumed = jobs.resume({'download_track': download_track})
+    assert resumed == [job.id for job in old]
+    assert jobs.get(old[0].id)['status'] == QUEUED
+    assert [entry['name'] for entry in jobs.journal.unfinished()] == ["download_track", "download_track"]
+
+    jobs.start()
+    jobs._queue.join()
+    assert jobs.get(old[0].id)['message'] == f"https://youtu.be/a {old[0].id}"
+    assert jobs.journal.unfinished() == []
+
+
+def test_failed_job_is_retried_as_the_policy_decides(tmp_path):
+    calls = []
+
+    def flaky(url):
+        calls.append(url)
+        return (len(calls) > 1, "HTTP Error 503")
+
+    jobs = JobQueue(journal=JobJournal(str(tmp_path / "jobs.db")), retry=lambda attempt, message: 0 if attempt < 3 else None)
+    job = jobs.submit(flaky, "u")
+    jobs.start()
+    wait_for(lambda: jobs.get(job.id)['status'] == DONE)
+    assert calls == ["u", "u"]
+    assert jobs.get(job.id)['attempts'] == 2
@@ -0,0 +1,84 @@
+import time
+
+import pytest
+
+import scheduler
+from scheduler import DownloadScheduler, parse_windows, BACKOFF_BASE, RECOVER_AFTER
+
+
+def test_parse_windows():
+    assert parse_windows("01:00-07:00, 22:30-0:15") == [(60, 420), (1350, 15)]
+    assert parse_windows("night, 25:00") == []
+    assert parse_windows("") == []
+
+
+def test_budget_is_lifted_inside_a_window():
+    s = DownloadScheduler(2, bandwidth_limit=1000, full_speed_windows="22:00-06:00")
+    night = time.mktime((2024, 5, 1, 23, 30, 0, 0, 0, -1))
+    day = time.mktime((2024, 5, 1, 12, 0, 0, 0, 0, -1))
+    assert s.budget(night) == 0
+    assert s.budget(day) == 1000
+    assert DownloadScheduler(2).budget(day) == 0
+
+
+def test_slot_shares_the_budget_between_running_fetches():
+    s = DownloadScheduler(2, bandwidth_limit=1000)
+    first, second = {}, {}
+    with s.slot(first):
+        assert first['ratelimit'] == 1000
+        with s.slot(second):
+            assert first['ratelimit'] == second['ratelimit'] == 500
+        assert first['ratelimit'] == 1000
+
+
+def test_fragments_only_for_a_lone_unlimited_fetch():
+    s = DownloadScheduler(2, fragments=4)
+    first, second = {}, {}
+    with s.slot(first):
+        with s.slot(second):
+            pass
+    assert first['concurrent_fragment_downloads'] == 4
+    assert second['concurrent_fragment_downloads'] == 1
+
+
+def test_throttling_backs_off_and_clean_fetches_recover():
+    s = DownloadScheduler(3)
+    with pytest.raises(RuntimeError):
+        with s.slot({}):
+            raise RuntimeError("HTTP Error 429: Too Many Requests")
+    stats = s.stats()
+    assert stats['backoff_seconds'] == BACKOFF_BASE
+    assert stats['allowed_concurrency'] == 2
+    assert stats['paused_for'] > 0
+
+    s._paused_until = 0
+    for _ in range(RECOVER_AFTER):
+        with s.slot({}):
+            pass
+    assert s.stats()['allowed_concurrency'] == 3
+    assert s.stats()['backoff_seconds'] == 0
+
+
+def test_other_errors_do_not_back_off():
+    s = DownloadScheduler(2)
+    with pytest.raises(ValueError):
+        with s.slot({}):
+            raise ValueError("Video unavailable")
+    assert s.stats()['backoff_seconds'] == 0
+
+
+def test_retry_delay_only_for_network_errors(monkeypatch):
+    monkeypatch.setattr(scheduler.random, "uniform", lambda a, b: a)
+    s = DownloadScheduler(2, retries=2, retry_base=30)
+    assert s.retry_delay(0, "HTTP Error 503: Service Unavailable") == 30
+    assert s.retry_delay(1, "Read timed out") == 60
+    assert s.retry_delay(2, "Read timed out") is None
+    assert s.retry_delay(0, "Video unavailable") is None
+    assert s.retry_delay(0, None) is None
+
+
+def test_retry_waits_for_a_running_backoff(monkeypatch):
+    monkeypatch.setattr(scheduler.random, "uniform", lambda a, b: a)
+    s = DownloadScheduler(2, retry_base=30)
+    s._paused_until = time.time() + 300
+    assert 299 <= s.retry_delay(0, "HTTP Error 429") <= 300
@@ -0,0 +1,112 @@
+import time
+
+import pytest
+
+import cache
+from cache import DiskCache
+from suggest import SuggestIndex, RECENT_LIMIT, RECENT_TTL
+
+
+class FakeLibrary:
+    def __init__(self, names=(), version=1):
+        self._names = list(names)
+        self.version = version
+
+    def names(self):
+        return self._names
+
+
+@pytest.fixture
+def store(tmp_path):
+    return DiskCache(str(tmp_path / "cache.db"), ttl=3600, ttls={'recent': RECENT_TTL})
+
+
+def make_index(names=(), recent=(), store=None):
+    index = SuggestIndex(FakeLibrary(names), store=store)
+    for query in recent:
+        index.record(query)
+    # The library part is built in a background thread
+    deadline = time.time() + 5
+    while index._library_version != index.library.version:
+        assert time.time() < deadline, "library index not built"
+        time.sleep(0.01)
+    return index
+
+
+def texts(suggestions):
+    return [(s['text'], s['kind']) for s in suggestions]
+
+
+LIBRARY = [
+    ("/media/Daft Punk - Get Lucky.mp3", "daft punk", "get lucky"),
+    ("/media/The Weeknd - Blinding Lights.mp3", "The Weeknd", "Blinding Lights"),
+    ("/media/unknown.mp3", None, "No Artist"),
+]
+
+
+def test_library_artists_and_tracks_keep_the_file_spelling():
+    index = make_index(LIBRARY)
+    assert texts(index.suggest("daft")) == [("Daft Punk", 'artist'), ("Daft Punk - Get Lucky", 'track')]
+
+
+def test_words_inside_a_name_match():
+    index = make_index(LIBRARY)
+    assert texts(index.suggest("lights")) == [("The Weeknd - Blinding Lights", 'track')]
+
+
+def test_recent_searches_come_first_newest_first():
+    index = make_index(LIBRARY, recent=["daft punk remix", "daft punk live"])
+    index.record("Daft  Punk   Discovery")
+    assert texts(index.suggest("daft punk")) == [
+        ("Daft Punk Discovery", 'recent'), ("daft punk live", 'recent'), ("daft punk remix", 'recent'),
+        ("Daft Punk", 'artist'), ("Daft Punk - Get Lucky", 'track'),
+    ]
+    assert len(index.suggest("daft punk", limit=2)) == 2
+
+
+def test_trailing_space_completes_the_word():
+    index = make_index(recent=["daftpunk", "daft punk"])
+    assert texts(index.suggest("daft ")) == [("daft punk", 'recent')]
+
+
+def test_urls_and_blank_queries_are_not_recorded():
+    index = make_index()
+    index.record("https://www.youtube.com/watch?v=abc")
+    index.record("   ")
+    assert index._recent == {}
+    assert index.suggest("") == []
+
+
+def test_recent_searches_are_capped():
+    index = make_index()
+    for n in range(RECENT_LIMIT + 5):
+        index.record(f"query {n}")
+    assert len(index._recent) == RECENT_LIMIT
+    assert "query 0" not in index._recent
+
+
+def test_library_changes_are_picked_up():
+    index = make_index()
+    assert index.suggest("daft") == []
+    index.library._names = LIBRARY
+    index.library.version = 2
+    index.suggest("daft")
+    deadline = time.time() + 5
+    while not index.suggest("daft"):
+        assert time.time() < deadline, "library index not rebuilt"
+        time.sleep(0.01)
+    assert texts(index.suggest("daft"))[0] == ("Daft Punk", 'artist')
+
+
+def test_recorded_searches_survive_a_restart(store, monkeypatch, clock):
+    monkeypatch.setattr(cache, "time", clock)
+    index = make_index(store=store)
+    for query in ("Daft Punk Live", "https://youtu.be/abc", "Avicii Levels"):
+        index.record(query)
+        clock.advance(1)
+    # Other searches cached by the downloader are not suggestions
+    store.set('search', "fast:some wishlist line", [])
+    index = make_index(store=store)
+    assert texts(index.suggest("a")) == [("Avicii Levels", 'recent')]
+    assert [s['text'] for s in index.suggest("d")] == ["Daft Punk Live"]
+    assert [key for key, _ in store.items('recent')] == ["avicii levels", "daft punk live"]
@@ -0,0 +1,160 @@
+import pytest
+
+from wishlist import (WishlistSync, parse_line, read_wishlist, score_match, best_match,
+                      QUEUED, IN_LIBRARY, NO_MATCH, ERROR, MAX_ATTEMPTS, MIN_SCORE)
+
+
+def result(title, uploader, duration=200, video_id="x"):
+    return {'id': video_id, 'title': title, 'uploader': uploader, 'duration': duration,
+            'url': f"https://www.youtube.com/watch?v={video_id}"}
+
+
+def test_parse_line():
+    assert parse_line("  Daft Punk  -  Get Lucky ") == ("Daft Punk", "Get Lucky")
+    assert parse_line("get lucky daft punk") == (None, "get lucky daft punk")
+    assert parse_line(" - Get Lucky") == (None, "- Get Lucky")
+
+
+def test_read_text_wishlist(tmp_path):
+    path = tmp_path / "wishlist.txt"
+    path.write_text("# favourites\nDaft Punk - Get Lucky\n\nsome free search\n", encoding="utf-8")
+    assert read_wishlist(str(path)) == [
+        {'line': "Daft Punk - Get Lucky", 'artist': "Daft Punk", 'title': "Get Lucky", 'album': None},
+        {'line': "some free search", 'artist': None, 'title': "some free search", 'album': None},
+    ]
+
+
+def test_read_csv_wishlist(tmp_path):
+    path = tmp_path / "wishlist.csv"
+    path.write_text("artist,title,album\nDaft Punk,Get Lucky,Random Access Memories\nAvicii,Levels\nonly one cell\n",
+                    encoding="utf-8")
+    items = read_wishlist(str(path))
+    assert [(i['artist'], i['title'], i['album']) for i in items] == [
+        ("Daft Punk", "Get Lucky", "Random Access Memories"), ("Avicii", "Levels", None)]
+
+
+def test_official_upload_beats_variants():
+    item = {'artist': "Daft Punk", 'title': "Get Lucky"}
+    official = result("Daft Punk - Get Lucky (Official Audio)", "Daft Punk")
+    topic = result("Get Lucky", "Daft Punk - Topic")
+    live = result("Daft Punk - Get Lucky (Live)", "Daft Punk")
+    cover = result("Get Lucky - Daft Punk cover", "Some Singer")
+    long_mix = result("Daft Punk - Get Lucky", "Daft Punk", duration=3600)
+    assert score_match(item, official) >= MIN_SCORE
+    assert score_match(item, topic) >= MIN_SCORE
+    assert score_match(item, official) > score_match(item, live)
+    assert score_match(item, official) > score_match(item, cover)
+    assert score_match(item, official) > score_match(item, long_mix)
+    assert score_match(item, result("", "x")) == 0.0
+
+
+def test_variant_is_fine_when_the_line_asks_for_it():
+    item = {'artist': "Daft Punk", 'title': "Get Lucky (Live)"}
+    live = result("Daft Punk - Get Lucky (Live)", "Daft Punk")
+    assert score_match(item, live) >= MIN_SCORE
+
+
+def test_best_match_prefers_earlier_results_on_ties():
+    item = {'artist': "Daft Punk", 'title': "Get Lucky"}
+    first = result("Daft Punk - Get Lucky", "Daft Punk", video_id="a")
+    second = result("Daft Punk - Get Lucky", "Daft Punk", video_id="b")
+    assert best_match(item, [first, second])[0] is first
+    assert best_match(item, []) == (None, 0.0)
+
+
+class FakeLibrary:
+    def __init__(self, video_ids=()):
+        self.video_ids = set(video_ids)
+
+    def find(self, artist=None, title=None, video_id=None):
+        return video_id in self.video_ids
+
+
+class FakeLoader:
+    def __init__(self, video_ids=(), results=()):
+        self.library = FakeLibrary(video_ids)
+        self.results = list(results)
+        self.searches = []
+
+    def search_video(self, query, mode=None, record=False, hydrate=True):
+        self.searches.append((query, mode, record, hydrate))
+        return {'found': True, 'mode': mode, 'results': self.results}
+
+
+class FakeJobs:
+    def __init__(self, jobs=None):
+        self.jobs = jobs or {}
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+
+@pytest.fixture
+def make_sync(tmp_path):
+    def make(jobs=None, video_ids=(), results=()):
+        return WishlistSync(FakeLoader(video_ids, results), FakeJobs(jobs), None, lines=["Daft Punk - Get Lucky"],
+                            state_path=str(tmp_path / "wishlist.db"))
+    return make
+
+
+def queue(sync, attempts=0):
+    [item] = sync.wanted()
+    sync.state.set(item['key'], item['line'], QUEUED, video_id="vid", job_id="job1", attempts=attempts)
+    return item
+
+
+def test_new_lines_are_pending(make_sync):
+    sync = make_sync()
+    assert [item['attempts'] for item in sync.pending(sync.wanted())] == [0]
+
+
+def test_running_download_is_not_pending(make_sync):
+    sync = make_sync(jobs={'job1': {'status': 'running', 'message': ''}})
+    queue(sync)
+    assert sync.pending(sync.wanted()) == []
+
+
+def test_failed_download_counts_as_an_attempt(make_sync):
+    sync = make_sync(jobs={'job1': {'status': 'failed', 'message': "HTTP Error 403"}})
+    item = queue(sync)
+    assert [i['attempts'] for i in sync.pending([item])] == [1]
+    entry = sync.state.all()[item['key']]
+    assert (entry['status'], entry['attempts'], entry['message']) == (ERROR, 1, "HTTP Error 403")
+
+
+def test_failed_downloads_stop_after_max_attempts(make_sync):
+    sync = make_sync(jobs={'job1': {'status': 'failed', 'message': "HTTP Error 403"}})
+    item = queue(sync, attempts=MAX_ATTEMPTS - 1)
+    assert sync.pending([item]) == []
+    assert sync.state.all()[item['key']]['attempts'] == MAX_ATTEMPTS
+
+
+def test_job_lost_in_a_restart_is_retried(make_sync):
+    sync = make_sync()
+    item = queue(sync)
+    assert [i['attempts'] for i in sync.pending([item])] == [1]
+    assert sync.state.all()[item['key']]['message'] == "Download job lost"
+
+
+def test_job_lost_after_the_download_finished_is_done(make_sync):
+    sync = make_sync(video_ids=["vid"])
+    item = queue(sync)
+    assert sync.pending([item]) == []
+    assert sync.state.all()[item['key']]['status'] == IN_LIBRARY
+
+
+def test_matching_uses_flat_results_only(make_sync):
+    official = result("Daft Punk - Get Lucky (Official Audio)", "Daft Punk", video_id="abc")
+    sync = make_sync(results=[result("Get Lucky (Live)", "Someone"), official])
+    [item] = sync.wanted()
+    assert sync._resolve(item) is official
+    assert item['outcome'] == QUEUED and item['video_id'] == "abc"
+    # Not recorded as a recent search, and no detail fetch per result
+    assert sync.loader.searches == [("Daft Punk Get Lucky", 'fast', False, False)]
+
+
+def test_poor_results_are_no_match(make_sync):
+    sync = make_sync(results=[result("Completely different song", "Someone")])
+    [item] = sync.wanted()
+    assert sync._resolve(item) is None
+    assert item['outcome'] == NO_MATCH
@@ -0,0 +1,86 @@
+import ydl_pool
+from ydl_pool import YoutubeDLPool
+
+# Worst first, as yt-dlp sorts them: plain bestaudio picks the Opus stream
+FORMATS = [
+    {'format_id': 'aac', 'acodec': 'mp4a.40.2', 'vcodec': 'none', 'abr': 128, 'ext': 'm4a', 'url': 'https://a'},
+    {'format_id': 'opus', 'acodec': 'opus', 'vcodec': 'none', 'abr': 130, 'ext': 'webm', 'url': 'https://b'},
+]
+
+
+def selected(ydl):
+    ctx = {'formats': FORMATS, 'has_merged_format': False, 'incomplete_formats': False}
+    return [f['format_id'] for f in ydl.format_selector(ctx)]
+
+
+def make_pool(**opts):
+    pool = YoutubeDLPool(max_idle=2)
+    pool.register('download', dict({'quiet': True, 'format': 'bestaudio/best', 'outtmpl': '%(id)s.%(ext)s'}, **opts))
+    return pool
+
+
+def test_instances_are_reused():
+    pool = make_pool()
+    with pool.acquire('download') as first:
+        pass
+    with pool.acquire('download') as second:
+        pass
+    assert second is first
+    assert pool.stats() == {'created': 1, 'reused': 1, 'idle': 1}
+
+
+def test_concurrent_uses_get_their_own_instance():
+    pool = make_pool()
+    with pool.acquire('download') as first:
+        with pool.acquire('download') as second:
+            assert second is not first
+    assert pool.stats()['idle'] == 2
+
+
+def test_params_and_hooks_apply_to_one_use_only():
+    pool = make_pool()
+    hook = lambda d: None
+    with pool.acquire('download', progress_hooks=[hook], outtmpl='/tmp/x.%(ext)s', ratelimit=1000) as ydl:
+        assert ydl.params['ratelimit'] == 1000
+        assert ydl.params['outtmpl']['default'] == '/tmp/x.%(ext)s'
+        assert ydl._progress_hooks == [hook]
+    with pool.acquire('download') as ydl:
+        assert 'ratelimit' not in ydl.params
+        assert ydl.params['outtmpl']['default'] == '%(id)s.%(ext)s'
+        assert hook not in ydl._progress_hooks
+
+
+def test_format_override_rebuilds_the_selector():
+    pool = make_pool()
+    with pool.acquire('download') as ydl:
+        assert selected(ydl) == ['opus']
+    with pool.acquire('download', format='bestaudio[acodec^=mp4a]/bestaudio/best') as ydl:
+        assert selected(ydl) == ['aac']
+        selector = ydl.format_selector
+    with pool.acquire('download') as ydl:
+        assert selected(ydl) == ['opus']
+    with pool.acquire('download', format='bestaudio[acodec^=mp4a]/bestaudio/best') as ydl:
+        # Compiled once per instance and format
+        assert ydl.format_selector is selector
+
+
+def test_worn_instances_are_replaced(monkeypatch):
+    monkeypatch.setattr(ydl_pool, "MAX_USES", 2)
+    pool = make_pool()
+    with pool.acquire('download') as first:
+        pass
+    with pool.acquire('download'):
+        pass
+    with pool.acquire('download') as third:
+        pass
+    assert third is not first
+    assert pool.stats()['created'] == 2
+
+
+def test_idle_list_is_bounded():
+    pool = make_pool()
+    with pool.acquire('download'), pool.acquire('download'), pool.acquire('download'):
+        pass
+    assert pool.stats() == {'created': 3, 'reused': 0, 'idle': 2}
+    pool.close()
+    assert pool.stats()['idle'] == 0